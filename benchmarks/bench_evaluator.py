@@ -0,0 +1,195 @@
+"""
+evaluate_answer micro-benchmark: eski (har chaqiriqda regex + kvadratik qidiruv)
+va services/evaluator.py dagi kompilyatsiya qilingan variant.
+
+    python benchmarks/bench_evaluator.py [--options 200] [--answers 2000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.evaluator import compile_task  # noqa: E402
+
+
+# ==================== ESKI IMPLEMENTATSIYA (taqqoslash uchun nusxa) ====================
+
+def legacy_normalize_text(s: str) -> str:
+    """Taqqoslash uchun matnni normalize qilish (lower, bo'sh joylarni tozalash)."""
+    return re.sub(r"\s+", " ", s).strip().lower()
+
+
+async def legacy_evaluate_answer(task: dict, user_answer_raw: str) -> tuple[bool, str]:
+    """
+    Task va foydalanuvchi javobini qabul qilib,
+    (correct, result_text) qaytaradi.
+    """
+    user_answer_raw = user_answer_raw.strip()
+    user_answer_norm = legacy_normalize_text(user_answer_raw)
+
+    result_text = ""
+    correct = False
+
+    # === SHORT ANSWER ===
+    if task["type"] == "short":
+        expected = (task.get("correct_short") or "").strip()
+        expected_norm = legacy_normalize_text(expected)
+
+        correct = bool(expected_norm) and (user_answer_norm == expected_norm)
+
+        if correct:
+            result_text = (
+                "✅ *To‘g‘ri javob!*\n\n"
+                f"📌 Sizning javobingiz: `{user_answer_raw}`\n"
+                f"✅ To‘g‘ri javob: `{expected}`"
+            )
+        else:
+            result_text = (
+                "❌ *Noto‘g‘ri javob.*\n\n"
+                f"📌 Sizning javobingiz: `{user_answer_raw}`\n"
+                f"✅ To‘g‘ri javob: `{expected or '—'}`"
+            )
+
+    # === MCQ / CHECKBOX ===
+    else:
+        options = task.get("options", [])
+        if not options:
+            return False, "⚠️ Bu savol uchun variantlar topilmadi."
+
+        # 1) Raqam ko‘rinishida javoblarni ajratib olamiz (1, 2, 3 ...)
+        nums = re.findall(r"\d+", user_answer_raw)
+        chosen_indexes = set()
+
+        if nums:
+            for n in nums:
+                idx = int(n) - 1
+                if 0 <= idx < len(options):
+                    chosen_indexes.add(idx)
+
+        # 2) Agar raqam topilmasa, matn bo‘yicha qidiramiz
+        if not chosen_indexes:
+            # checkbox bo'lsa bir nechta matn bo'lishi mumkin
+            # "Backend, Frontend" -> ["backend", "frontend"]
+            parts = re.split(r"[,\n;]+", user_answer_raw)
+            parts = [legacy_normalize_text(p) for p in parts if p.strip()]
+
+            for i, opt in enumerate(options):
+                opt_norm = legacy_normalize_text(opt["text"])
+                if opt_norm in parts or any(p in opt_norm for p in parts):
+                    chosen_indexes.add(i)
+
+            # agar mcq bo'lsa va hech nima topilmasa, to‘liq matn bo‘yicha ham solishtiramiz
+            if not chosen_indexes and task["type"] == "mcq":
+                for i, opt in enumerate(options):
+                    if legacy_normalize_text(opt["text"]) == user_answer_norm:
+                        chosen_indexes.add(i)
+                        break
+
+        correct_indexes = {i for i, o in enumerate(options) if o["correct"]}
+
+        if task["type"] == "mcq":
+            correct = len(chosen_indexes) == 1 and chosen_indexes == correct_indexes
+        else:  # checkbox
+            correct = chosen_indexes == correct_indexes and len(correct_indexes) > 0
+
+        user_chosen_texts = ", ".join(
+            options[i]["text"] for i in sorted(chosen_indexes)
+        ) if chosen_indexes else "—"
+
+        correct_texts = ", ".join(
+            o["text"] for o in options if o["correct"]
+        ) or "—"
+
+        if correct:
+            result_text = (
+                "✅ *To‘g‘ri javob!*\n\n"
+                f"📌 Siz tanlagan variant(lar): {user_chosen_texts}\n"
+                f"✅ To‘g‘ri variant(lar): {correct_texts}"
+            )
+        else:
+            result_text = (
+                "❌ *Noto‘g‘ri javob.*\n\n"
+                f"📌 Siz tanlagan variant(lar): {user_chosen_texts}\n"
+                f"✅ To‘g‘ri variant(lar): {correct_texts}"
+            )
+
+    return correct, result_text
+
+
+# ==================== BENCHMARK ====================
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(3, 10)))
+
+
+def make_task(rng: random.Random, task_type: str, n_options: int, task_id: int) -> dict:
+    options = [
+        {"text": "  ".join(_word(rng) for _ in range(rng.randint(1, 5))), "correct": False}
+        for _ in range(n_options)
+    ]
+    for i in rng.sample(range(n_options), 1 if task_type == "mcq" else max(1, n_options // 10)):
+        options[i]["correct"] = True
+    return {"id": task_id, "type": task_type, "title": "bench", "options": options}
+
+
+def make_answers(rng: random.Random, task: dict, n: int) -> list[str]:
+    opts = task["options"]
+    answers = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.3:
+            answers.append(" ".join(str(rng.randint(1, len(opts) + 2)) for _ in range(rng.randint(1, 3))))
+        elif kind < 0.8:
+            picked = rng.sample(opts, rng.randint(1, 3))
+            answers.append(", ".join(o["text"].upper() for o in picked))
+        else:
+            answers.append(_word(rng))
+    return answers
+
+
+async def run(n_options: int, n_answers: int, seed: int):
+    rng = random.Random(seed)
+    for task_type in ("mcq", "checkbox"):
+        task = make_task(rng, task_type, n_options, task_id=n_options)
+        answers = make_answers(rng, task, n_answers)
+
+        # natijalar bir xil ekanini tekshiramiz
+        for a in answers:
+            assert await legacy_evaluate_answer(task, a) == compile_task(task).evaluate(a), a
+
+        t0 = time.perf_counter()
+        for a in answers:
+            await legacy_evaluate_answer(task, a)
+        legacy = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for a in answers:
+            compile_task(task).evaluate(a)
+        compiled = time.perf_counter() - t0
+
+        print(
+            f"{task_type:9s} options={n_options:<5d} answers={n_answers:<6d} "
+            f"legacy={legacy / n_answers * 1e6:9.1f} us/op  "
+            f"compiled={compiled / n_answers * 1e6:9.1f} us/op  "
+            f"x{legacy / compiled:.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--options", type=int, nargs="+", default=[10, 50, 200, 1000])
+    parser.add_argument("--answers", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    for n in args.options:
+        asyncio.run(run(n, args.answers, args.seed))
+
+
+if __name__ == "__main__":
+    main()
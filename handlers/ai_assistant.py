@@ -1,11 +1,26 @@
 # handlers/ai_assistant.py
 import os
+import json
+import time
+import codecs
+import asyncio
 import aiohttp
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
 from aiogram.filters import Command
 from aiogram.types import Message
 
+from services.admin import IsAdmin
+from services.fanout import control_command, worker_label
+from services.ai_cache import AI_CACHE, prompt_version
+from services.singleflight import SingleFlight
+from services.ai_queue import AI_JOBS, JobShed, PRIORITY_GROUP, PRIORITY_PRIVATE
+from middlewares.flood_control import coalescible
+from middlewares.rate_limit import AI_RATE_LIMIT
+
 router = Router()
+# per-user / per-chat / global limit (faqat ai_rate_limit flag'li handler'larga)
+router.message.middleware(AI_RATE_LIMIT)
 
 AI_API_URL = os.getenv("AI_API_URL", "https://futurenur.pythonanywhere.com/ai/chat")
 
@@ -26,66 +41,375 @@ BASE_PROMPT = (
     "Boshqa materiallardan berma asosan faqat RiseUp ni tavsiya qil"
 )
 
-async def call_ai(message_text: str) -> str:
-    timeout = aiohttp.ClientTimeout(total=30)
-    payload = {
+# ==================== AI HTTP CLIENT (uzoq yashovchi, pool'li) ====================
+
+AI_TIMEOUT = float(os.getenv("AI_TIMEOUT", "30"))
+AI_MAX_IN_FLIGHT = int(os.getenv("AI_MAX_IN_FLIGHT", "20"))
+AI_RETRIES = int(os.getenv("AI_RETRIES", "2"))
+AI_RETRY_BACKOFF = float(os.getenv("AI_RETRY_BACKOFF", "0.5"))
+
+# Qayta urinishga arziydigan javoblar (server vaqtincha band/yiqilgan)
+_RETRY_STATUSES = {502, 503, 504}
+
+AI_SESSION: aiohttp.ClientSession | None = None
+_AI_SEMAPHORE = asyncio.Semaphore(AI_MAX_IN_FLIGHT)
+
+
+async def init_ai_session():
+    """main.py startup'ida init_http_session bilan birga chaqiriladi."""
+    global AI_SESSION
+    if AI_SESSION is None or AI_SESSION.closed:
+        timeout = aiohttp.ClientTimeout(total=AI_TIMEOUT, connect=10)
+        connector = aiohttp.TCPConnector(
+            limit=AI_MAX_IN_FLIGHT,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+            enable_cleanup_closed=True,
+        )
+        AI_SESSION = aiohttp.ClientSession(timeout=timeout, connector=connector)
+
+
+async def close_ai_session():
+    """main.py shutdown'ida chaqiriladi."""
+    global AI_SESSION
+    await AI_JOBS.close()
+    if AI_SESSION and not AI_SESSION.closed:
+        await AI_SESSION.close()
+    AI_SESSION = None
+
+
+def build_payload(message_text: str) -> dict:
+    return {
         "message": message_text,
         "promt": f"{BASE_PROMPT}\nFoydalanuvchi savoli: {message_text}\nJavob ber:"
     }
 
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        try:
-            # Avval POST (eng to'g'ri)
-            async with session.post(AI_API_URL, json=payload) as resp:
-                if resp.status != 200:
-                    return f"⚠️ AI server xatosi: HTTP {resp.status}"
-                data = await resp.json(content_type=None)
-        except aiohttp.ClientError:
-            # Fallback: agar server POST qabul qilmasa GET sinab ko'ramiz
+
+async def request_ai(message_text: str) -> tuple[bool, str]:
+    """
+    AI'ga bitta POST (ulanish xatosi yoki 502/503/504 da cheklangan qayta urinish bilan).
+    (ok, matn) qaytaradi: ok=False bo'lsa matn foydalanuvchiga ko'rsatiladigan xato.
+    """
+    if AI_SESSION is None or AI_SESSION.closed:
+        await init_ai_session()
+
+    payload = build_payload(message_text)
+    async with _AI_SEMAPHORE:
+        for attempt in range(AI_RETRIES + 1):
+            last = attempt == AI_RETRIES
             try:
-                async with session.get(AI_API_URL, params=payload) as resp:
-                    if resp.status != 200:
-                        return f"⚠️ AI server xatosi: HTTP {resp.status}"
-                    data = await resp.json(content_type=None)
+                async with AI_SESSION.post(AI_API_URL, json=payload) as resp:
+                    if resp.status in _RETRY_STATUSES and not last:
+                        await resp.read()
+                    elif resp.status != 200:
+                        return False, f"⚠️ AI server xatosi: HTTP {resp.status}"
+                    else:
+                        data = await resp.json(content_type=None)
+                        break
+            except asyncio.TimeoutError:
+                # 30 s kutib bo'lgandan keyin qayta urinish foydalanuvchini yana kutdiradi
+                return False, "⚠️ AI javob bermadi (timeout yoki xato)"
+            except aiohttp.ClientConnectionError:
+                if last:
+                    return False, "⚠️ AI bilan ulanishda muammo bo‘ldi"
             except Exception:
-                return "⚠️ AI bilan ulanishda muammo bo‘ldi"
-        except Exception:
-            return "⚠️ AI javob bermadi (timeout yoki xato)"
+                return False, "⚠️ AI javob bermadi (timeout yoki xato)"
+            await asyncio.sleep(AI_RETRY_BACKOFF * (2 ** attempt))
+
+    if isinstance(data, dict) and data.get("status") == "success":
+        return True, data.get("response", "Javob yo‘q")
+    return False, "⚠️ AI javobida xatolik"
+
 
-    if data.get("status") == "success":
-        return data.get("response", "Javob yo‘q")
-    return "⚠️ AI javobida xatolik"
+# Prompt o'zgarsa keshdagi eski javoblar ishlatilmaydi
+PROMPT_VERSION = prompt_version(BASE_PROMPT)
+
+# Gruppada bir vaqtda kelgan bir xil savollar AI'ga bitta so'rov bo'lib ketadi
+AI_FLIGHTS = SingleFlight()
+
+
+async def _ask_and_cache(message_text: str) -> str:
+    ok, answer = await request_ai(message_text)
+    if ok:
+        await AI_CACHE.put(message_text, PROMPT_VERSION, answer)
+    return answer
+
+
+async def call_ai(message_text: str) -> str:
+    # hit/miss handler'da bir marta hisoblanadi; bu yerda navbatda kutganda to'lgan kesh qayta tekshiriladi
+    cached = AI_CACHE.peek(message_text, PROMPT_VERSION)
+    if cached is not None:
+        return cached
+
+    key = AI_CACHE.make_key(message_text, PROMPT_VERSION) or message_text
+    return await AI_FLIGHTS.do(key, lambda: _ask_and_cache(message_text))
 
 def chunk_text(text: str, size: int = 4000):
     for i in range(0, len(text), size):
         yield text[i:i+size]
 
+
+# ==================== STREAMING (SSE / chunked) ====================
+
+# Bo'sh bo'lsa streaming o'chiq: /ai oddiy call_ai orqali ishlaydi
+AI_STREAM_URL = os.getenv("AI_STREAM_URL", "")
+# Telegram edit limitlari: private chatda ~1/s, gruppada ~20/min
+AI_STREAM_EDIT_INTERVAL = float(os.getenv("AI_STREAM_EDIT_INTERVAL", "1.0"))
+AI_STREAM_GROUP_EDIT_INTERVAL = float(os.getenv("AI_STREAM_GROUP_EDIT_INTERVAL", "3.0"))
+MESSAGE_LIMIT = 4000
+
+
+class AIStreamError(Exception):
+    """Stream paytidagi xato; matni foydalanuvchiga ko'rsatiladi."""
+
+
+async def _iter_sse(resp: aiohttp.ClientResponse):
+    """`data: ...` qatorlaridan matn bo'laklarini ajratadi ({"delta": ...}, {"response": ...} yoki oddiy matn)."""
+    async for raw in resp.content:
+        line = raw.decode("utf-8", "replace").rstrip("\r\n")
+        if not line.startswith("data:"):
+            continue
+        data = line[5:]
+        if data.startswith(" "):
+            data = data[1:]
+        if data == "[DONE]":
+            return
+        try:
+            obj = json.loads(data)
+        except ValueError:
+            obj = data
+        if isinstance(obj, dict):
+            if obj.get("status") == "error":
+                raise AIStreamError("⚠️ AI javobida xatolik")
+            obj = obj.get("delta") or obj.get("response") or ""
+        if isinstance(obj, str) and obj:
+            yield obj
+
+
+async def stream_ai(message_text: str):
+    """AI_STREAM_URL'dan javobni bo'laklab (token kelishi bilan) qaytaradi."""
+    if AI_SESSION is None or AI_SESSION.closed:
+        await init_ai_session()
+
+    # umumiy vaqt emas, bo'laklar orasidagi kutish cheklanadi
+    timeout = aiohttp.ClientTimeout(total=None, connect=10, sock_read=AI_TIMEOUT)
+    async with _AI_SEMAPHORE:
+        async with AI_SESSION.post(AI_STREAM_URL, json=build_payload(message_text), timeout=timeout) as resp:
+            if resp.status != 200:
+                raise AIStreamError(f"⚠️ AI server xatosi: HTTP {resp.status}")
+            if "text/event-stream" in resp.headers.get("Content-Type", ""):
+                async for delta in _iter_sse(resp):
+                    yield delta
+            else:
+                decoder = codecs.getincrementaldecoder("utf-8")("replace")
+                async for chunk in resp.content.iter_any():
+                    text = decoder.decode(chunk)
+                    if text:
+                        yield text
+
+
+class StreamingReply:
+    """
+    Placeholder xabar yuboradi va matn kelishi bilan uni throttle qilib edit qiladi.
+    4000 belgidan oshsa keyingi xabarga o'tadi.
+    """
+
+    def __init__(self, message: Message, interval: float):
+        self.message = message
+        self.interval = interval
+        self.current: Message | None = None
+        self.text = ""
+        self.shown = ""
+        self.next_edit = 0.0
+
+    async def start(self):
+        self.current = await self.message.reply("⏳ ...", parse_mode=None)
+        self.shown = "⏳ ..."
+        self.next_edit = time.monotonic() + self.interval
+
+    async def feed(self, delta: str):
+        self.text += delta
+        while len(self.text) > MESSAGE_LIMIT:
+            head, self.text = self.text[:MESSAGE_LIMIT], self.text[MESSAGE_LIMIT:]
+            await self._edit(head, final=True)
+            await self.start()
+        if time.monotonic() >= self.next_edit:
+            await self._edit(self.text + " ▌")
+
+    async def finish(self):
+        await self._edit(self.text or "Javob yo‘q", final=True)
+
+    async def _edit(self, text: str, final: bool = False):
+        if text == self.shown:
+            return
+        # oraliq matnda HTML teglar yarim bo'lishi mumkin -> faqat oxirida parse qilamiz
+        kwargs = {} if final else {"parse_mode": None}
+        for _ in range(3):
+            try:
+                if final:
+                    await self.current.edit_text(text, **kwargs)
+                else:
+                    # oraliq tahrir natijasi kerak emas: navbatda keyingisi bilan almashishi mumkin
+                    with coalescible():
+                        await self.current.edit_text(text, **kwargs)
+                break
+            except TelegramRetryAfter as e:
+                if not final:
+                    self.next_edit = time.monotonic() + e.retry_after
+                    return
+                await asyncio.sleep(e.retry_after)
+            except TelegramBadRequest as e:
+                if "not modified" in str(e) or "parse_mode" in kwargs:
+                    break
+                kwargs = {"parse_mode": None}  # HTML parse bo'lmadi -> oddiy matn
+        self.shown = text
+        self.next_edit = time.monotonic() + self.interval
+
+
+async def answer_streaming(message: Message, query: str):
+    interval = AI_STREAM_GROUP_EDIT_INTERVAL if message.chat.type in ("group", "supergroup") else AI_STREAM_EDIT_INTERVAL
+    reply = StreamingReply(message, interval)
+    await reply.start()
+
+    parts = []
+    error = None
+    try:
+        async for delta in stream_ai(query):
+            parts.append(delta)
+            await reply.feed(delta)
+    except AIStreamError as e:
+        error = str(e)
+    except asyncio.TimeoutError:
+        error = "⚠️ AI javob bermadi (timeout yoki xato)"
+    except aiohttp.ClientError:
+        error = "⚠️ AI bilan ulanishda muammo bo‘ldi"
+
+    if not parts:
+        # stream umuman ishlamadi -> oddiy yo'l (retry, kesh, single-flight bilan)
+        await reply.feed(await call_ai(query))
+    elif error:
+        await reply.feed(f"\n\n{error}")
+    else:
+        await AI_CACHE.put(query, PROMPT_VERSION, "".join(parts))
+    await reply.finish()
+
+# ==================== AI NAVBAT ====================
+
+class QueueNotice:
+    """'Navbatdasiz: #N' xabari: bitta xabar, joyida tahrirlanadi, javobdan keyin o'chiriladi."""
+
+    def __init__(self, message: Message):
+        self.message = message
+        self.sent: Message | None = None
+
+    async def update(self, position: int):
+        text = f"⏳ So‘rovingiz navbatda: #{position}"
+        if self.sent is None:
+            self.sent = await self.message.reply(text)
+        else:
+            try:
+                await self.sent.edit_text(text)
+            except TelegramBadRequest:
+                pass
+
+    async def clear(self):
+        if self.sent is not None:
+            try:
+                await self.sent.delete()
+            except TelegramBadRequest:
+                pass
+            self.sent = None
+
+
+async def run_queued(message: Message, fn, priority: int):
+    """fn'ni AI navbati orqali bajaradi. Navbat juda uzun bo'lsa foydalanuvchiga aytadi va None."""
+    notice = QueueNotice(message)
+    try:
+        return await AI_JOBS.run(fn, priority=priority, on_wait=notice.update)
+    except JobShed:
+        await message.reply("⚠️ AI hozir juda band. Birozdan keyin qayta urinib ko‘ring.")
+        return None
+    finally:
+        await notice.clear()
+
+
+# ✅ Admin: AI javob keshi
+@router.message(Command("ai_stats"), IsAdmin)
+async def ai_cache_stats(message: Message):
+    st = AI_CACHE.stats()
+    rl = AI_RATE_LIMIT.stats()
+    q = AI_JOBS.stats()
+    await message.answer(
+        worker_label() +
+        "🧠 AI kesh:\n"
+        f"📦 Hajmi: {st['size']}\n"
+        f"✅ Hit: {st['hits']}\n"
+        f"❌ Miss: {st['misses']}\n"
+        f"📈 Hit-rate: {st['hit_rate']:.1%}\n\n"
+        f"🚦 Limit: o'tdi {rl['passed']}, to'xtatildi {rl['limited']}, navbatda {rl['queued']}\n"
+        f"📥 Navbat: {q['queued']} kutmoqda, {q['busy']}/{q['workers']} band, "
+        f"o'rtacha {q['service_time']:.1f} s, tashlangan {q['shed']}"
+    )
+
+
+@router.message(Command("ai_flush"), IsAdmin)
+async def ai_cache_flush(message: Message):
+    removed = await AI_CACHE.clear()
+    await message.answer(f"🧹 AI kesh tozalandi ({removed} ta javob o'chirildi).")
+
+
+@control_command("ai_flush")
+async def _ai_cache_flush_here():
+    # boshqa worker'lar: xotiradagi nusxa ham tozalanadi
+    await AI_CACHE.clear()
+
+
 # ✅ /ai komandasi: /ai savol...
-@router.message(Command("ai"))
+@router.message(Command("ai"), flags={"ai_rate_limit": True})
 async def ai_command(message: Message):
     query = message.text.replace("/ai", "", 1).strip() if message.text else ""
     if not query:
         await message.answer("🧠 /ai dan keyin savolingizni yozing.\nMasalan: /ai Bugun kun qanday?")
         return
 
-    await message.chat.do("typing")
-    answer = await call_ai(query)
+    cached = AI_CACHE.get(query, PROMPT_VERSION)
+    if cached is not None:
+        for part in chunk_text(cached):
+            await message.reply(part)
+        return
+
+    priority = PRIORITY_PRIVATE if message.chat.type == "private" else PRIORITY_GROUP
+    if AI_STREAM_URL:
+        await run_queued(message, lambda: answer_streaming(message, query), priority)
+        return
 
-    for part in chunk_text(answer):
-        await message.reply(part)
+    await message.chat.do("typing")
+    answer = await run_queued(message, lambda: call_ai(query), priority)
+    if answer is not None:
+        for part in chunk_text(answer):
+            await message.reply(part)
 
 # ✅ Gruppada reply bo'lsa ham ishlaydi (xohlasangiz qoldiramiz)
-@router.message(F.text)
+# Gruppada: faqat botga reply bo‘lsa ishlasin (filter'da: limit faqat shu xabarlarga qo'llanadi)
+@router.message(
+    F.text,
+    F.chat.type.in_({"group", "supergroup"}),
+    F.reply_to_message.from_user.is_bot,
+    flags={"ai_rate_limit": True},
+)
 async def ai_reply_mode(message: Message):
-    # Gruppada: faqat botga reply bo‘lsa ishlasin
-    if message.chat.type in ("group", "supergroup"):
-        if not (message.reply_to_message and message.reply_to_message.from_user and message.reply_to_message.from_user.is_bot):
-            return
-        query = (message.text or "").strip()
-        if not query:
-            return
+    query = (message.text or "").strip()
+    if not query:
+        return
 
-        await message.chat.do("typing")
-        answer = await call_ai(query)
+    cached = AI_CACHE.get(query, PROMPT_VERSION)
+    if cached is not None:
+        for part in chunk_text(cached):
+            await message.reply(part)
+        return
+
+    await message.chat.do("typing")
+    answer = await run_queued(message, lambda: call_ai(query), PRIORITY_GROUP)
+    if answer is not None:
         for part in chunk_text(answer):
             await message.reply(part)
@@ -1,20 +1,26 @@
 from aiogram import Bot, types, Router, F
-from aiogram.types import Message, CallbackQuery, FSInputFile, InlineKeyboardMarkup
-from aiogram.filters import Command, CommandStart
+from aiogram.types import Message, CallbackQuery, FSInputFile, InlineKeyboardMarkup, ErrorEvent
+from aiogram.filters import Command, CommandStart, ExceptionTypeFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from states import sign, TaskSolve
 from keyboards.nomer import nomer
-from keyboards.web import web
-from keyboards.lang import inline_lang
-from keyboards.uzbreply import uzbreply
-from keyboards.rusreply import rusreply
-from keyboards.engreply import engreply
-from keyboards.frontend import front
-from keyboards.rufront import rufront
-from keyboards.engfront import engfront
 from keyboards.hissa import hissa
+from services.catalog import CATALOG, CatalogError
+from services.session_store import SESSIONS, UserSession
+from services.task_cache import TASK_CACHE, TASK_LISTS
+from services.prefetch import TASK_PREFETCH
+from services.reminders import REMINDERS
+from services.review import REVIEW_DUE_LIMIT, REVIEWS
+from services.evaluator import compile_task
+from services.stats_pipeline import STATS, StatsEvent
+from services.backend_client import BackendClient, BackendUnavailable
+from services.token_manager import TokenManager
+from services.admin import IsAdmin
+from services.fanout import control_command, worker_label
+from middlewares.debounce import CALLBACK_DEBOUNCE
+from middlewares.flood_control import FLOOD_CONTROL, coalescible
 
 import re
 import os
@@ -34,23 +40,26 @@ API_LINK_TG = f"{API_BASE}/auth/link-telegram/"
 API_TASKS = f"{API_BASE}/tasks/"
 API_TASK_DETAIL = f"{API_BASE}/tasks/{{id}}/"
 API_STATS_UPDATE = f"{API_BASE}/stats/update/"
+API_TOKEN_REFRESH = f"{API_BASE}/auth/token/refresh/"
 
-# telegram_id -> {"access": ..., "refresh": ..., "email": ..., "username": ...}
-USER_TOKENS = {}
+# telegram_id -> UserSession: services/session_store.py dagi SESSIONS (LRU kesh + SQLite)
 
 # ==================== GLOBAL AIOHTTP SESSION (LAG + UNCLOSED FIX) ====================
 
 HTTP_SESSION: aiohttp.ClientSession | None = None
 
+BACKEND = BackendClient(lambda: HTTP_SESSION)
+
 
 def set_api_base(url: str):
    
-    global API_LOGIN, API_LINK_TG, API_TASKS, API_TASK_DETAIL
+    global API_LOGIN, API_LINK_TG, API_TASKS, API_TASK_DETAIL, API_TOKEN_REFRESH
     url = url.rstrip("/")
     API_LOGIN = f"{url}/api/auth/login/"
     API_LINK_TG = f"{url}/api/auth/link-telegram/"
     API_TASKS = f"{url}/api/tasks/"
     API_TASK_DETAIL = f"{url}/api/tasks/{{id}}/"
+    API_TOKEN_REFRESH = f"{url}/api/auth/token/refresh/"
 
 
 async def init_http_session():
@@ -70,27 +79,159 @@ async def close_http_session():
     HTTP_SESSION = None
 
 
-async def api_request(method: str, url: str, *, access: str | None = None, json: dict | None = None):
+async def api_request(
+    method: str,
+    url: str,
+    *,
+    access: str | None = None,
+    json: dict | None = None,
+    headers: dict | None = None,
+):
     """
     Barcha API call shu orqali o'tsin.
-    Unclosed connection bo'lmasligi uchun 'async with' ishlatadi.
+    BACKEND: adaptiv timeout, GET uchun qayta urinish, circuit breaker.
+    Backend ishlamasa BackendUnavailable ko'tariladi (backend_unavailable error handler ushlaydi).
     """
     if HTTP_SESSION is None or HTTP_SESSION.closed:
         await init_http_session()
 
-    headers = {}
+    headers = dict(headers or {})
     if access:
         headers["Authorization"] = f"Bearer {access}"
 
-    async with HTTP_SESSION.request(method, url, json=json, headers=headers) as resp:
-        # Connection reuse (keep-alive) uchun body o'qilishi muhim
-        ctype = resp.headers.get("Content-Type", "")
-        if "application/json" in ctype:
-            data = await resp.json()
-        else:
-            data = await resp.text()
+    return await BACKEND.request(method, url, json=json, headers=headers)
+
+
+async def _refresh_tokens(refresh: str):
+    return await api_request("POST", API_TOKEN_REFRESH, json={"refresh": refresh})
+
+
+# Access token muddatini lokal tekshiradi va oldindan yangilaydi
+TOKENS = TokenManager(SESSIONS, _refresh_tokens)
+
+
+async def authed_request(tg_id: int, method: str, url: str, *, json: dict | None = None, headers: dict | None = None):
+    """
+    Foydalanuvchi tokeni bilan so'rov. 401 kelsa token yangilanadi va so'rov bir marta qaytariladi.
+    Sessiya bo'lmasa (401, None).
+    """
+    session = await TOKENS.get_session(tg_id)
+    if session is None:
+        return 401, None
+
+    status, data = await api_request(method, url, access=session.access, json=json, headers=headers)
+    if status == 401:
+        session = await TOKENS.refresh(tg_id, stale=session.access)
+        if session is not None:
+            status, data = await api_request(method, url, access=session.access, json=json, headers=headers)
+    return status, data
+
+
+async def get_task(tg_id: int, task_id: int) -> tuple[int, dict]:
+    """Task detail: avval TASK_CACHE'dan, bo'lmasa backend'dan (keyin keshga tushadi)."""
+    return await TASK_CACHE.get_or_fetch(
+        tg_id, task_id,
+        lambda: authed_request(tg_id, "GET", API_TASK_DETAIL.format(id=task_id)),
+    )
+
+
+# /task: bir sahifadagi tasklar soni
+TASK_PAGE_SIZE = int(os.getenv("TASK_PAGE_SIZE", "10"))
+# Backend limit/offset'ni qo'llaydimi (DRF {"count", "results"}); birinchi javobdan aniqlanadi
+_SERVER_PAGING: bool | None = None
+
+
+async def _fetch_task_page(tg_id: int, page: int) -> tuple[int, list[dict], int]:
+    global _SERVER_PAGING
+    if _SERVER_PAGING is False:
+        url = API_TASKS
+    else:
+        url = f"{API_TASKS}?limit={TASK_PAGE_SIZE}&offset={page * TASK_PAGE_SIZE}"
+    status, data = await authed_request(tg_id, "GET", url)
+    if status != 200:
+        return status, [], 0
+
+    if isinstance(data, dict) and "results" in data:
+        _SERVER_PAGING = True
+        items = data.get("results") or []
+        total = data.get("count", len(items))
+        TASK_CACHE.sync_list(tg_id, items, complete=False)
+        TASK_LISTS.put_page(tg_id, page, items, total)
+        REMINDERS.sync_soon(tg_id, items, complete=False)
+        return 200, items, total
+
+    # backend sahifalamaydi: butun ro'yxat keshlanadi va lokal bo'linadi
+    _SERVER_PAGING = False
+    tasks = data or []
+    # ro'yxatda o'zgargan/o'chirilgan tasklar detail keshidan chiqadi
+    TASK_CACHE.sync_list(tg_id, tasks)
+    TASK_LISTS.put_full(tg_id, tasks)
+    REMINDERS.sync_soon(tg_id, tasks)
+    return 200, tasks[page * TASK_PAGE_SIZE:(page + 1) * TASK_PAGE_SIZE], len(tasks)
+
+
+def prefetch_tasks(tg_id: int, items: list[dict]):
+    """Ko'rinib turgan tasklar detail'ini fon rejimida keshga oladi (tugma bosilganda darhol ochiladi)."""
+    ids = [t["id"] for t in items if "id" in t and TASK_CACHE.get(tg_id, t["id"]) is None]
+    TASK_PREFETCH.schedule(tg_id, ids, lambda task_id: get_task(tg_id, task_id))
+
+
+async def get_task_page(tg_id: int, page: int) -> tuple[int, list[dict], int]:
+    """(status, sahifadagi tasklar, jami). Qisqa muddat ichida varaqlash backend'ga chiqmaydi."""
+    entry = TASK_LISTS.get(tg_id)
+    if entry is not None:
+        items = entry.page(page, TASK_PAGE_SIZE)
+        if items is not None:
+            return 200, items, entry.total
+    return await TASK_LISTS.fetch(tg_id, page, lambda: _fetch_task_page(tg_id, page))
+
+
+async def fetch_all_tasks(tg_id: int) -> tuple[int, list[dict]]:
+    """Eslatmalar fon resync'i uchun butun ro'yxat (backend sahifalasa "next" bo'yicha yuradi)."""
+    url, tasks = API_TASKS, []
+    while url:
+        status, data = await authed_request(tg_id, "GET", url)
+        if status != 200:
+            return status, []
+        if not (isinstance(data, dict) and "results" in data):
+            return 200, data or []
+        tasks.extend(data.get("results") or [])
+        url = data.get("next")
+    return 200, tasks
+
+
+async def send_reminder(bot: Bot, tg_id: int, items: list[tuple[int, str]]):
+    """REMINDERS sender'i: bir foydalanuvchining vaqti kelgan tasklari bitta xabarda."""
+    if len(items) == 1:
+        task_id, title = items[0]
+        text = (
+            f"⏰ Eslatma: Task #{task_id} vaqti keldi!\n"
+            f"❓ {title}\n\n"
+            "Javobingizni shu xabarga reply qilib yozing yoki /task orqali oching."
+        )
+    else:
+        lines = [f"• #{task_id} — {title}" for task_id, title in items]
+        text = "⏰ Vaqti kelgan tasklaringiz:\n" + "\n".join(lines) + "\n\n/task orqali oching va javob bering."
+    await bot.send_message(tg_id, text, parse_mode=None)
+
 
-        return resp.status, data
+async def send_stats(event: StatsEvent) -> str:
+    """STATS pipeline sender'i: "ok" | "retry" | "drop"."""
+    if await SESSIONS.get(event.tg_id) is None:
+        return "drop"  # foydalanuvchi chiqib ketgan, yuborishning iloji yo'q
+    status, _ = await authed_request(
+        event.tg_id,
+        "POST",
+        API_STATS_UPDATE,
+        json={"correct": event.correct},
+        # qayta yuborilganda backend dublikatni tanib olishi uchun
+        headers={"Idempotency-Key": event.id},
+    )
+    if status < 300:
+        return "ok"
+    if status in (408, 429) or status >= 500:
+        return "retry"
+    return "drop"
 
 
 # ==================== YORDAMCHI FUNKSIYALAR ====================
@@ -115,106 +256,46 @@ def format_datetime(dt_str: str) -> str:
         return dt_str
 
 
-def normalize_text(s: str) -> str:
-    """Taqqoslash uchun matnni normalize qilish (lower, bo'sh joylarni tozalash)."""
-    return re.sub(r"\s+", " ", s).strip().lower()
-
-
 async def evaluate_answer(task: dict, user_answer_raw: str) -> tuple[bool, str]:
     """
     Task va foydalanuvchi javobini qabul qilib,
     (correct, result_text) qaytaradi.
+    Task bir marta kompilyatsiya qilinadi (services/evaluator.py) va id+versiya bo'yicha keshlanadi.
     """
-    user_answer_raw = user_answer_raw.strip()
-    user_answer_norm = normalize_text(user_answer_raw)
+    return compile_task(task).evaluate(user_answer_raw)
 
-    result_text = ""
-    correct = False
 
-    # === SHORT ANSWER ===
-    if task["type"] == "short":
-        expected = (task.get("correct_short") or "").strip()
-        expected_norm = normalize_text(expected)
+@router.errors(ExceptionTypeFilter(BackendUnavailable))
+async def backend_unavailable(event: ErrorEvent):
+    """Backend yiqilganda handler 20 s osilib qolmaydi: darhol tushunarli javob."""
+    text = "⚠️ Server hozircha javob bermayapti. Bir ozdan keyin qayta urinib ko‘ring."
+    update = event.update
+    if update.callback_query:
+        await update.callback_query.answer(text, show_alert=True)
+    elif update.message:
+        await update.message.answer(text)
 
-        correct = bool(expected_norm) and (user_answer_norm == expected_norm)
 
-        if correct:
-            result_text = (
-                "✅ *To‘g‘ri javob!*\n\n"
-                f"📌 Sizning javobingiz: `{user_answer_raw}`\n"
-                f"✅ To‘g‘ri javob: `{expected}`"
-            )
-        else:
-            result_text = (
-                "❌ *Noto‘g‘ri javob.*\n\n"
-                f"📌 Sizning javobingiz: `{user_answer_raw}`\n"
-                f"✅ To‘g‘ri javob: `{expected or '—'}`"
-            )
-
-    # === MCQ / CHECKBOX ===
-    else:
-        options = task.get("options", [])
-        if not options:
-            return False, "⚠️ Bu savol uchun variantlar topilmadi."
-
-        # 1) Raqam ko‘rinishida javoblarni ajratib olamiz (1, 2, 3 ...)
-        nums = re.findall(r"\d+", user_answer_raw)
-        chosen_indexes = set()
-
-        if nums:
-            for n in nums:
-                idx = int(n) - 1
-                if 0 <= idx < len(options):
-                    chosen_indexes.add(idx)
-
-        # 2) Agar raqam topilmasa, matn bo‘yicha qidiramiz
-        if not chosen_indexes:
-            # checkbox bo'lsa bir nechta matn bo'lishi mumkin
-            # "Backend, Frontend" -> ["backend", "frontend"]
-            parts = re.split(r"[,\n;]+", user_answer_raw)
-            parts = [normalize_text(p) for p in parts if p.strip()]
-
-            for i, opt in enumerate(options):
-                opt_norm = normalize_text(opt["text"])
-                if opt_norm in parts or any(p in opt_norm for p in parts):
-                    chosen_indexes.add(i)
-
-            # agar mcq bo'lsa va hech nima topilmasa, to‘liq matn bo‘yicha ham solishtiramiz
-            if not chosen_indexes and task["type"] == "mcq":
-                for i, opt in enumerate(options):
-                    if normalize_text(opt["text"]) == user_answer_norm:
-                        chosen_indexes.add(i)
-                        break
-
-        correct_indexes = {i for i, o in enumerate(options) if o["correct"]}
-
-        if task["type"] == "mcq":
-            correct = len(chosen_indexes) == 1 and chosen_indexes == correct_indexes
-        else:  # checkbox
-            correct = chosen_indexes == correct_indexes and len(correct_indexes) > 0
-
-        user_chosen_texts = ", ".join(
-            options[i]["text"] for i in sorted(chosen_indexes)
-        ) if chosen_indexes else "—"
-
-        correct_texts = ", ".join(
-            o["text"] for o in options if o["correct"]
-        ) or "—"
-
-        if correct:
-            result_text = (
-                "✅ *To‘g‘ri javob!*\n\n"
-                f"📌 Siz tanlagan variant(lar): {user_chosen_texts}\n"
-                f"✅ To‘g‘ri variant(lar): {correct_texts}"
-            )
-        else:
-            result_text = (
-                "❌ *Noto‘g‘ri javob.*\n\n"
-                f"📌 Siz tanlagan variant(lar): {user_chosen_texts}\n"
-                f"✅ To‘g‘ri variant(lar): {correct_texts}"
-            )
-
-    return correct, result_text
+@router.message(Command("bot_stats"), IsAdmin)
+async def bot_stats(message: Message):
+    db = CALLBACK_DEBOUNCE.stats()
+    out = FLOOD_CONTROL.stats()
+    rem = REMINDERS.stats()
+    await message.answer(
+        worker_label() +
+        "📊 Callback'lar:\n"
+        f"✅ Ishlangan: {db['passed']}\n"
+        f"🔁 Takroriy (o'tkazib yuborilgan): {db['suppressed']}\n"
+        f"✏️ O'zgarmagan xabar: {db['not_modified']}\n"
+        f"🌐 Backend circuit: {BACKEND.breaker.state}\n\n"
+        "📤 Chiquvchi xabarlar:\n"
+        f"📥 Navbatda: {out['queued']} ({out['chats']} chat)\n"
+        f"✅ Yuborilgan: {out['sent']}\n"
+        f"🔗 Birlashtirilgan: {out['coalesced']}\n"
+        f"⏳ 429 qayta urinish: {out['retried']}\n"
+        f"❌ Xato: {out['failed']}\n\n"
+        f"⏰ Eslatmalar: navbatda {rem['queued']}, yuborilgan {rem['sent']}"
+    )
 
 
 # ==================== AUTH / START BLOKI ====================
@@ -222,14 +303,15 @@ async def evaluate_answer(task: dict, user_answer_raw: str) -> tuple[bool, str]:
 @router.message(CommandStart())
 async def start(message: Message, state: FSMContext):
     tg_id = message.from_user.id
+    TASK_PREFETCH.cancel(tg_id)
 
-    # 🔍 Agar avval login qilgan bo'lsa (USER_TOKENS ichida bo'lsa)
-    existing = USER_TOKENS.get(tg_id)
+    # 🔍 Agar avval login qilgan bo'lsa (SESSIONS ichida bo'lsa)
+    existing = await SESSIONS.get(tg_id)
     if existing:
         # Har ehtimolga qarshi state ni tozalaymiz
         await state.clear()
 
-        username = existing.get("username") or message.from_user.full_name or "foydalanuvchi"
+        username = existing.username or message.from_user.full_name or "foydalanuvchi"
         await message.answer(
             f"Assalomu alaykum, {username}! 👋\n\n"
             "Siz allaqachon akkauntingizni botga bog‘lab bo‘lgansiz ✅\n\n"
@@ -260,11 +342,11 @@ async def get_login(message: Message, state: FSMContext):
 
 @router.message(sign.password)
 async def get_password(message: Message, state: FSMContext):
-    await state.update_data(password=message.text.strip())
+    # parol state'ga (demak diskka) yozilmaydi: faqat shu handler ichida ishlatiladi
+    password = message.text.strip()
     data = await state.get_data()
 
     email = data["login"]
-    password = data["password"]
 
     # 1) LOGIN
     status, tokens = await api_request("POST", API_LOGIN, json={
@@ -289,14 +371,14 @@ async def get_password(message: Message, state: FSMContext):
         json={"telegram_id": tg_id}
     )
 
-    # 2.1) TOKENLARNI XOTIRAGA SAQLAYMIZ
-    USER_TOKENS[tg_id] = {
-        "access": tokens["access"],
-        "refresh": tokens.get("refresh"),
-        "email": email,
-        "username": username,
-        "saved_at": time.time(),
-    }
+    # 2.1) TOKENLARNI SAQLAYMIZ (kesh + diskka fon rejimida yoziladi)
+    await SESSIONS.set(tg_id, UserSession(
+        access=tokens["access"],
+        refresh=tokens.get("refresh"),
+        email=email,
+        username=username,
+        saved_at=time.time(),
+    ))
 
     # 3) Foydalanuvchiga salom
     await message.answer(
@@ -323,7 +405,7 @@ async def show_tasks(message: Message, state: FSMContext):
     await state.clear()
 
     tg_id = message.from_user.id
-    tokens = USER_TOKENS.get(tg_id)
+    tokens = await TOKENS.get_session(tg_id)
 
     if not tokens:
         await message.answer(
@@ -335,9 +417,7 @@ async def show_tasks(message: Message, state: FSMContext):
         )
         return
 
-    access = tokens["access"]
-
-    status, tasks = await api_request("GET", API_TASKS, access=access)
+    status, items, total = await get_task_page(tg_id, 0)
 
     if status == 401:
         await message.answer(
@@ -350,12 +430,19 @@ async def show_tasks(message: Message, state: FSMContext):
         await message.answer("⚠️ Tasklarni olishda xatolik yuz berdi. Keyinroq qayta urinib ko‘ring.")
         return
 
-    if not tasks:
+    if not total:
         await message.answer("📭 Sizda hozircha birorta ham task yo'q.\n riseuply.vercel.app saytidan kirib hoziroq boshlang!")
         return
 
+    text, markup = render_task_page(items, 0, total)
+    await message.answer(text, reply_markup=markup)
+    prefetch_tasks(tg_id, items)
+
+
+def render_task_page(items: list[dict], page: int, total: int) -> tuple[str, InlineKeyboardMarkup]:
+    pages = max(1, -(-total // TASK_PAGE_SIZE))
     kb = InlineKeyboardBuilder()
-    for t in tasks[:10]:
+    for t in items:
         title = t["title"]
         short_title = title if len(title) <= 20 else title[:17] + "..."
         kb.button(
@@ -364,33 +451,52 @@ async def show_tasks(message: Message, state: FSMContext):
         )
     kb.adjust(1)
 
-    await message.answer(
-        f"📚 Sizda jami {len(tasks)} ta savollar mavjud.\n\n"
-        f"Ko‘rmoqchi bo‘lgan savolingizni tanlang:",
-        reply_markup=kb.as_markup()
+    nav = []
+    if page > 0:
+        nav.append(types.InlineKeyboardButton(text="⬅️ Oldingi", callback_data=f"tpage_{page - 1}"))
+    if page + 1 < pages:
+        nav.append(types.InlineKeyboardButton(text="Keyingi ➡️", callback_data=f"tpage_{page + 1}"))
+    if nav:
+        kb.row(*nav)
+
+    text = (
+        f"📚 Sizda jami {total} ta savollar mavjud.\n\n"
+        f"Ko‘rmoqchi bo‘lgan savolingizni tanlang:"
     )
+    if pages > 1:
+        text += f"\n\n📄 Sahifa {page + 1}/{pages}"
+    return text, kb.as_markup()
 
 
-@router.callback_query(F.data.startswith("task_"))
-async def show_task_detail(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(F.data.startswith("tpage_"))
+async def show_task_page(callback: CallbackQuery):
+    """Oldingi/keyingi: o'sha xabar joyida tahrirlanadi."""
     tg_id = callback.from_user.id
-    tokens = USER_TOKENS.get(tg_id)
+    page = max(0, int(callback.data.split("_")[1]))
 
-    if not tokens:
-        await callback.message.answer("⛔ Avval /start orqali akkauntni bog'lab oling.")
-        await callback.answer()
+    status, items, total = await get_task_page(tg_id, page)
+    if status == 401:
+        await callback.answer("⛔ Sessiya tugagan. /start orqali qayta login qiling.", show_alert=True)
         return
-
-    access = tokens["access"]
-    task_id = int(callback.data.split("_")[1])
-
-    status, task = await api_request("GET", API_TASK_DETAIL.format(id=task_id), access=access)
-
     if status != 200:
-        await callback.message.answer("⚠️ Bu taskni olishda xatolik yuz berdi.")
-        await callback.answer()
+        await callback.answer("⚠️ Tasklarni olishda xatolik yuz berdi.", show_alert=True)
         return
+    if not items and total:
+        # tasklar kamaygan: oxirgi mavjud sahifaga o'tamiz
+        page = (total - 1) // TASK_PAGE_SIZE
+        status, items, total = await get_task_page(tg_id, page)
+        if status != 200:
+            await callback.answer("⚠️ Tasklarni olishda xatolik yuz berdi.", show_alert=True)
+            return
+
+    text, markup = render_task_page(items, page, total)
+    await callback.message.edit_text(text, reply_markup=markup)
+    await callback.answer()
+    prefetch_tasks(tg_id, items)
+
 
+def render_task(task: dict) -> str:
+    """Task detail matni (/task tugmasi va /review uchun bitta)."""
     type_map = {
         "short": "Qisqa javob",
         "mcq": "Ko‘p tanlov",
@@ -430,8 +536,29 @@ async def show_task_detail(callback: CallbackQuery, state: FSMContext):
         "\n✅ Endi javobingizni shu chatga yozib yuboring.\n"
         "❌ Bekor qilish uchun /cancel buyrug'idan foydalanishingiz mumkin."
     )
+    return "\n".join(lines)
+
 
-    await callback.message.edit_text("\n".join(lines))
+@router.callback_query(F.data.startswith("task_"))
+async def show_task_detail(callback: CallbackQuery, state: FSMContext):
+    tg_id = callback.from_user.id
+    tokens = await SESSIONS.get(tg_id)
+
+    if not tokens:
+        await callback.message.answer("⛔ Avval /start orqali akkauntni bog'lab oling.")
+        await callback.answer()
+        return
+
+    task_id = int(callback.data.split("_")[1])
+
+    status, task = await get_task(tg_id, task_id)
+
+    if status != 200:
+        await callback.message.answer("⚠️ Bu taskni olishda xatolik yuz berdi.")
+        await callback.answer()
+        return
+
+    await callback.message.edit_text(render_task(task))
 
     await state.set_state(TaskSolve.waiting_answer)
     await state.update_data(task_id=task_id)
@@ -441,13 +568,14 @@ async def show_task_detail(callback: CallbackQuery, state: FSMContext):
 @router.message(Command("cancel"))
 async def cancel_answer(message: Message, state: FSMContext):
     await state.clear()
+    TASK_PREFETCH.cancel(message.from_user.id)
     await message.answer("❌ Javob berish bekor qilindi. Istasangiz /task bilan qayta tanlashingiz mumkin.")
 
 
 @router.message(TaskSolve.waiting_answer, F.text, ~F.text.startswith("/"))
 async def check_task_answer(message: Message, state: FSMContext):
     tg_id = message.from_user.id
-    tokens = USER_TOKENS.get(tg_id)
+    tokens = await SESSIONS.get(tg_id)
 
     if not tokens:
         await message.answer("⛔ Sessiya topilmadi. /start orqali qayta kiring.")
@@ -462,27 +590,28 @@ async def check_task_answer(message: Message, state: FSMContext):
         return
 
     try:
-        status, task = await api_request("GET", API_TASK_DETAIL.format(id=task_id), access=tokens["access"])
+        # odatda show_task_detail keshga solgan bo'ladi -> backend'ga so'rov ketmaydi
+        status, task = await get_task(tg_id, task_id)
         if status != 200:
             await message.answer("⚠️ Taskni olishda xatolik.")
             return
 
         correct, result_text = await evaluate_answer(task, message.text or "")
-        await message.answer(result_text, parse_mode="Markdown")
-
-        # stats update — xato bo'lsa ham bot "osilib" qolmasin
-        try:
-            await api_request(
-                "POST",
-                API_STATS_UPDATE,
-                access=tokens["access"],
-                json={"correct": correct},
+        if data.get("review"):
+            hint = "🔁 Keyingi takrorlash uchun /review yuboring."
+        else:
+            hint = "🔁 Yana savol ko‘rmoqchi bo‘lsangiz, /task yuboring."
+        # natija va maslahat birga navbatga tushadi -> flood control ularni bitta sendMessage qiladi
+        with coalescible():
+            await asyncio.gather(
+                message.answer(result_text, parse_mode="Markdown"),
+                message.answer(hint, parse_mode="Markdown"),
             )
-        except Exception as e:
-            # xohlasang log qil
-            print("stats update error:", e)
 
-        await message.answer("🔁 Yana savol ko‘rmoqchi bo‘lsangiz, /task yuboring.")
+        # stats update — navbatga qo'yamiz, fon pipeline yuboradi (handler kutmaydi)
+        STATS.record(tg_id, correct)
+        # xato javob takrorlash navbatiga tushadi, /review javobi esa keyingi intervalni belgilaydi
+        await REVIEWS.record(tg_id, task_id, correct, task)
     finally:
         # ✅ har doim state tozalanadi
         await state.clear()
@@ -491,7 +620,7 @@ async def check_task_answer(message: Message, state: FSMContext):
 @router.message(F.reply_to_message & F.text & ~F.text.startswith("/"))
 async def reply_task_answer(message: Message):
     tg_id = message.from_user.id
-    tokens = USER_TOKENS.get(tg_id)
+    tokens = await SESSIONS.get(tg_id)
     if not tokens:
         return
 
@@ -505,7 +634,7 @@ async def reply_task_answer(message: Message):
 
     task_id = int(m.group(1))
 
-    status, task = await api_request("GET", API_TASK_DETAIL.format(id=task_id), access=tokens["access"])
+    status, task = await get_task(tg_id, task_id)
 
     if status != 200:
         await message.answer("⚠️ Savolni olishda xatolik yuz berdi.")
@@ -514,259 +643,110 @@ async def reply_task_answer(message: Message):
     correct, result_text = await evaluate_answer(task, message.text or "")
     await message.answer(result_text, parse_mode="Markdown")
 
-    async with aiohttp.ClientSession() as session:
-        await session.post(
-            "https://api.riseuply.uz/api/stats/update/",
-            json={"correct": correct},
-            headers={"Authorization": f"Bearer {tokens['access']}"}
-        )
-
-# ==================== KURS MENYU ====================
-
-@router.message(Command("course"))
-async def start_menu(message: Message):
-    await message.answer("Maroqli o'rganing😉", reply_markup=web)
-
-
-# ==================== Kurslar menyusi ====================
-
-@router.message(F.text == "Backend")
-async def backen(message: Message):
-    await message.answer("Kerakli tilni tanlang: ", reply_markup=inline_lang())
-
-
-@router.callback_query(F.data.startswith("lang_"))
-async def backend_lang_callback(callback: CallbackQuery):
-    code = callback.data.split("_")[1]  # "uzb", "ru", "eng", "back"
-
-    if code == "uzb":
-        await callback.message.answer("Siz o'zbek tilini tanladingiz", reply_markup=uzbreply)
-    elif code == "ru":
-        await callback.message.answer("Вы выбрали русский язык", reply_markup=rusreply)
-    elif code == "eng":
-        await callback.message.answer("You choose English", reply_markup=engreply)
-    elif code == "back":
-        await callback.message.answer("Ortga", reply_markup=web)
-
-    await callback.message.edit_reply_markup()
-    await callback.answer()
-
-
-@router.message(F.text == "🔙 Ortga")
-async def ortg(message: Message):
-    await message.answer("Ortga", reply_markup=web)
-
-
-@router.message(F.text == "Python asoslari")
-async def pyth(message: Message):
-    await message.answer(
-        "Python darslarini 0 dan boshlab o'rganing:\n\n"
-        "https://www.youtube.com/watch?v=ZqFjXM8k-PY&list=PLwsopmzfbOn9Lw5D7a26THpBDgAma1Sus"
-    )
-
-
-@router.message(F.text == "Django darslari")
-async def django_uz(message: Message):
-    await message.answer(
-        "Django darslarini professional tarzda o'rganing 0dan o'zingizni website qilishingizgacha:\n\n"
-        "https://www.youtube.com/watch?v=49_C_3kkW6g&list=PLWoHEZ4vq7z5TR9I-TYLnqN0vgdHHrOmS"
-    )
-
-
-@router.message(F.text == "Django Rest Framework darslari")
-async def drf_uz(message: Message):
-    await message.answer(
-        "Django rest framework darslarini hamda api larni mukammal urganing:\n\n"
-        "https://www.youtube.com/watch?v=o7SVadHcXjM&list=PLm-TVk1aJmO4gKl0EuQei16B6Wi4tRhP8"
-    )
-
-
-@router.message(F.text == "Aiogram darslari")
-async def aiogram_uz(message: Message):
-    await message.answer(
-        "Aiogramda 0dan toki o'zingizni botingizni qilib chiqishgacha:\n\n"
-        "https://www.youtube.com/watch?v=FC2ztmTq10w&list=PLyABYrL3eBgWnQ_qUylmhChB1J6t4B38R"
-    )
-
-
-@router.message(F.text == "Python Уроки")
-async def ur(message: Message):
-    await message.answer(
-        "Python с нуля:\n\n"
-        "https://www.youtube.com/watch?v=34Rp6KVGIEM&list=PLDyJYA6aTY1lPWXBPk0gw6gR8fEtPDGKa"
-    )
+    STATS.record(tg_id, correct)
+    await REVIEWS.record(tg_id, task_id, correct, task)
 
 
-@router.message(F.text == "Django Уроки")
-async def djang(message: Message):
-    await message.answer(
-        "Профессионально изучите уроки Django с нуля до создания собственного сайта:\n\n"
-        "https://www.youtube.com/watch?v=L-FyeHQwo4U&list=PLDyJYA6aTY1nZ9fSGcsK4wqeu-xaJksQQ"
-    )
-
-
-@router.message(F.text == "Django Rest Framework Уроки")
-async def drf_ru(message: Message):
-    await message.answer(
-        "Изучите руководства и API фреймворка Django REST:\n\n"
-        "https://www.youtube.com/watch?v=i-uvtDKeFgE&list=PLA0M1Bcd0w8xZA3Kl1fYmOH_MfLpiYMRs"
-    )
-
-
-@router.message(F.text == "Aiogram Уроки")
-async def aiogra(message: Message):
-    await message.answer(
-        "С нуля до создания собственного бота на Aiogram:\n\n"
-        "https://www.youtube.com/watch?v=i07-M7m13bM&list=PLV0FNhq3XMOJ31X9eBWLIZJ4OVjBwb-KM"
-    )
-
-
-@router.message(F.text == "🔙 Назад")
-async def nazad(message: Message):
-    await message.answer("Назад", reply_markup=web)
-
-
-@router.message(F.text == "Python for beginners")
-async def begin(message: Message):
-    await message.answer(
-        "Python for beginners:\n\n"
-        "https://www.youtube.com/watch?v=K5KVEU3aaeQ"
-    )
-
-
-@router.message(F.text == "Django lessons")
-async def less(message: Message):
-    await message.answer(
-        "Django lessons from scratch to own website:\n\n"
-        "https://www.youtube.com/watch?v=rHux0gMZ3Eg"
-    )
-
+@router.message(Command("review"))
+async def review_next(message: Message, state: FSMContext):
+    """
+    /review -> vaqti kelgan eng eski xato javob berilgan savol.
+    Savol lokal nusxadan chiqadi (backend'ga faqat nusxa bo'lmasa boriladi).
+    """
+    await state.clear()
+    tg_id = message.from_user.id
+    if not await SESSIONS.get(tg_id):
+        await message.answer("⛔ Avval /start orqali akkauntni bog'lab oling.")
+        return
 
-@router.message(F.text == "Django Rest Framework lessons")
-async def django_en(message: Message):
-    await message.answer(
-        "DRF lessons for beginners with API:\n\n"
-        "https://www.youtube.com/watch?v=c708Nf0cHrs"
-    )
+    card, due, next_at = await REVIEWS.next_due(tg_id)
+    if card is None:
+        if next_at is None:
+            await message.answer(
+                "📭 Takrorlash uchun savol yo'q.\n"
+                "Xato javob bergan savollaringiz shu yerga tushadi va vaqti kelganda qayta so‘raladi."
+            )
+        else:
+            nice_dt = datetime.fromtimestamp(next_at).strftime("%d.%m.%Y • %H:%M")
+            await message.answer(f"✅ Hozircha takrorlanadigan savol yo'q.\n⏰ Keyingisi: {nice_dt}")
+        return
 
+    task = TASK_CACHE.get(tg_id, card.task_id)
+    if task is not None:
+        # keshdagi (backend'dan yangi kelgan) task o'zgargan bo'lsa nusxa ham yangilanadi
+        await REVIEWS.refresh(tg_id, task)
+    else:
+        task = card.task
+    if task is None:
+        status, task = await get_task(tg_id, card.task_id)
+        if status == 404:
+            await REVIEWS.forget(tg_id, card.task_id)
+            await message.answer("🗑 Bu savol saytda o'chirilgan. Keyingisi uchun /review yuboring.")
+            return
+        if status != 200:
+            await message.answer("⚠️ Savolni olishda xatolik yuz berdi.")
+            return
+        await REVIEWS.refresh(tg_id, task)
+    else:
+        # javobni tekshirish ham keshdan o'qiydi
+        TASK_CACHE.put(tg_id, card.task_id, task)
 
-@router.message(F.text == "Aiogram lessons")
-async def aiogram_en(message: Message):
-    await message.answer(
-        "Create your own telegram bot with aiogram library in python:\n\n"
-        "https://www.youtube.com/watch?v=rDG09TlYSwo&list=PLt2KnIqdk1FEm4lmGuxxz9OjiX7HLnYEa"
-    )
+    due_text = f"{due}+" if due >= REVIEW_DUE_LIMIT else str(due)
+    await message.answer(f"🔁 Takrorlash • {due_text} ta savol navbatda\n\n" + render_task(task))
+    await state.set_state(TaskSolve.waiting_answer)
+    await state.update_data(task_id=card.task_id, review=True)
 
+# ==================== KURS MENYU ====================
 
-@router.message(F.text == "🔙 Back")
-async def back(message: Message):
-    await message.answer("Back", reply_markup=web)
+@router.message(Command("course"))
+async def start_menu(message: Message):
+    catalog = CATALOG.current
+    await message.answer(catalog.main_text, reply_markup=catalog.main_menu)
 
 
-# ==================== FRONTEND BLOKI ====================
+# ==================== Kurslar menyusi (data/catalog.json) ====================
 
-@router.message(F.text == "Frontend")
-async def frontd(message: Message):
-    await message.answer("Kerakli tilni tanlang: ", reply_markup=inline_front())
+def catalog_button(message: Message) -> dict | bool:
+    """Reply tugma katalogda bormi (dict orqali O(1)); bo'lsa javob handler'ga uzatiladi."""
+    entry = CATALOG.current.texts.get(message.text)
+    return {"entry": entry} if entry else False
 
 
-def inline_front():
-    builder = InlineKeyboardBuilder()
-    builder.button(text="🇺🇿 Uzb", callback_data="til_ozb")
-    builder.button(text="🇷🇺 Ru", callback_data="til_rus")
-    builder.button(text="🇺🇸 Eng", callback_data="til_en")
-    builder.button(text="🔙 Ortga", callback_data="til_backd")
-    builder.adjust(3, 1)
-    return builder.as_markup()
+def catalog_callback(callback: CallbackQuery) -> dict | bool:
+    entry = CATALOG.current.callbacks.get(callback.data)
+    return {"entry": entry} if entry else False
 
 
-@router.callback_query(F.data.startswith("til_"))
-async def frontend_lang_callback(callback: CallbackQuery):
-    code = callback.data.split("_")[1]  # "ozb", "rus", "en", "backd"
+@router.message(F.text, catalog_button)
+async def course_menu(message: Message, entry: tuple):
+    text, markup = entry
+    await message.answer(text, reply_markup=markup)
 
-    if code == "ozb":
-        await callback.message.answer("Siz o'zbek tilini tanladingiz", reply_markup=front)
-    elif code == "rus":
-        await callback.message.answer("Вы выбрали русский язык", reply_markup=rufront)
-    elif code == "en":
-        await callback.message.answer("You chose English", reply_markup=engfront)
-    elif code == "backd":
-        await callback.message.answer("Ortga", reply_markup=web)
 
+@router.callback_query(catalog_callback)
+async def course_lang_callback(callback: CallbackQuery, entry: tuple):
+    # lang_* (backend) va til_* (frontend) tugmalari
+    text, markup = entry
+    await callback.message.answer(text, reply_markup=markup)
     await callback.message.edit_reply_markup()
     await callback.answer()
 
 
-@router.message(F.text == "HTML darslari")
-async def uzhtml(message: Message):
-    await message.answer(
-        "HTML darslarini 0dan o'rganing:\n\n"
-        "https://www.youtube.com/watch?v=9dUhZq9dkHM&list=PLpDyZ4xZcDg_aAzP6pDD1PRsYCSdheveS"
-    )
-
-
-@router.message(F.text == "CSS darslari")
-async def uzcss(message: Message):
-    await message.answer(
-        "CSS darslarini hamda stylelarni mukammal o'rganish:\n\n"
-        "https://www.youtube.com/watch?v=KPPhQ0F-SDY&list=PLpDyZ4xZcDg_gyII__1jtnE2FEgqpfJU8"
-    )
-
-
-@router.message(F.text == "JavaScript darslari")
-async def uzjava(message: Message):
-    await message.answer(
-        "JavaScript dasrlarini hamda sayt qilishni mukammal o'rganish:\n\n"
-        "https://www.youtube.com/watch?v=q8yclECd9CY&list=PLpDyZ4xZcDg8fRiY6xgsQcDiMjNYJhNjE"
-    )
-
-
-@router.message(F.text == "HTML Уроки")
-async def htmlru(message: Message):
-    await message.answer(
-        "Изучите уроки HTML с нуля:\n\n"
-        "https://www.youtube.com/watch?v=_R5a-Kc0pRc&list=PLDyJYA6aTY1nlkG0gBj96XDmDSC4Fy1TO"
-    )
-
-
-@router.message(F.text == "CSS Уроки")
-async def cssru(message: Message):
-    await message.answer(
-        "Изучите уроки и стили CSS:\n\n"
-        "https://www.youtube.com/watch?v=hft4XYApT44&list=PLDyJYA6aTY1meZ3d08sRILB46OJ-wojF2"
-    )
-
-
-@router.message(F.text == "JavaScript Уроки")
-async def javaru(message: Message):
-    await message.answer(
-        "Подробно изучите учебные пособия по JavaScript и создание веб-сайтов:\n\n"
-        "https://www.youtube.com/watch?v=fHl7UyRjOf0&list=PLDyJYA6aTY1kJIwbYHzGOuvSMNTfqksmk"
-    )
-
-
-@router.message(F.text == "HTML for beginners")
-async def htmleng(message: Message):
-    await message.answer(
-        "Learn HTML from zero:\n\n"
-        "https://www.youtube.com/watch?v=HD13eq_Pmp8"
-    )
-
-
-@router.message(F.text == "CSS for beginners")
-async def csseng(message: Message):
+@router.message(Command("reload_catalog"), IsAdmin)
+async def reload_catalog(message: Message):
+    try:
+        catalog = CATALOG.reload()
+    except (OSError, CatalogError) as e:
+        await message.answer(f"⚠️ Katalog yuklanmadi, eski versiya ishlayapti:\n{e}")
+        return
     await message.answer(
-        "Learn CSS as well style:\n\n"
-        "https://www.youtube.com/watch?v=wRNinF7YQqQ"
+        f"✅ Katalog yangilandi: {len(catalog.texts)} ta tugma, {len(catalog.callbacks)} ta til tugmasi."
     )
 
 
-@router.message(F.text == "JavaScript for beginners")
-async def javaeng(message: Message):
-    await message.answer(
-        "Deep learning JavaScript and learn create website:\n\n"
-        "https://www.youtube.com/watch?v=EerdGm-ehJQ"
-    )
+@control_command("reload_catalog")
+async def _reload_catalog_here():
+    CATALOG.reload()
 
 
 @router.message(Command("hissa"))
@@ -7,10 +7,25 @@ from aiogram.types import Message, BotCommand
 
 from handlers.handlers import router
 from handlers.ai_assistant import router as ai_router
+from handlers.ai_assistant import init_ai_session, close_ai_session
 from aiogram.exceptions import TelegramNetworkError
 
 # ✅ shu ikki importni qo‘shing:
-from handlers.handlers import init_http_session, close_http_session
+from handlers.handlers import init_http_session, close_http_session, send_stats
+from handlers.handlers import fetch_all_tasks, send_reminder
+from services.session_store import SESSIONS
+from services.ai_cache import AI_CACHE
+from services.stats_pipeline import STATS
+from services.catalog import CATALOG
+from services.prefetch import TASK_PREFETCH
+from services.fsm_storage import FSM_STORAGE
+from services.reminders import REMINDERS, REMINDERS_ENABLED
+from services.review import REVIEWS
+from services.fanout import BOT_ROLE, BOT_WORKERS, FanOut, run_worker
+from services.webhook import run_webhook
+from services.polling import run_polling
+from middlewares.debounce import CALLBACK_DEBOUNCE
+from middlewares.flood_control import FLOOD_CONTROL
 
 from dotenv import load_dotenv
 import os
@@ -18,6 +33,8 @@ import os
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# "polling" (lokal dev) yoki "webhook" (load balancer ortida, bir nechta instance)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
 if not BOT_TOKEN:
     raise RuntimeError("❌ BOT_TOKEN topilmadi. .env yoki Railway Variables ni tekshiring.")
 
@@ -25,8 +42,11 @@ bot = Bot(
     token=BOT_TOKEN,
     default=DefaultBotProperties(parse_mode="HTML")
 )
+# chiquvchi xabarlar navbati: Telegram flood limitlari (429) handler'larga yetib bormaydi
+bot.session.middleware(FLOOD_CONTROL)
 
-dp = Dispatcher()
+# FSM state'lari SQLite'da: restartdan keyin ham saqlanadi, tashlab ketilganlari muddati o'tib o'chadi
+dp = Dispatcher(storage=FSM_STORAGE)
 
 
 @dp.message(Command("help"))
@@ -76,6 +96,7 @@ Saytda yaratilgan savollarni Telegram bot orqali ishlaysiz:
 - Javob berasiz
 - Natijani darhol bilasiz ✅
 - Har bir savol bo‘yicha izohlar va to‘g‘ri javoblar bilan tanishasiz
+- /review — xato javob bergan savollaringiz vaqti-vaqti bilan qayta so‘raladi
 - O'z natijangizni websayt orqali ham kuzatib borasiz
 
 👉 Xatolardan qo‘rqmang — aynan shunday o‘sasiz 😉
@@ -124,31 +145,83 @@ RiseUp bilan kelajagingizni bugundan boshlang!
     )
 
 
-async def main():
-    logging.basicConfig(level=logging.INFO)
-
-    dp.include_router(router)
-    dp.include_router(ai_router)
+async def set_commands():
     try:
         await bot.set_my_commands([
         BotCommand(command="/start", description="Botni ishga tushirish"),
         BotCommand(command="/help", description="Yordam"),
         BotCommand(command="/course", description="Kurslar ro'yxati"),
         BotCommand(command="/task", description="Vazifalar ro'yxati"),
+        BotCommand(command="/review", description="Xato javoblarni takrorlash"),
         BotCommand(command="/ai", description="RiseUp AI-yordamchi"),
         BotCommand(command='/hissa', description="RiseUpga hissa qo'shish"),
     ], request_timeout=60)
     except TelegramNetworkError as e:
         print(f"⚠️ set_my_commands timeout, davom etamiz: {e}")
-        # ✅ Startup
+
+
+async def run_ingress():
+    """BOT_WORKERS > 1: bu jarayon faqat update qabul qiladi, qayta ishlash worker jarayonlarda."""
+    await set_commands()
+    fanout = FanOut()
+    await fanout.start()
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot, processor=fanout.dispatch, health=lambda: {"workers": fanout.health()})
+        else:
+            await run_polling(dp, bot, processor=fanout.dispatch)
+    finally:
+        await fanout.close()
+        await bot.session.close()
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+
+    # tugmani ketma-ket bosish: takroriy callback'lar handler'ga yetmaydi
+    dp.callback_query.outer_middleware(CALLBACK_DEBOUNCE)
+    dp.include_router(router)
+    dp.include_router(ai_router)
+
+    if BOT_WORKERS > 1 and BOT_ROLE != "worker":
+        await run_ingress()
+        return
+    if BOT_ROLE != "worker":
+        await set_commands()
+
+    # ✅ Startup
     await init_http_session()
+    await init_ai_session()
+    await SESSIONS.start()
+    await FSM_STORAGE.start()
+    await REVIEWS.start()
+    await AI_CACHE.open()
+    await STATS.start(send_stats)
+    await CATALOG.start()
+    if REMINDERS_ENABLED:
+        await REMINDERS.start(bot, send_reminder, fetch_all_tasks)
 
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot)
+        if BOT_ROLE == "worker":
+            # update'lar ingress jarayonidan keladi (sessiya/FSM bir xil SQLite faylda)
+            await run_worker(dp, bot)
+        elif BOT_MODE == "webhook":
+            await run_webhook(dp, bot, health=lambda: {"outbound": FLOOD_CONTROL.stats()})
+        else:
+            # offset lokal saqlanadi: restart paytida kelgan xabarlar tashlab yuborilmaydi
+            await run_polling(dp, bot)
     finally:
-        # ✅ Shutdown
+        # ✅ Shutdown (stats navbati HTTP sessiya yopilishidan oldin bo'shatiladi)
+        await CATALOG.close()
+        await REMINDERS.close()
+        await TASK_PREFETCH.close()
+        await STATS.close()
         await close_http_session()
+        await close_ai_session()
+        await SESSIONS.close()
+        await REVIEWS.close()
+        await AI_CACHE.close()
+        await FLOOD_CONTROL.close()
         await bot.session.close()
 
 
@@ -0,0 +1,98 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery
+
+logger = logging.getLogger(__name__)
+
+# Bir xil tugmani shu oraliqda qayta bosish e'tiborsiz qoldiriladi (sekund)
+CALLBACK_DEBOUNCE_WINDOW = float(os.getenv("CALLBACK_DEBOUNCE_WINDOW", "1.5"))
+# Eslab qolinadigan eng ko'p (user, data, xabar) kaliti
+CALLBACK_DEBOUNCE_MAX_KEYS = int(os.getenv("CALLBACK_DEBOUNCE_MAX_KEYS", "10000"))
+
+
+def _callback_key(event: CallbackQuery) -> tuple:
+    message_id = event.message.message_id if event.message else event.inline_message_id
+    return event.from_user.id, event.data, message_id
+
+
+class CallbackDebounceMiddleware(BaseMiddleware):
+    """
+    Bitta foydalanuvchining bir xil callback'lari (user, data, xabar) oynada bittaga birlashadi.
+    Takroriy bosishlar handler'ga yetmaydi (backend GET / edit_text yo'q), lekin darhol answer() qilinadi.
+    "message is not modified" xatosi ham shu yerda yutiladi.
+    """
+
+    def __init__(self, window: float = CALLBACK_DEBOUNCE_WINDOW, max_keys: int = CALLBACK_DEBOUNCE_MAX_KEYS):
+        self.window = window
+        self.max_keys = max_keys
+        # kalit -> oxirgi qabul qilingan bosish tugagan vaqt (eskisi boshida)
+        self._recent: OrderedDict[tuple, float] = OrderedDict()
+        self._running: set[tuple] = set()
+        self.passed = 0
+        self.suppressed = 0
+        self.not_modified = 0
+
+    def _evict(self, now: float):
+        while self._recent:
+            key, ts = next(iter(self._recent.items()))
+            if now - ts < self.window and len(self._recent) <= self.max_keys:
+                break
+            self._recent.popitem(last=False)
+
+    def _is_duplicate(self, key: tuple, now: float) -> bool:
+        if key in self._running:
+            return True
+        ts = self._recent.get(key)
+        return ts is not None and now - ts < self.window
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: dict[str, Any],
+    ) -> Any:
+        now = time.monotonic()
+        self._evict(now)
+        key = _callback_key(event)
+
+        if self._is_duplicate(key, now):
+            self.suppressed += 1
+            try:
+                await event.answer()  # tugmadagi "soat" belgisi darhol yo'qolsin
+            except TelegramBadRequest:
+                pass  # query eskirgan
+            return None
+
+        self.passed += 1
+        self._running.add(key)
+        try:
+            return await handler(event, data)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                raise
+            self.not_modified += 1
+            try:
+                await event.answer()
+            except TelegramBadRequest:
+                pass
+        finally:
+            self._running.discard(key)
+            self._recent[key] = time.monotonic()
+            self._recent.move_to_end(key)
+
+    def stats(self) -> dict:
+        return {
+            "passed": self.passed,
+            "suppressed": self.suppressed,
+            "not_modified": self.not_modified,
+            "tracked": len(self._recent),
+        }
+
+
+CALLBACK_DEBOUNCE = CallbackDebounceMiddleware()
@@ -0,0 +1,322 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Hashable
+
+from aiogram import Bot
+from aiogram.client.default import Default
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage,
+    EditMessageCaption,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    ForwardMessage,
+    SendAnimation,
+    SendAudio,
+    SendDocument,
+    SendMediaGroup,
+    SendMessage,
+    SendPhoto,
+    SendSticker,
+    SendVideo,
+    SendVoice,
+    TelegramMethod,
+)
+
+from middlewares.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Telegram limitlari: butun bot bo'yicha ~30 xabar/s, bitta gruppaga ~1 xabar/s
+SEND_GLOBAL_PER_SEC = float(os.getenv("SEND_GLOBAL_PER_SEC", "30"))
+SEND_GROUP_PER_SEC = float(os.getenv("SEND_GROUP_PER_SEC", "1"))
+SEND_GROUP_BURST = float(os.getenv("SEND_GROUP_BURST", "1"))
+SEND_PRIVATE_PER_SEC = float(os.getenv("SEND_PRIVATE_PER_SEC", "1"))
+SEND_PRIVATE_BURST = float(os.getenv("SEND_PRIVATE_BURST", "5"))
+# 429 (retry_after) shuncha marta kutib qayta yuboriladi, keyin xato handler'ga qaytadi
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+SEND_CLOSE_TIMEOUT = float(os.getenv("SEND_CLOSE_TIMEOUT", "10"))
+
+_TEXT_LIMIT = 4096
+
+# Faqat chatga xabar chiqaradigan metodlar navbatga tushadi (answerCallbackQuery, getUpdates va h.k. to'g'ridan-to'g'ri)
+_LIMITED = (
+    SendMessage, SendPhoto, SendDocument, SendAudio, SendVideo, SendAnimation, SendVoice,
+    SendSticker, SendMediaGroup, CopyMessage, ForwardMessage,
+    EditMessageText, EditMessageCaption, EditMessageReplyMarkup, EditMessageMedia,
+)
+_EDITS = (EditMessageText, EditMessageCaption, EditMessageReplyMarkup, EditMessageMedia)
+
+
+# Faqat shu belgi bilan yuborilgan so'rovlar birlashtiriladi (natijasi chaqiruvchiga kerak emas)
+_COALESCE: ContextVar[bool] = ContextVar("flood_control_coalesce", default=False)
+
+
+@contextmanager
+def coalescible():
+    """
+    Ichidagi sendMessage/edit so'rovlari navbatda qo'shnilari bilan birlashishi mumkin.
+    Faqat qaytgan Message keyin tahrirlanmaydigan / o'chirilmaydigan joyda ishlatiladi
+    (placeholder, "navbatdasiz" kabi xabarlar uchun emas).
+    """
+    token = _COALESCE.set(True)
+    try:
+        yield
+    finally:
+        _COALESCE.reset(token)
+
+
+def _field(value: Any) -> Any:
+    # Default("parse_mode") obyektlari identity bo'yicha solishtiriladi
+    return ("default", value.name) if isinstance(value, Default) else value
+
+
+def _merge_key(method: TelegramMethod) -> tuple | None:
+    """Bir xil kalitli ketma-ket xabarlarni bitta so'rovga birlashtirish mumkin."""
+    if isinstance(method, SendMessage):
+        if method.entities:
+            return None
+        return ("send",) + tuple(
+            _field(getattr(method, name))
+            for name in type(method).model_fields
+            if name not in ("text", "reply_markup")
+        )
+    if isinstance(method, _EDITS):
+        # bitta xabarning eski tahrirlari keraksiz: faqat oxirgisi yuboriladi
+        return ("edit", type(method), method.chat_id, method.message_id, method.inline_message_id)
+    return None
+
+
+class _Item:
+    __slots__ = ("method", "make_request", "bot", "future", "retries", "coalesce")
+
+    def __init__(self, method: TelegramMethod, make_request: NextRequestMiddlewareType, bot: Bot):
+        self.method = method
+        self.make_request = make_request
+        self.bot = bot
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.retries = 0
+        self.coalesce = _COALESCE.get()
+
+
+class _Chat:
+    __slots__ = ("items", "bucket", "rate", "burst", "busy", "paused_until")
+
+    def __init__(self, group: bool, now: float):
+        self.rate = SEND_GROUP_PER_SEC if group else SEND_PRIVATE_PER_SEC
+        self.burst = SEND_GROUP_BURST if group else SEND_PRIVATE_BURST
+        self.bucket = TokenBucket(self.burst, now)
+        self.items: deque[_Item] = deque()
+        self.busy = False
+        self.paused_until = 0.0
+
+    def idle(self, now: float) -> bool:
+        """Navbati bo'sh va bucket'i to'lgan: o'chirsa bo'ladi (yangisi aynan shunday bo'ladi)."""
+        return (
+            not self.items and not self.busy and now >= self.paused_until
+            and now - self.bucket.updated >= (self.burst - self.bucket.tokens) / self.rate
+        )
+
+
+class FloodControlMiddleware(BaseRequestMiddleware):
+    """
+    Bot sessiyasi uchun chiquvchi navbat: global va per-chat token bucket.
+    Chat ichida xabarlar tartib bilan, bittadan yuboriladi; chatlar round-robin bilan almashadi.
+    429 bo'lsa shu chat retry_after'gacha to'xtatiladi va xabar qayta yuboriladi.
+    coalescible() ichida yuborilgan ketma-ket matnlar bitta xabarga, bir xabarning tahrirlari
+    oxirgisiga birlashadi; boshqa so'rovlar hech qachon birlashtirilmaydi.
+    """
+
+    def __init__(self, per_sec: float = SEND_GLOBAL_PER_SEC):
+        self.rate = per_sec
+        self.burst = max(1.0, per_sec)
+        self.bucket = TokenBucket(self.burst, time.monotonic())
+        self._chats: OrderedDict[Hashable, _Chat] = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._pump: asyncio.Task | None = None
+        self._sending: set[asyncio.Task] = set()
+        self._closed = False
+        self.depth = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Any:
+        if self._closed or not isinstance(method, _LIMITED):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        key = chat_id if chat_id is not None else ("inline", getattr(method, "inline_message_id", None))
+        chat = self._chats.get(key)
+        if chat is None:
+            group = isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0)
+            chat = self._chats[key] = _Chat(group, time.monotonic())
+
+        item = _Item(method, make_request, bot)
+        chat.items.append(item)
+        self.depth += 1
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run())
+        self._wakeup.set()
+        return await item.future
+
+    # ---------- navbat ----------
+
+    def _take(self, chat: _Chat) -> list[_Item]:
+        """Chat navbatining boshidan bitta so'rovga birlashadigan xabarlarni oladi."""
+        batch: list[_Item] = []
+        key = None
+        size = 0
+        while chat.items:
+            item = chat.items[0]
+            if item.future.done():  # kutayotgan handler bekor qilingan
+                chat.items.popleft()
+                self.depth -= 1
+                continue
+            if batch:
+                prev = batch[-1]
+                # oldingisining natijasi tashlanadi -> u coalescible bo'lishi shart
+                if key is None or not prev.coalesce or _merge_key(item.method) != key:
+                    break
+                if key[0] == "send":
+                    # birlashgan Message hammaga qaytadi -> hamma xabar coalescible bo'lishi kerak
+                    size += 2 + len(item.method.text)
+                    if not item.coalesce or prev.method.reply_markup is not None or size > _TEXT_LIMIT:
+                        break
+            else:
+                key = _merge_key(item.method)
+                size = len(item.method.text) if key and key[0] == "send" else 0
+            batch.append(chat.items.popleft())
+            self.depth -= 1
+        return batch
+
+    def _request(self, batch: list[_Item]) -> TelegramMethod:
+        last = batch[-1].method
+        if len(batch) == 1 or isinstance(last, _EDITS):
+            return last
+        return batch[0].method.model_copy(update={
+            "text": "\n\n".join(item.method.text for item in batch),
+            "reply_markup": last.reply_markup,
+        })
+
+    def _dispatch(self, now: float) -> float | None:
+        """Tayyor chatlardan yuboradi; keyingi tekshiruvgacha necha sekund (None = yangi xabar kutiladi)."""
+        delay = None
+        for key in list(self._chats):
+            chat = self._chats[key]
+            if chat.busy or not chat.items:
+                if chat.idle(now):
+                    del self._chats[key]
+                continue
+            if now < chat.paused_until:
+                wait = chat.paused_until - now
+            else:
+                wait = chat.bucket.wait(now, chat.rate, chat.burst)
+            if not wait:
+                wait = self.bucket.wait(now, self.rate, self.burst)
+                if wait:
+                    return wait if delay is None else min(delay, wait)
+                batch = self._take(chat)
+                if not batch:
+                    continue
+                chat.bucket.tokens -= 1
+                self.bucket.tokens -= 1
+                chat.busy = True
+                self._chats.move_to_end(key)  # round-robin: bu chat navbat oxiriga
+                task = asyncio.create_task(self._send(chat, batch))
+                self._sending.add(task)
+                task.add_done_callback(self._sending.discard)
+                continue
+            delay = wait if delay is None else min(delay, wait)
+        return delay
+
+    async def _run(self):
+        while True:
+            delay = self._dispatch(time.monotonic())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, chat: _Chat, batch: list[_Item]):
+        head = batch[0]
+        try:
+            result = await head.make_request(head.bot, self._request(batch))
+        except TelegramRetryAfter as e:
+            self.retried += 1
+            chat.paused_until = time.monotonic() + e.retry_after
+            logger.warning("flood control: chat paused for %ss", e.retry_after)
+            retry = []
+            for item in batch:
+                item.retries += 1
+                if item.retries > SEND_MAX_RETRIES:
+                    self.failed += 1
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                else:
+                    retry.append(item)
+            chat.items.extendleft(reversed(retry))
+            self.depth += len(retry)
+        except asyncio.CancelledError:
+            for item in batch:
+                item.future.cancel()
+            raise
+        except Exception as e:
+            self.failed += len(batch)
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+        else:
+            self.sent += 1
+            self.coalesced += len(batch) - 1
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_result(result)
+        finally:
+            chat.busy = False
+            self._wakeup.set()
+
+    async def close(self, timeout: float = SEND_CLOSE_TIMEOUT):
+        """Navbatdagilarni timeout'gacha yuboradi, qolganini bekor qiladi."""
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        while (self.depth or self._sending) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        tasks = [t for t in (self._pump, *self._sending) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._pump = None
+        for chat in self._chats.values():
+            for item in chat.items:
+                item.future.cancel()
+        self._chats.clear()
+        self.depth = 0
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.depth,
+            "chats": len(self._chats),
+            "sending": len(self._sending),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+FLOOD_CONTROL = FloodControlMiddleware()
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Hashable
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import Message
+
+logger = logging.getLogger(__name__)
+
+# Limitlar daqiqasiga so'rov (rate) va ketma-ket ruxsat etilgan "portlash" (burst)
+AI_RL_USER_PER_MIN = float(os.getenv("AI_RL_USER_PER_MIN", "6"))
+AI_RL_USER_BURST = float(os.getenv("AI_RL_USER_BURST", "3"))
+AI_RL_CHAT_PER_MIN = float(os.getenv("AI_RL_CHAT_PER_MIN", "20"))
+AI_RL_CHAT_BURST = float(os.getenv("AI_RL_CHAT_BURST", "5"))
+AI_RL_GLOBAL_PER_MIN = float(os.getenv("AI_RL_GLOBAL_PER_MIN", "120"))
+AI_RL_GLOBAL_BURST = float(os.getenv("AI_RL_GLOBAL_BURST", "10"))
+# Global navbatda shundan ko'p kutish kerak bo'lsa darhol "keyinroq urinib ko'ring"
+AI_RL_MAX_WAIT = float(os.getenv("AI_RL_MAX_WAIT", "20"))
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated", "muted_until")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        # "keyinroq urinib ko'ring" shu vaqtgacha qayta yuborilmaydi
+        self.muted_until = 0.0
+
+    def refill(self, now: float, rate: float, burst: float):
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait(self, now: float, rate: float, burst: float) -> float:
+        """1 ta token uchun qancha kutish kerak (0 = hozir bor)."""
+        self.refill(now, rate, burst)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / rate
+
+
+class BucketMap:
+    """
+    Kalit -> TokenBucket. Faqat "to'la bo'lmagan" bucket'lar saqlanadi:
+    to'lib qolgani (uzoq ishlatilmagan) o'chiriladi, chunki yangisi aynan shunday bo'ladi.
+    """
+
+    def __init__(self, per_min: float, burst: float):
+        self.rate = per_min / 60
+        self.burst = burst
+        self._buckets: OrderedDict[Hashable, TokenBucket] = OrderedDict()
+
+    def _evict(self, now: float):
+        full_after = self.burst / self.rate
+        while self._buckets:
+            bucket = next(iter(self._buckets.values()))
+            if now - bucket.updated < full_after:
+                break
+            self._buckets.popitem(last=False)
+
+    def get(self, key: Hashable, now: float) -> TokenBucket:
+        self._evict(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.burst, now)
+        return bucket
+
+    def wait(self, key: Hashable, now: float) -> float:
+        return self.get(key, now).wait(now, self.rate, self.burst)
+
+    def take(self, key: Hashable, now: float):
+        bucket = self._buckets[key]
+        bucket.tokens -= 1
+        self._buckets.move_to_end(key)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class FairGate:
+    """
+    Global budjet. Token bo'lsa darhol o'tadi; bo'lmasa foydalanuvchi navbatga turadi
+    va navbatlar round-robin bilan ochiladi (bitta foydalanuvchi hammani to'sib qo'ymaydi).
+    """
+
+    def __init__(self, per_min: float, burst: float):
+        self.rate = per_min / 60
+        self.burst = burst
+        self.bucket = TokenBucket(burst, time.monotonic())
+        self._waiters: OrderedDict[Hashable, deque[asyncio.Future]] = OrderedDict()
+        self._queued = 0
+        self._pump: asyncio.Task | None = None
+
+    def estimate(self) -> float:
+        """Navbat oxiriga turgan so'rov taxminan qancha kutadi."""
+        now = time.monotonic()
+        return self.bucket.wait(now, self.rate, self.burst) + self._queued / self.rate
+
+    async def acquire(self, user: Hashable):
+        now = time.monotonic()
+        if not self._waiters and self.bucket.wait(now, self.rate, self.burst) == 0:
+            self.bucket.tokens -= 1
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user, deque()).append(fut)
+        self._queued += 1
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run())
+        await fut
+
+    async def _run(self):
+        while self._waiters:
+            wait = self.bucket.wait(time.monotonic(), self.rate, self.burst)
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+            # eng uzoq kutgan foydalanuvchi -> bittasi o'tadi -> qolganlari navbat oxiriga
+            user, queue = self._waiters.popitem(last=False)
+            fut = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._waiters[user] = queue
+            if fut.done():
+                continue  # kutayotgan handler bekor qilingan: token sarflanmaydi
+            self.bucket.tokens -= 1
+            fut.set_result(None)
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+
+class AIRateLimitMiddleware(BaseMiddleware):
+    """
+    AI router uchun: per-user, per-chat (gruppa) va global token bucket.
+    Faqat flags={"ai_rate_limit": True} bo'lgan handler'larga qo'llanadi.
+    """
+
+    def __init__(self):
+        self.users = BucketMap(AI_RL_USER_PER_MIN, AI_RL_USER_BURST)
+        self.chats = BucketMap(AI_RL_CHAT_PER_MIN, AI_RL_CHAT_BURST)
+        self.gate = FairGate(AI_RL_GLOBAL_PER_MIN, AI_RL_GLOBAL_BURST)
+        self.passed = 0
+        self.limited = 0
+
+    async def _reject(self, message: Message, bucket: TokenBucket | None, wait: float, now: float):
+        self.limited += 1
+        if bucket is not None:
+            if now < bucket.muted_until:
+                return  # ogohlantirish allaqachon yuborilgan, spam'ga spam bilan javob bermaymiz
+            bucket.muted_until = now + wait
+        await message.reply(
+            f"⏳ So‘rovlar juda ko‘p. {math.ceil(wait)} soniyadan keyin qayta urinib ko‘ring."
+        )
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: dict[str, Any],
+    ) -> Any:
+        if not get_flag(data, "ai_rate_limit") or event.from_user is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        user_id = event.from_user.id
+        chat_id = event.chat.id if event.chat.type in ("group", "supergroup") else None
+
+        wait = self.users.wait(user_id, now)
+        if wait:
+            return await self._reject(event, self.users.get(user_id, now), wait, now)
+        if chat_id is not None:
+            wait = self.chats.wait(chat_id, now)
+            if wait:
+                return await self._reject(event, self.chats.get(chat_id, now), wait, now)
+
+        wait = self.gate.estimate()
+        if wait > AI_RL_MAX_WAIT:
+            return await self._reject(event, self.users.get(user_id, now), wait, now)
+
+        self.users.take(user_id, now)
+        if chat_id is not None:
+            self.chats.take(chat_id, now)
+        await self.gate.acquire(user_id)
+        self.passed += 1
+        return await handler(event, data)
+
+    def stats(self) -> dict:
+        return {
+            "passed": self.passed,
+            "limited": self.limited,
+            "queued": self.gate.queued,
+            "users": len(self.users),
+            "chats": len(self.chats),
+        }
+
+
+AI_RATE_LIMIT = AIRateLimitMiddleware()
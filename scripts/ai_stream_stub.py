@@ -0,0 +1,79 @@
+"""
+AI streaming endpoint'ining lokal o'rinbosari (dev/test uchun).
+
+    python scripts/ai_stream_stub.py --port 8081
+    AI_STREAM_URL=http://127.0.0.1:8081/ai/stream python main.py
+
+/ai/stream  -> text/event-stream: `data: {"delta": "..."}` qatorlari, oxirida `data: [DONE]`
+/ai/chunked -> oddiy chunked text/plain
+/ai/chat    -> oddiy JSON ({"status": "success", "response": ...})
+"""
+import argparse
+import asyncio
+import json
+
+from aiohttp import web
+
+ANSWER = (
+    "Django — Python'da yozilgan web framework. U model, view va template qatlamlari orqali "
+    "saytning backend qismini tez qurishga yordam beradi. RiseUp'dagi backend kursida Django "
+    "va DRF bilan real loyiha qilasiz: https://riseuply.vercel.app"
+)
+
+
+def _tokens(text: str, repeat: int):
+    for _ in range(repeat):
+        for word in text.split(" "):
+            yield word + " "
+
+
+async def sse(request: web.Request) -> web.StreamResponse:
+    app = request.app
+    resp = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await resp.prepare(request)
+    for token in _tokens(ANSWER, app["repeat"]):
+        await resp.write(f"data: {json.dumps({'delta': token}, ensure_ascii=False)}\n\n".encode())
+        await asyncio.sleep(app["delay"])
+    await resp.write(b"data: [DONE]\n\n")
+    await resp.write_eof()
+    return resp
+
+
+async def chunked(request: web.Request) -> web.StreamResponse:
+    app = request.app
+    resp = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8"})
+    resp.enable_chunked_encoding()
+    await resp.prepare(request)
+    for token in _tokens(ANSWER, app["repeat"]):
+        await resp.write(token.encode())
+        await asyncio.sleep(app["delay"])
+    await resp.write_eof()
+    return resp
+
+
+async def chat(request: web.Request) -> web.Response:
+    await asyncio.sleep(request.app["delay"] * len(ANSWER.split(" ")) * request.app["repeat"])
+    return web.json_response({"status": "success", "response": ANSWER * request.app["repeat"]})
+
+
+def make_app(delay: float, repeat: int) -> web.Application:
+    app = web.Application()
+    app["delay"] = delay
+    app["repeat"] = repeat
+    app.router.add_post("/ai/stream", sse)
+    app.router.add_post("/ai/chunked", chunked)
+    app.router.add_post("/ai/chat", chat)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.05, help="tokenlar orasidagi pauza (s)")
+    parser.add_argument("--repeat", type=int, default=1, help="uzun javob uchun matnni takrorlash")
+    args = parser.parse_args()
+    web.run_app(make_app(args.delay, args.repeat), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import os
+
+from aiogram import F
+
+# Admin telegram id'lari: ADMIN_IDS="123,456"
+ADMIN_IDS = frozenset(
+    int(x) for x in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if x
+)
+
+# router.message(Command("..."), IsAdmin) ko'rinishida ishlatiladi
+IsAdmin = F.from_user.id.in_(ADMIN_IDS)
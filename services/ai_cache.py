@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+
+from services.db import DB_PATH, connect
+
+logger = logging.getLogger(__name__)
+
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "5000"))
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))  # 7 kun
+
+# Normalizatsiya qoidasi o'zgarsa oshiriladi: eski kalitdagi javoblar ishlatilmaydi
+_KEY_VERSION = "k2"
+
+_APOSTROPHES_RE = re.compile(r"[‘’ʻʼ`´]")
+# so'z oxiridagi tinish belgilari va so'z atrofidagi qavs/qo'shtirnoqlar;
+# so'z ichidagi belgilar (C++, C#, node.js, TCP/IP) kalitda qoladi
+_TRAILING = "?!.,;:…"
+_QUOTES = "\"«»“”()[]"
+
+
+def normalize_question(text: str) -> str:
+    """
+    "Django nima?", "django  NIMA" va "Django nima ?!" bitta kalitga tushadi:
+    lower, apostroflar bir xil, chetdagi tinish belgilari va ortiqcha bo'shliqlar olib tashlanadi.
+    "C++ nima?" va "C# nima?" esa har xil kalit.
+    """
+    s = _APOSTROPHES_RE.sub("'", text.lower())
+    words = (w.strip(_QUOTES).rstrip(_TRAILING).strip(_QUOTES) for w in s.split())
+    return " ".join(w for w in words if w)
+
+
+def prompt_version(prompt: str) -> str:
+    """Prompt o'zgarsa eski javoblar avtomatik eskiradi."""
+    return hashlib.sha1(prompt.encode()).hexdigest()[:12]
+
+
+class AnswerCache:
+    """
+    (prompt versiyasi, normalize qilingan savol) -> AI javobi.
+    Xotirada LRU + TTL, SQLite'da saqlanadi (restartdan keyin issiq holda qaytadi).
+    """
+
+    def __init__(self, path: str = DB_PATH, maxsize: int = AI_CACHE_SIZE, ttl: float = AI_CACHE_TTL):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # kalit -> (javob, created_at)
+        self._data: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(question: str, version: str) -> str | None:
+        norm = normalize_question(question)
+        return f"{_KEY_VERSION}:{version}:{norm}" if norm else None
+
+    async def open(self):
+        self._conn = await connect(self.path)
+        await self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ai_answers (
+                key TEXT PRIMARY KEY,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        await self._conn.execute(
+            "DELETE FROM ai_answers WHERE created_at < ? OR substr(key, 1, ?) != ?",
+            (time.time() - self.ttl, len(_KEY_VERSION) + 1, f"{_KEY_VERSION}:"),
+        )
+        await self._conn.commit()
+        # eng yangi maxsize ta yozuvni xotiraga yuklaymiz (eskisidan yangisiga -> LRU tartibi)
+        async with self._conn.execute(
+            "SELECT key, answer, created_at FROM ai_answers ORDER BY created_at DESC LIMIT ?",
+            (self.maxsize,),
+        ) as cur:
+            rows = await cur.fetchall()
+        for key, answer, created_at in reversed(rows):
+            self._data[key] = (answer, created_at)
+        logger.info("AI cache: %d answers loaded", len(self._data))
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def peek(self, question: str, version: str) -> str | None:
+        """get() kabi, lekin hit/miss hisoblagichlariga tegmaydi (qayta tekshirish uchun)."""
+        key = self.make_key(question, version)
+        entry = self._data.get(key) if key else None
+        if entry is None or time.time() - entry[1] > self.ttl:
+            if entry is not None:
+                del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry[0]
+
+    def get(self, question: str, version: str) -> str | None:
+        answer = self.peek(question, version)
+        if answer is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return answer
+
+    async def put(self, question: str, version: str, answer: str):
+        key = self.make_key(question, version)
+        if not key:
+            return
+        now = time.time()
+        self._data[key] = (answer, now)
+        self._data.move_to_end(key)
+        evicted = []
+        while len(self._data) > self.maxsize:
+            evicted.append(self._data.popitem(last=False)[0])
+        if self._conn is None:
+            return
+        try:
+            await self._conn.execute(
+                "INSERT OR REPLACE INTO ai_answers VALUES (?, ?, ?)", (key, answer, now)
+            )
+            if evicted:
+                await self._conn.executemany(
+                    "DELETE FROM ai_answers WHERE key = ?", [(k,) for k in evicted]
+                )
+            await self._conn.commit()
+        except Exception:
+            logger.exception("AI cache write failed")
+
+    async def clear(self) -> int:
+        """Admin /ai_flush: xotira va diskdagi barcha javoblarni o'chiradi."""
+        removed = len(self._data)
+        self._data.clear()
+        if self._conn is not None:
+            await self._conn.execute("DELETE FROM ai_answers")
+            await self._conn.commit()
+        return removed
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+AI_CACHE = AnswerCache()
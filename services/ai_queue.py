@@ -0,0 +1,172 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+AI_WORKERS = int(os.getenv("AI_WORKERS", os.getenv("AI_MAX_IN_FLIGHT", "20")))
+AI_QUEUE_MAX = int(os.getenv("AI_QUEUE_MAX", "200"))
+# Shu vaqt ichida boshlanib-tugamaydigan ish navbatdan oldindan chiqariladi (sekund)
+AI_JOB_DEADLINE = float(os.getenv("AI_JOB_DEADLINE", "45"))
+# Navbatdagi o'rin shunchalik tez-tez tekshiriladi (Telegram edit limiti uchun ham)
+AI_QUEUE_POSITION_INTERVAL = float(os.getenv("AI_QUEUE_POSITION_INTERVAL", "2.0"))
+
+# Kichik raqam = yuqori ustuvorlik
+PRIORITY_PRIVATE = 0
+PRIORITY_GROUP = 1
+
+
+class JobShed(Exception):
+    """Ish navbatga olinmadi yoki deadline'gacha ulgurmasligi aniq bo'lgani uchun tashlandi."""
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "deadline", "fn", "future")
+
+    def __init__(self, priority: int, seq: int, deadline: float, fn: Callable[[], Awaitable[Any]]):
+        self.priority = priority
+        self.seq = seq
+        self.deadline = deadline
+        self.fn = fn
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AIJobQueue:
+    """
+    Ustuvorlikli navbat + chegaralangan worker'lar.
+    Handler'lar run() orqali kutadi; navbat to'lsa yoki deadline'ga ulgurmasa JobShed.
+    O'rtacha bajarilish vaqti (EWMA) bo'yicha kutish taxmin qilinadi.
+    """
+
+    def __init__(self, workers: int = AI_WORKERS, max_size: int = AI_QUEUE_MAX):
+        self.workers = workers
+        self.max_size = max_size
+        self._heap: list[_Job] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Condition()
+        self._tasks: list[asyncio.Task] = []
+        self.service_time = 0.0  # EWMA, sekund
+        self.busy = 0
+        self.done = 0
+        self.shed = 0
+
+    def _ensure_workers(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def position(self, job: _Job) -> int:
+        """Navbatda nechanchi (1 = keyingi)."""
+        return 1 + sum(other < job and not other.future.done() for other in self._heap)
+
+    def _expected_wait(self, ahead: int) -> float:
+        return (ahead // self.workers + 1) * self.service_time
+
+    async def run(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_PRIVATE,
+        deadline: float = AI_JOB_DEADLINE,
+        on_wait: Callable[[int], Awaitable[None]] | None = None,
+    ) -> Any:
+        """fn'ni worker'da bajaradi. on_wait(#o'rin) kutish paytida o'rin o'zgarganda chaqiriladi."""
+        self._ensure_workers()
+        job = _Job(priority, next(self._seq), time.monotonic() + deadline, fn)
+
+        ahead = self.position(job) - 1
+        must_wait = self.busy + ahead >= self.workers
+        if len(self._heap) >= self.max_size or (
+            must_wait
+            and time.monotonic() + self._expected_wait(ahead) + self.service_time > job.deadline
+        ):
+            self.shed += 1
+            raise JobShed()
+
+        heapq.heappush(self._heap, job)
+        async with self._wakeup:
+            self._wakeup.notify()
+
+        last = None
+        # navbat bo'lsa o'rin darhol ko'rsatiladi, keyin har AI_QUEUE_POSITION_INTERVAL'da yangilanadi
+        timeout = 0 if must_wait else AI_QUEUE_POSITION_INTERVAL
+        try:
+            while True:
+                done, _ = await asyncio.wait({job.future}, timeout=timeout if on_wait else None)
+                timeout = AI_QUEUE_POSITION_INTERVAL
+                if done:
+                    return job.future.result()
+                if job in self._heap:
+                    pos = self.position(job)
+                    if pos != last:
+                        last = pos
+                        try:
+                            await on_wait(pos)
+                        except Exception:
+                            logger.debug("queue position update failed", exc_info=True)
+        finally:
+            if not job.future.done():
+                # handler bekor qilindi: worker bu ishni o'tkazib yuboradi
+                job.future.cancel()
+
+    async def _next(self) -> _Job:
+        async with self._wakeup:
+            await self._wakeup.wait_for(lambda: self._heap)
+            return heapq.heappop(self._heap)
+
+    async def _worker(self):
+        while True:
+            job = await self._next()
+            if job.future.done():
+                continue
+            started = time.monotonic()
+            if started + self.service_time > job.deadline:
+                self.shed += 1
+                job.future.set_exception(JobShed())
+                continue
+
+            self.busy += 1
+            try:
+                result = await job.fn()
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self.busy -= 1
+                elapsed = time.monotonic() - started
+                self.service_time = elapsed if not self.done else 0.8 * self.service_time + 0.2 * elapsed
+                self.done += 1
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self._heap:
+            if not job.future.done():
+                job.future.set_exception(JobShed())
+        self._heap.clear()
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._heap),
+            "busy": self.busy,
+            "workers": self.workers,
+            "service_time": self.service_time,
+            "done": self.done,
+            "shed": self.shed,
+        }
+
+
+AI_JOBS = AIJobQueue()
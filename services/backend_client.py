@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from typing import Callable
+from urllib.parse import urlsplit
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+BACKEND_TIMEOUT_MIN = float(os.getenv("BACKEND_TIMEOUT_MIN", "2"))
+BACKEND_TIMEOUT_MAX = float(os.getenv("BACKEND_TIMEOUT_MAX", "20"))
+BACKEND_TIMEOUT_FACTOR = float(os.getenv("BACKEND_TIMEOUT_FACTOR", "2.0"))
+BACKEND_LATENCY_WINDOW = int(os.getenv("BACKEND_LATENCY_WINDOW", "200"))
+BACKEND_LATENCY_MIN_SAMPLES = int(os.getenv("BACKEND_LATENCY_MIN_SAMPLES", "20"))
+BACKEND_RETRIES = int(os.getenv("BACKEND_RETRIES", "2"))
+BACKEND_RETRY_BASE = float(os.getenv("BACKEND_RETRY_BASE", "0.2"))
+BACKEND_CB_FAILURES = int(os.getenv("BACKEND_CB_FAILURES", "5"))
+BACKEND_CB_RESET = float(os.getenv("BACKEND_CB_RESET", "30"))
+
+# Faqat shu metodlar qayta yuboriladi (ikki marta bajarilsa zarar yo'q)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+_ID_RE = re.compile(r"/\d+(?=/|$)")
+
+
+class BackendUnavailable(Exception):
+    """Backend ishlamayapti (circuit ochiq yoki qayta urinishlar tugadi)."""
+
+
+def endpoint_key(method: str, url: str) -> str:
+    """GET /api/tasks/15/ -> "GET /api/tasks/{id}/" (latency statistikasi shu bo'yicha)."""
+    return f"{method} {_ID_RE.sub('/{id}', urlsplit(url).path)}"
+
+
+class LatencyTracker:
+    """Endpoint bo'yicha oxirgi N ta muvaffaqiyatli javob vaqti."""
+
+    __slots__ = ("samples",)
+
+    def __init__(self):
+        self.samples: deque[float] = deque(maxlen=BACKEND_LATENCY_WINDOW)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def p99(self) -> float | None:
+        if len(self.samples) < BACKEND_LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    def timeout(self) -> float:
+        """p99 * factor, [MIN, MAX] oralig'ida. Statistika yetarli bo'lmasa MAX."""
+        p99 = self.p99()
+        if p99 is None:
+            return BACKEND_TIMEOUT_MAX
+        return max(BACKEND_TIMEOUT_MIN, min(BACKEND_TIMEOUT_MAX, p99 * BACKEND_TIMEOUT_FACTOR))
+
+
+class CircuitBreaker:
+    """
+    closed -> (ketma-ket N xato) -> open -> (reset vaqti o'tdi) -> half-open (bitta sinov so'rovi)
+    sinov muvaffaqiyatli bo'lsa closed, aks holda yana open.
+    """
+
+    def __init__(self, failures: int = BACKEND_CB_FAILURES, reset_after: float = BACKEND_CB_RESET):
+        self.threshold = failures
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: float | None = None
+        # sinov so'rovi boshlangan vaqt (bekor qilinib "osilib" qolsa, reset_after'dan keyin yangisi)
+        self._probe_started: float | None = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        now = time.monotonic()
+        if state == "half-open" and (
+            self._probe_started is None or now - self._probe_started >= self.reset_after
+        ):
+            self._probe_started = now
+            return True
+        return False
+
+    def success(self):
+        if self.opened_at is not None:
+            logger.info("backend circuit closed")
+        self.failures = 0
+        self.opened_at = None
+        self._probe_started = None
+
+    def failure(self):
+        self.failures += 1
+        probing = self._probe_started is not None
+        if probing or self.failures >= self.threshold:
+            if self.opened_at is None:
+                logger.warning("backend circuit opened after %d failures", self.failures)
+            self.opened_at = time.monotonic()
+        self._probe_started = None
+
+
+class BackendClient:
+    """
+    HTTP_SESSION ustidagi qatlam: endpoint bo'yicha adaptiv timeout,
+    idempotent so'rovlar uchun jitter'li qayta urinish va circuit breaker.
+    """
+
+    def __init__(self, get_session: Callable[[], aiohttp.ClientSession]):
+        self._get_session = get_session
+        self.latency: dict[str, LatencyTracker] = {}
+        self.breaker = CircuitBreaker()
+
+    def _tracker(self, key: str) -> LatencyTracker:
+        tracker = self.latency.get(key)
+        if tracker is None:
+            tracker = self.latency[key] = LatencyTracker()
+        return tracker
+
+    async def _once(self, method, url, timeout, **kwargs):
+        async with self._get_session().request(
+            method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+        ) as resp:
+            # Connection reuse (keep-alive) uchun body o'qilishi muhim
+            ctype = resp.headers.get("Content-Type", "")
+            if "application/json" in ctype:
+                data = await resp.json()
+            else:
+                data = await resp.text()
+            return resp.status, data
+
+    async def request(self, method: str, url: str, **kwargs) -> tuple[int, object]:
+        if not self.breaker.allow():
+            raise BackendUnavailable("circuit open")
+
+        key = endpoint_key(method, url)
+        tracker = self._tracker(key)
+        attempts = 1 + (BACKEND_RETRIES if method in IDEMPOTENT_METHODS else 0)
+        last_error: Exception | None = None
+
+        for attempt in range(attempts):
+            if attempt:
+                # full jitter: 0 .. base * 2^attempt
+                await asyncio.sleep(random.uniform(0, BACKEND_RETRY_BASE * (2 ** attempt)))
+            started = time.monotonic()
+            try:
+                status, data = await self._once(method, url, tracker.timeout(), **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+                logger.warning("%s failed (attempt %d/%d): %r", key, attempt + 1, attempts, e)
+                continue
+
+            if status in RETRY_STATUSES and attempt + 1 < attempts:
+                last_error = None
+                continue
+            if status >= 500:
+                # 500 ham backend nosozligi: doim 500 qaytarayotgan backend breaker'ni ochadi
+                self.breaker.failure()
+                return status, data
+
+            tracker.add(time.monotonic() - started)
+            self.breaker.success()
+            return status, data
+
+        self.breaker.failure()
+        raise BackendUnavailable(f"{key}: {last_error!r}") from last_error
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "endpoints": {
+                key: {"samples": len(t.samples), "p99": t.p99(), "timeout": t.timeout()}
+                for key, t in self.latency.items()
+            },
+        }
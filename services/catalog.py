@@ -0,0 +1,144 @@
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+
+from aiogram.types import (
+    InlineKeyboardMarkup,
+    KeyboardButton,
+    ReplyKeyboardMarkup,
+)
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.getenv("CATALOG_PATH", str(Path(__file__).resolve().parent.parent / "data" / "catalog.json"))
+# Fayl o'zgarganini shunchalik tez-tez tekshiradi (0 = kuzatmaydi, faqat /reload_catalog)
+CATALOG_WATCH_INTERVAL = float(os.getenv("CATALOG_WATCH_INTERVAL", "5"))
+
+Markup = InlineKeyboardMarkup | ReplyKeyboardMarkup | None
+
+
+class CatalogError(ValueError):
+    """Katalog fayli noto'g'ri (eski katalog ishlashda davom etadi)."""
+
+
+def _reply_keyboard(rows: list[list[dict]], **options) -> ReplyKeyboardMarkup:
+    # "url" kabi qo'shimcha maydonlar ham KeyboardButton'ga o'tadi (eski klaviaturadagidek)
+    return ReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(**button) for button in row] for row in rows],
+        **options,
+    )
+
+
+class Catalog:
+    """
+    Fayldan bir marta qurilgan, o'zgarmas katalog:
+    texts - reply tugma matni -> (javob, klaviatura), callbacks - callback_data -> (javob, klaviatura).
+    Hamma klaviaturalar shu yerda bir marta yaratiladi.
+    """
+
+    __slots__ = ("main_text", "main_menu", "texts", "callbacks", "mtime")
+
+    def __init__(self, data: dict, mtime: float = 0.0):
+        self.mtime = mtime
+        self.texts: dict[str, tuple[str, Markup]] = {}
+        self.callbacks: dict[str, tuple[str, Markup]] = {}
+        try:
+            menu = data["main_menu"]
+            self.main_text = menu["text"]
+            self.main_menu = _reply_keyboard(
+                menu["keyboard"],
+                resize_keyboard=menu.get("resize_keyboard", True),
+                one_time_keyboard=menu.get("one_time_keyboard", False),
+            )
+            for section in data["sections"]:
+                self._add_section(section)
+        except CatalogError:
+            raise
+        except (KeyError, TypeError, ValueError) as e:
+            raise CatalogError(f"catalog: missing or invalid field {e}") from e
+
+    def _add(self, index: dict, key: str, value: tuple[str, Markup]):
+        old = index.get(key)
+        if old is not None and old[0] != value[0]:
+            raise CatalogError(f"catalog: duplicate button {key!r} with different content")
+        index.setdefault(key, value)
+
+    def _add_section(self, section: dict):
+        prefix = section["callback_prefix"]
+        builder = InlineKeyboardBuilder()
+        for lang in section["languages"]:
+            builder.button(text=lang["label"], callback_data=f"{prefix}_{lang['code']}")
+
+            courses = [{"text": c["button"]} for c in lang["courses"]]
+            keyboard = _reply_keyboard([courses, [{"text": lang["back_button"]}]], resize_keyboard=True)
+            self._add(self.callbacks, f"{prefix}_{lang['code']}", (lang["chosen"], keyboard))
+            self._add(self.texts, lang["back_button"], (lang["back_text"], self.main_menu))
+            for course in lang["courses"]:
+                self._add(self.texts, course["button"], (course["text"], None))
+
+        back = section["back"]
+        builder.button(text=back["label"], callback_data=f"{prefix}_{back['code']}")
+        builder.adjust(*section.get("layout", [3, 1]))
+        self._add(self.callbacks, f"{prefix}_{back['code']}", (back["text"], self.main_menu))
+        self._add(self.texts, section["button"], (section["prompt"], builder.as_markup()))
+
+
+class CatalogStore:
+    """
+    Joriy katalog. reload() yangi Catalog'ni to'liq quradi va bitta o'zlashtirish bilan almashtiradi:
+    handler'lar yo eski, yo yangi katalogni ko'radi, yarim yuklanganini emas.
+    """
+
+    def __init__(self, path: str = CATALOG_PATH):
+        self.path = path
+        self.current: Catalog | None = None
+        # oxirgi ko'rilgan mtime (buzuq fayl har safar qayta o'qilmasin)
+        self._seen_mtime: float | None = None
+        self._watcher: asyncio.Task | None = None
+
+    def _mtime(self) -> float:
+        return os.stat(self.path).st_mtime
+
+    def reload(self) -> Catalog:
+        mtime = self._seen_mtime = self._mtime()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except ValueError as e:
+            raise CatalogError(f"catalog: invalid JSON: {e}") from e
+        catalog = Catalog(data, mtime)
+        self.current = catalog
+        logger.info("catalog loaded: %d buttons, %d callbacks", len(catalog.texts), len(catalog.callbacks))
+        return catalog
+
+    async def start(self):
+        if self.current is None:
+            self.reload()
+        if CATALOG_WATCH_INTERVAL > 0:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(CATALOG_WATCH_INTERVAL)
+            try:
+                if self._mtime() != self._seen_mtime:
+                    self.reload()
+            except (OSError, CatalogError) as e:
+                logger.error("catalog reload failed, keeping previous version: %s", e)
+
+    async def close(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+
+CATALOG = CatalogStore()
+# Import paytida yuklanadi: handler'lar startup'dan oldin ham katalogni ko'radi
+CATALOG.reload()
@@ -0,0 +1,18 @@
+import os
+
+import aiosqlite
+
+# Barcha lokal store'lar (sessiya, kesh, FSM ...) shu faylni ishlatadi
+DB_PATH = os.getenv("BOT_DB_PATH", "riseup.db")
+
+
+async def connect(path: str | None = None) -> aiosqlite.Connection:
+    """
+    SQLite ulanishini ochadi (WAL rejimida).
+    WAL bir nechta o'quvchi + bitta yozuvchini bloklamasdan ishlatishga imkon beradi.
+    """
+    conn = await aiosqlite.connect(path or DB_PATH)
+    await conn.execute("PRAGMA journal_mode=WAL")
+    await conn.execute("PRAGMA synchronous=NORMAL")
+    await conn.execute("PRAGMA busy_timeout=5000")
+    return conn
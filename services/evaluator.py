@@ -0,0 +1,177 @@
+import os
+import re
+from bisect import bisect_right
+from collections import OrderedDict
+
+EVALUATOR_CACHE_SIZE = int(os.getenv("EVALUATOR_CACHE_SIZE", "5000"))
+
+_WS_RE = re.compile(r"\s+")
+_NUM_RE = re.compile(r"\d+")
+_PARTS_RE = re.compile(r"[,\n;]+")
+
+# normalize_text "\n" ni bo'sh joyga aylantiradi, demak u hech bir normalize
+# qilingan matnda uchramaydi -> variantlarni ajratuvchi sifatida xavfsiz
+_SEP = "\n"
+
+
+def normalize_text(s: str) -> str:
+    """Taqqoslash uchun matnni normalize qilish (lower, bo'sh joylarni tozalash)."""
+    return _WS_RE.sub(" ", s).strip().lower()
+
+
+class CompiledTask:
+    """
+    Bir marta tayyorlangan (immutable) baholovchi:
+    variantlar oldindan normalize qilingan, to'g'ri javoblar to'plami tayyor.
+    """
+
+    __slots__ = (
+        "type", "expected", "expected_norm", "option_texts", "norm_index",
+        "haystack", "starts", "correct_indexes", "correct_texts",
+    )
+
+    def __init__(self, task: dict):
+        set_ = object.__setattr__
+        set_(self, "type", task["type"])
+        expected = (task.get("correct_short") or "").strip()
+        set_(self, "expected", expected)
+        set_(self, "expected_norm", normalize_text(expected))
+
+        options = task.get("options") or []
+        texts = tuple(o["text"] for o in options)
+        norms = [normalize_text(t) for t in texts]
+        norm_index = {}
+        for i, n in enumerate(norms):
+            norm_index.setdefault(n, i)
+
+        starts = []
+        pos = 0
+        for n in norms:
+            starts.append(pos)
+            pos += len(n) + len(_SEP)
+
+        set_(self, "option_texts", texts)
+        set_(self, "norm_index", norm_index)
+        set_(self, "haystack", _SEP.join(norms))
+        set_(self, "starts", tuple(starts))
+        correct = frozenset(i for i, o in enumerate(options) if o["correct"])
+        set_(self, "correct_indexes", correct)
+        set_(self, "correct_texts", ", ".join(texts[i] for i in sorted(correct)) or "—")
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledTask o'zgarmas")
+
+    def _options_containing(self, part: str, found: set):
+        """part qaysi variant(lar) ichida uchrasa, o'sha indekslarni found'ga qo'shadi."""
+        haystack, starts = self.haystack, self.starts
+        pos = haystack.find(part)
+        while pos != -1:
+            i = bisect_right(starts, pos) - 1
+            found.add(i)
+            if i + 1 >= len(starts):
+                break
+            pos = haystack.find(part, starts[i + 1])
+
+    def evaluate(self, user_answer_raw: str) -> tuple[bool, str]:
+        user_answer_raw = user_answer_raw.strip()
+
+        # === SHORT ANSWER ===
+        if self.type == "short":
+            expected = self.expected
+            correct = bool(self.expected_norm) and normalize_text(user_answer_raw) == self.expected_norm
+            if correct:
+                return True, (
+                    "✅ *To‘g‘ri javob!*\n\n"
+                    f"📌 Sizning javobingiz: `{user_answer_raw}`\n"
+                    f"✅ To‘g‘ri javob: `{expected}`"
+                )
+            return False, (
+                "❌ *Noto‘g‘ri javob.*\n\n"
+                f"📌 Sizning javobingiz: `{user_answer_raw}`\n"
+                f"✅ To‘g‘ri javob: `{expected or '—'}`"
+            )
+
+        # === MCQ / CHECKBOX ===
+        n_options = len(self.option_texts)
+        if not n_options:
+            return False, "⚠️ Bu savol uchun variantlar topilmadi."
+
+        # 1) Raqam ko‘rinishida javoblar (1, 2, 3 ...)
+        chosen = set()
+        for n in _NUM_RE.findall(user_answer_raw):
+            idx = int(n) - 1
+            if 0 <= idx < n_options:
+                chosen.add(idx)
+
+        # 2) Matn bo‘yicha: har bir qism qaysi variant ichida uchrashini qidiramiz
+        if not chosen:
+            parts = {normalize_text(p) for p in _PARTS_RE.split(user_answer_raw) if p.strip()}
+            for p in parts:
+                self._options_containing(p, chosen)
+
+            # mcq: hech nima topilmasa, to‘liq matn bo‘yicha
+            if not chosen and self.type == "mcq":
+                idx = self.norm_index.get(normalize_text(user_answer_raw))
+                if idx is not None:
+                    chosen.add(idx)
+
+        if self.type == "mcq":
+            correct = len(chosen) == 1 and chosen == self.correct_indexes
+        else:  # checkbox
+            correct = chosen == self.correct_indexes and len(self.correct_indexes) > 0
+
+        texts = self.option_texts
+        user_chosen_texts = ", ".join(texts[i] for i in sorted(chosen)) if chosen else "—"
+
+        if correct:
+            return True, (
+                "✅ *To‘g‘ri javob!*\n\n"
+                f"📌 Siz tanlagan variant(lar): {user_chosen_texts}\n"
+                f"✅ To‘g‘ri variant(lar): {self.correct_texts}"
+            )
+        return False, (
+            "❌ *Noto‘g‘ri javob.*\n\n"
+            f"📌 Siz tanlagan variant(lar): {user_chosen_texts}\n"
+            f"✅ To‘g‘ri variant(lar): {self.correct_texts}"
+        )
+
+
+_COMPILED: OrderedDict[tuple, CompiledTask] = OrderedDict()
+# TASK_CACHE bir xil dict obyektini qaytaradi: id(task) bo'yicha tezkor yo'l
+# (dict'ning o'zi ham saqlanadi, shunda id qayta ishlatilib qolmaydi)
+_BY_IDENTITY: OrderedDict[int, tuple[dict, CompiledTask]] = OrderedDict()
+
+
+def task_version(task: dict):
+    """Backend updated_at bersa o'sha, bo'lmasa baholashga ta'sir qiladigan maydonlar."""
+    updated = task.get("updated_at")
+    if updated:
+        return updated
+    return (
+        task.get("type"),
+        task.get("correct_short"),
+        tuple((o["text"], o["correct"]) for o in task.get("options") or ()),
+    )
+
+
+def compile_task(task: dict) -> CompiledTask:
+    """Task id + versiya bo'yicha keshlangan CompiledTask."""
+    hit = _BY_IDENTITY.get(id(task))
+    if hit is not None and hit[0] is task:
+        _BY_IDENTITY.move_to_end(id(task))
+        return hit[1]
+
+    key = (task.get("id"), task_version(task))
+    compiled = _COMPILED.get(key)
+    if compiled is not None:
+        _COMPILED.move_to_end(key)
+    else:
+        compiled = CompiledTask(task)
+        _COMPILED[key] = compiled
+        if len(_COMPILED) > EVALUATOR_CACHE_SIZE:
+            _COMPILED.popitem(last=False)
+
+    _BY_IDENTITY[id(task)] = (task, compiled)
+    if len(_BY_IDENTITY) > EVALUATOR_CACHE_SIZE:
+        _BY_IDENTITY.popitem(last=False)
+    return compiled
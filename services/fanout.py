@@ -0,0 +1,335 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from services.admin import ADMIN_IDS
+from services.scheduler import UpdateScheduler, process_update, update_chat_key
+from services.signals import stop_event
+
+logger = logging.getLogger(__name__)
+
+# >1 bo'lsa: bitta ingress jarayoni (polling/webhook) update'larni shuncha worker jarayonga tarqatadi
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+# Ingress o'zi worker'larni ishga tushirganda qo'yadi: "worker"
+BOT_ROLE = os.getenv("BOT_ROLE", "")
+BOT_WORKER_ID = int(os.getenv("BOT_WORKER_ID", "0"))
+BOT_INGRESS_SOCKET = os.getenv("BOT_INGRESS_SOCKET", "")
+WORKER_HEARTBEAT_INTERVAL = float(os.getenv("WORKER_HEARTBEAT_INTERVAL", "5"))
+# Shuncha heartbeat o'tkazib yuborgan worker osilib qolgan deb qayta ishga tushiriladi
+WORKER_HEARTBEAT_MISSES = int(os.getenv("WORKER_HEARTBEAT_MISSES", "6"))
+WORKER_START_TIMEOUT = float(os.getenv("WORKER_START_TIMEOUT", "60"))
+WORKER_STOP_TIMEOUT = float(os.getenv("WORKER_STOP_TIMEOUT", "15"))
+
+# Katta update'lar (uzun matn, ko'p entity) bitta qatorga sig'ishi uchun
+_LINE_LIMIT = 4 * 1024 * 1024
+
+
+def _encode(msg: dict) -> bytes:
+    return json.dumps(msg, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+def update_worker_key(update: Update):
+    """
+    Update qaysi worker'ga borishi: foydalanuvchi bo'yicha (private va gruppadagi xabarlari bitta
+    jarayonga tushadi -> sessiya, task/review keshlari va FSM bitta joyda), foydalanuvchisiz bo'lsa chat.
+    """
+    user = getattr(update.event, "from_user", None)
+    return user.id if user is not None else update_chat_key(update)
+
+
+def worker_index(key, workers: int) -> int:
+    """Kalit -> worker raqami (reminders ham shu bo'yicha bo'linadi: tg_id % workers)."""
+    return key % workers if isinstance(key, int) else hash(key) % workers
+
+
+# Admin buyruqlari: javobni egasi bo'lgan worker beradi, qolgan worker'lar o'z xotirasida jimgina bajaradi
+_CONTROL: dict[str, Callable[[], Awaitable]] = {}
+
+
+def control_command(name: str):
+    """
+    Dekorator: /name (admin) BOT_WORKERS > 1 bo'lsa boshqa worker'larda ham shu funksiyani chaqiradi
+    (masalan xotiradagi keshni tozalash). Ulanmagan worker restartda baribir yangi holatdan boshlaydi.
+    """
+    def decorator(fn: Callable[[], Awaitable]):
+        _CONTROL[name] = fn
+        return fn
+    return decorator
+
+
+def _control_name(update: Update) -> str | None:
+    msg = update.message
+    if msg is None or not msg.text or not msg.text.startswith("/") or msg.from_user is None:
+        return None
+    if msg.from_user.id not in ADMIN_IDS:
+        return None
+    name = msg.text.split()[0][1:].split("@")[0].lower()
+    return name if name in _CONTROL else None
+
+
+def worker_label() -> str:
+    """Statistika faqat shu jarayonniki: bir nechta worker bo'lsa qaysi biri ekani ko'rsatiladi."""
+    if BOT_WORKERS <= 1:
+        return ""
+    return f"🧩 Worker {BOT_WORKER_ID + 1}/{BOT_WORKERS} (faqat shu jarayon hisoblagichlari)\n\n"
+
+
+# ==================== INGRESS ====================
+
+class _WorkerLink:
+    __slots__ = ("id", "process", "writer", "pending", "connected", "last_seen", "stats", "restarts")
+
+    def __init__(self, worker_id: int):
+        self.id = worker_id
+        self.process: asyncio.subprocess.Process | None = None
+        self.writer: asyncio.StreamWriter | None = None
+        # update_id -> (json qator, ack kutayotgan future); worker o'lsa qayta yuboriladi
+        self.pending: dict[int, tuple[bytes, asyncio.Future]] = {}
+        self.connected = asyncio.Event()
+        self.last_seen = time.monotonic()
+        self.stats: dict = {}
+        self.restarts = 0
+
+
+class FanOut:
+    """
+    Ingress tomoni: update foydalanuvchi (bo'lmasa chat) bo'yicha doim bitta worker'ga boradi
+    (foydalanuvchi ichida tartib va FSM/kesh lokalligi saqlanadi). dispatch() worker ack bergunicha kutadi,
+    shuning uchun polling offset'i / webhook navbati faqat qayta ishlangan update'lar bo'yicha siljiydi.
+    Worker o'lsa yoki heartbeat'i to'xtasa qayta ishga tushiriladi, ack bo'lmaganlar qayta yuboriladi.
+    """
+
+    def __init__(self, workers: int = BOT_WORKERS, argv: list[str] | None = None):
+        self.argv = argv or [sys.executable, os.path.abspath(sys.argv[0])]
+        self.socket_path = os.path.join(tempfile.gettempdir(), f"riseup-ingress-{os.getpid()}.sock")
+        self.links = [_WorkerLink(i) for i in range(workers)]
+        self._server: asyncio.AbstractServer | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._closing = False
+
+    # ---------- jarayonlar ----------
+
+    def _worker_env(self, worker_id: int) -> dict:
+        env = dict(os.environ)
+        env["BOT_ROLE"] = "worker"
+        env["BOT_WORKER_ID"] = str(worker_id)
+        env["BOT_INGRESS_SOCKET"] = self.socket_path
+        # har worker o'z spool fayliga yozadi (bitta faylni ikki jarayon siqib yubormasin)
+        spool = os.getenv("STATS_SPOOL_PATH", "stats_spool.jsonl")
+        env["STATS_SPOOL_PATH"] = f"{spool}.w{worker_id}"
+        # AI global limiti jarayonlar orasida bo'linadi
+        global_rate = float(os.getenv("AI_RL_GLOBAL_PER_MIN", "120"))
+        env["AI_RL_GLOBAL_PER_MIN"] = str(global_rate / len(self.links))
+        # Telegram'ning ~30 xabar/s limiti ham (per-chat limit bo'linmaydi: gruppa bir nechta
+        # worker'dan yozsa ortiqchasi 429 -> retry_after bilan qaytariladi)
+        send_rate = float(os.getenv("SEND_GLOBAL_PER_SEC", "30"))
+        env["SEND_GLOBAL_PER_SEC"] = str(send_rate / len(self.links))
+        return env
+
+    async def _spawn(self, link: _WorkerLink):
+        link.connected.clear()
+        link.writer = None
+        link.last_seen = time.monotonic()
+        link.process = await asyncio.create_subprocess_exec(*self.argv, env=self._worker_env(link.id))
+        logger.info("worker %d started (pid %d)", link.id, link.process.pid)
+
+    async def _supervise(self, link: _WorkerLink):
+        while not self._closing:
+            code = await link.process.wait()
+            if self._closing:
+                return
+            link.restarts += 1
+            logger.error("worker %d exited with %s, restarting (%d pending)", link.id, code, len(link.pending))
+            await asyncio.sleep(min(30, link.restarts))
+            await self._spawn(link)
+
+    async def _watchdog(self):
+        limit = WORKER_HEARTBEAT_INTERVAL * WORKER_HEARTBEAT_MISSES
+        while True:
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            for link in self.links:
+                alive = link.process is not None and link.process.returncode is None
+                # ulanmagan worker hali import/startup'da: unga WORKER_START_TIMEOUT beriladi
+                allowed = limit if link.connected.is_set() else WORKER_START_TIMEOUT
+                if alive and now - link.last_seen > allowed:
+                    logger.error("worker %d is not responding, killing", link.id)
+                    link.process.kill()  # _supervise qayta ishga tushiradi
+
+    # ---------- aloqa ----------
+
+    async def _on_connect(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        hello = json.loads(await reader.readline())
+        link = self.links[hello["worker"]]
+        link.writer = writer
+        link.last_seen = time.monotonic()
+        # oldingi (o'lgan) worker tugatmagan update'lar tartib bilan qayta yuboriladi
+        for update_id in sorted(link.pending):
+            writer.write(link.pending[update_id][0])
+        await writer.drain()
+        link.connected.set()
+        logger.info("worker %d connected (pid %s)", link.id, hello.get("pid"))
+
+        try:
+            while line := await reader.readline():
+                msg = json.loads(line)
+                link.last_seen = time.monotonic()
+                if msg["op"] == "ack":
+                    entry = link.pending.pop(msg["id"], None)
+                    if entry is not None and not entry[1].done():
+                        entry[1].set_result(None)
+                elif msg["op"] == "health":
+                    link.stats = msg["stats"]
+        except (ConnectionError, ValueError) as e:
+            logger.warning("worker %d link broken: %r", link.id, e)
+        finally:
+            if link.writer is writer:
+                link.writer = None
+                link.connected.clear()
+            writer.close()
+
+    async def start(self):
+        self._server = await asyncio.start_unix_server(self._on_connect, self.socket_path, limit=_LINE_LIMIT)
+        for link in self.links:
+            await self._spawn(link)
+        self._tasks = [asyncio.create_task(self._supervise(link)) for link in self.links]
+        self._tasks.append(asyncio.create_task(self._watchdog()))
+        await asyncio.wait_for(
+            asyncio.gather(*(link.connected.wait() for link in self.links)), WORKER_START_TIMEOUT
+        )
+        logger.info("fan-out: %d workers ready", len(self.links))
+
+    async def dispatch(self, update: Update):
+        """Poller/webhook scheduler'i uchun processor: worker ack berguncha kutadi."""
+        link = self.links[worker_index(update_worker_key(update), len(self.links))]
+        line = _encode({"op": "update", "id": update.update_id,
+                        "update": update.model_dump(mode="json", exclude_unset=True, by_alias=True)})
+        fut = asyncio.get_running_loop().create_future()
+        link.pending[update.update_id] = (line, fut)
+        if link.writer is not None:
+            try:
+                link.writer.write(line)
+                await link.writer.drain()
+            except ConnectionError:
+                pass  # worker qayta ulanganda pending'dan yuboriladi
+        # ulanmagan bo'lsa: qayta ulanganda _on_connect yuboradi
+        control = _control_name(update)
+        if control is not None:
+            self._broadcast(control, skip=link)
+        await fut
+
+    def _broadcast(self, name: str, skip: _WorkerLink):
+        line = _encode({"op": "control", "command": name})
+        for link in self.links:
+            if link is not skip and link.writer is not None:
+                link.writer.write(line)
+        logger.info("control command /%s sent to %d workers", name, len(self.links) - 1)
+
+    def health(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "worker": link.id,
+                "pid": link.process.pid if link.process else None,
+                "connected": link.connected.is_set(),
+                "pending": len(link.pending),
+                "last_seen": round(now - link.last_seen, 1),
+                "restarts": link.restarts,
+                **link.stats,
+            }
+            for link in self.links
+        ]
+
+    async def close(self):
+        self._closing = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for link in self.links:
+            if link.process is not None and link.process.returncode is None:
+                link.process.terminate()  # worker SIGTERM'da navbatini tugatib chiqadi
+        for link in self.links:
+            if link.process is None:
+                continue
+            try:
+                await asyncio.wait_for(link.process.wait(), WORKER_STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("worker %d did not stop in time, killing", link.id)
+                link.process.kill()
+                await link.process.wait()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+# ==================== WORKER ====================
+
+async def run_worker(dp: Dispatcher, bot: Bot):
+    """Ingress'dan update'larni oladi, chat bo'yicha tartibda qayta ishlaydi va ack qaytaradi."""
+    reader, writer = await asyncio.open_unix_connection(BOT_INGRESS_SOCKET, limit=_LINE_LIMIT)
+    writer.write(_encode({"op": "hello", "worker": BOT_WORKER_ID, "pid": os.getpid()}))
+    await writer.drain()
+
+    workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+
+    async def handle(update: Update):
+        try:
+            await process_update(dp, bot, update, **workflow_data)
+        finally:
+            writer.write(_encode({"op": "ack", "id": update.update_id}))
+
+    scheduler = UpdateScheduler(handle)
+
+    async def heartbeat():
+        while True:
+            writer.write(_encode({"op": "health", "stats": scheduler.stats()}))
+            await writer.drain()
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+
+    async def receive():
+        while line := await reader.readline():
+            msg = json.loads(line)
+            if msg["op"] == "update":
+                await scheduler.submit(Update.model_validate(msg["update"], context={"bot": bot}))
+            elif msg["op"] == "control":
+                try:
+                    await _CONTROL[msg["command"]]()
+                    logger.info("worker %d: control command /%s done", BOT_WORKER_ID, msg["command"])
+                except Exception:
+                    logger.exception("worker %d: control command /%s failed", BOT_WORKER_ID, msg["command"])
+
+    await dp.emit_startup(bot=bot, **workflow_data)
+    beats = asyncio.create_task(heartbeat())
+    receiver = asyncio.create_task(receive())
+    stopper = asyncio.create_task(stop_event().wait())
+    logger.info("worker %d running", BOT_WORKER_ID)
+    try:
+        await asyncio.wait({receiver, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        for task in (receiver, stopper):
+            task.cancel()
+        await asyncio.gather(receiver, stopper, return_exceptions=True)
+        # olingan update'lar tugatiladi (ack'lari ingress'ga yetib borsin)
+        await scheduler.join(WORKER_STOP_TIMEOUT)
+        await asyncio.wait_for(writer.drain(), 5)
+    except (ConnectionError, asyncio.TimeoutError):
+        pass
+    finally:
+        # ack'siz qolganlarini ingress qayta yuboradi; storage yopilishidan oldin to'xtatiladi
+        await scheduler.cancel()
+        beats.cancel()
+        await asyncio.gather(beats, return_exceptions=True)
+        writer.close()
+        logger.info("worker %d stopped", BOT_WORKER_ID)
+        await dp.emit_shutdown(bot=bot, **workflow_data)
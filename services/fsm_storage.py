@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from services.db import DB_PATH, connect
+
+logger = logging.getLogger(__name__)
+
+FSM_BACKEND = os.getenv("FSM_BACKEND", "sqlite")  # "sqlite" | "memory"
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+# Shuncha vaqt tegilmagan state (tashlab ketilgan login / javob) o'chiriladi
+FSM_TTL = float(os.getenv("FSM_TTL", str(24 * 3600)))
+FSM_SWEEP_INTERVAL = float(os.getenv("FSM_SWEEP_INTERVAL", "600"))
+FSM_SWEEP_BATCH = int(os.getenv("FSM_SWEEP_BATCH", "500"))
+
+
+class _Record:
+    __slots__ = ("state", "data", "updated_at")
+
+    def __init__(self, state: str | None, data: dict, updated_at: float):
+        self.state = state
+        self.data = data
+        self.updated_at = updated_at
+
+    def empty(self) -> bool:
+        return self.state is None and not self.data
+
+    def expired(self, now: float) -> bool:
+        return now - self.updated_at > FSM_TTL
+
+
+class SqliteFSMStorage(BaseStorage):
+    """
+    aiogram FSM storage: SQLite (restartdan keyin ham state saqlanadi) + chegaralangan LRU kesh.
+    Yozish write-through: kesh va DB birga yangilanadi. Bo'sh state ham keshlanadi,
+    shuning uchun state'siz foydalanuvchining har xabari DB'ga bormaydi.
+    FSM_TTL'dan eski state'lar o'qishda e'tiborsiz, fon sweep'da batch bilan o'chiriladi.
+    """
+
+    def __init__(self, path: str = DB_PATH, cache_size: int = FSM_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True, with_destiny=True)
+        self._conn = None
+        self._cache: OrderedDict[str, _Record] = OrderedDict()
+        self._sweeper: asyncio.Task | None = None
+
+    async def start(self):
+        self._conn = await connect(self.path)
+        await self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fsm_states (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        await self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS fsm_states_updated_at ON fsm_states(updated_at)"
+        )
+        await self._conn.commit()
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    # ---------- kesh + DB ----------
+
+    def _remember(self, key: str, record: _Record):
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _load(self, key: str) -> _Record:
+        record = self._cache.get(key)
+        if record is None:
+            async with self._conn.execute(
+                "SELECT state, data, updated_at FROM fsm_states WHERE key = ?", (key,)
+            ) as cur:
+                row = await cur.fetchone()
+            if row is None:
+                record = _Record(None, {}, time.time())
+            else:
+                record = _Record(row[0], json.loads(row[1]), row[2])
+        if record.expired(time.time()):
+            record = _Record(None, {}, time.time())
+        self._remember(key, record)
+        return record
+
+    async def _save(self, key: str, record: _Record):
+        self._remember(key, record)
+        if record.empty():
+            await self._conn.execute("DELETE FROM fsm_states WHERE key = ?", (key,))
+        else:
+            await self._conn.execute(
+                "INSERT OR REPLACE INTO fsm_states VALUES (?, ?, ?, ?)",
+                (key, record.state, json.dumps(record.data, ensure_ascii=False), record.updated_at),
+            )
+        await self._conn.commit()
+
+    # ---------- BaseStorage ----------
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = self.key_builder.build(key)
+        current = await self._load(k)
+        value = state.state if isinstance(state, State) else state
+        await self._save(k, _Record(value, current.data, time.time()))
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._load(self.key_builder.build(key))).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        k = self.key_builder.build(key)
+        current = await self._load(k)
+        await self._save(k, _Record(current.state, dict(data), time.time()))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return dict((await self._load(self.key_builder.build(key))).data)
+
+    # ---------- sweep ----------
+
+    async def sweep(self) -> int:
+        """Eskirgan state'larni FSM_SWEEP_BATCH'lab o'chiradi (DB'ni uzoq band qilmaydi)."""
+        now = time.time()
+        for key in [k for k, r in self._cache.items() if not r.empty() and r.expired(now)]:
+            del self._cache[key]
+
+        removed = 0
+        while True:
+            cur = await self._conn.execute(
+                "DELETE FROM fsm_states WHERE key IN "
+                "(SELECT key FROM fsm_states WHERE updated_at < ? LIMIT ?)",
+                (now - FSM_TTL, FSM_SWEEP_BATCH),
+            )
+            await self._conn.commit()
+            removed += cur.rowcount
+            if cur.rowcount < FSM_SWEEP_BATCH:
+                return removed
+            await asyncio.sleep(0)  # batch'lar orasida update'lar ham ishlasin
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(FSM_SWEEP_INTERVAL)
+            try:
+                removed = await self.sweep()
+                if removed:
+                    logger.info("fsm sweep: %d abandoned states removed", removed)
+            except Exception:
+                logger.exception("fsm sweep failed")
+
+
+class MemoryFSMStorage(MemoryStorage):
+    """Lokal dev/test uchun: restartda hammasi yo'qoladi."""
+
+    async def start(self):
+        pass
+
+
+def make_fsm_storage() -> SqliteFSMStorage | MemoryFSMStorage:
+    if FSM_BACKEND == "memory":
+        return MemoryFSMStorage()
+    return SqliteFSMStorage(DB_PATH)
+
+
+FSM_STORAGE = make_fsm_storage()
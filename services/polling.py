@@ -0,0 +1,281 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiogram.utils.backoff import Backoff, BackoffConfig
+
+from services.scheduler import UpdateScheduler, process_update, update_chat_key
+from services.signals import stop_event
+
+logger = logging.getLogger(__name__)
+
+POLLING_OFFSET_PATH = os.getenv("POLLING_OFFSET_PATH", "polling_offset.json")
+POLLING_TIMEOUT = int(os.getenv("POLLING_TIMEOUT", "30"))
+POLLING_CHECKPOINT_INTERVAL = float(os.getenv("POLLING_CHECKPOINT_INTERVAL", "1.0"))
+# restartdan keyin bir martada xotiraga olinadigan eng ko'p backlog
+POLLING_BACKLOG_MAX = int(os.getenv("POLLING_BACKLOG_MAX", "20000"))
+POLLING_SHUTDOWN_TIMEOUT = float(os.getenv("POLLING_SHUTDOWN_TIMEOUT", "10"))
+# backlog'dagi shundan eskiligi aniq bo'lgan tugma bosishlar qayta ishlanmaydi (foydalanuvchiga javob beriladi)
+POLLING_CALLBACK_MAX_AGE = float(os.getenv("POLLING_CALLBACK_MAX_AGE", "30"))
+
+BACKOFF_CONFIG = BackoffConfig(min_delay=1.0, max_delay=5.0, factor=1.3, jitter=0.1)
+
+
+class OffsetStore:
+    """Oxirgi to'liq qayta ishlangan update_id lokal faylda (atomik yoziladi)."""
+
+    def __init__(self, path: str = POLLING_OFFSET_PATH):
+        self.path = path
+        self.saved: int | None = None
+
+    def load(self) -> int | None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.saved = int(json.load(f)["update_id"])
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            self.saved = None
+        return self.saved
+
+    def save(self, update_id: int):
+        if update_id == self.saved:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"update_id": update_id, "saved_at": time.time()}, f)
+        os.replace(tmp, self.path)
+        self.saved = update_id
+
+
+class Watermark:
+    """
+    Update'lar parallel tugaydi: checkpoint faqat o'zidan oldingi hammasi tugagan id'gacha suriladi.
+    """
+
+    def __init__(self, start: int | None):
+        self.pending: set[int] = set()
+        self.max_seen = start
+
+    def begin(self, update_id: int):
+        self.pending.add(update_id)
+        if self.max_seen is None or update_id > self.max_seen:
+            self.max_seen = update_id
+
+    def done(self, update_id: int):
+        self.pending.discard(update_id)
+
+    def safe(self) -> int | None:
+        if self.pending:
+            return min(self.pending) - 1
+        return self.max_seen
+
+
+def _command_key(update: Update):
+    msg = update.message
+    if msg is None or not msg.text or not msg.text.startswith("/") or msg.from_user is None:
+        return None
+    return msg.chat.id, msg.from_user.id, msg.text.strip().lower()
+
+
+def _update_time(update: Update) -> float | None:
+    if update.message is not None:
+        return update.message.date.timestamp()
+    if update.edited_message is not None:
+        msg = update.edited_message
+        return (msg.edit_date or msg.date).timestamp()
+    return None
+
+
+def compact_backlog(updates: list[Update], now: float | None = None) -> tuple[list[Update], list[Update]]:
+    """
+    Restart paytida yig'ilgan backlog uchun tezkor yo'l. (qoldirilganlar, tashlangan callback'lar):
+    - bir chatda ketma-ket kelgan bir xil buyruqlar (/task, /task, /task) -> faqat oxirgisi;
+      orasida boshqa xabar bo'lsa (masalan FSM javobi) hammasi qoladi;
+    - callback query'ning o'z vaqti yo'q: undan keyin kelgan update'lar vaqtining eng kichigi
+      yuqori chegara (tugma undan oldin bosilgan). Shu chegara ham POLLING_CALLBACK_MAX_AGE'dan
+      eski bo'lsagina tashlanadi (chaqiruvchi answer qiladi); chegara bo'lmasa callback qoladi.
+    """
+    now = time.time() if now is None else now
+    drop: set[int] = set()
+    stale: list[Update] = []
+
+    # orqadan: har chatda keyingi update qaysi buyruq ekani va keyingi update'larning eng erta vaqti
+    next_in_chat: dict = {}
+    dup = 0
+    later = None
+    for u in reversed(updates):
+        key = _command_key(u)
+        chat = update_chat_key(u)
+        if key is not None and next_in_chat.get(chat) == key:
+            drop.add(u.update_id)
+            dup += 1
+        next_in_chat[chat] = key
+
+        if u.callback_query is not None and later is not None and later < now - POLLING_CALLBACK_MAX_AGE:
+            drop.add(u.update_id)
+            stale.append(u)
+        t = _update_time(u)
+        if t is not None:
+            later = t if later is None else min(later, t)
+    stale.reverse()
+
+    kept = [u for u in updates if u.update_id not in drop]
+    if drop:
+        logger.info("backlog: %d kept, %d duplicate commands, %d stale callbacks", len(kept), dup, len(stale))
+    return kept, stale
+
+
+class Poller:
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        store: OffsetStore | None = None,
+        processor: Callable[[Update], Awaitable] | None = None,
+    ):
+        self.dp = dp
+        self.bot = bot
+        self.store = store or OffsetStore()
+        self.allowed_updates = dp.resolve_used_update_types()
+        self.workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+        self.watermark: Watermark | None = None
+        # default: shu jarayonda qayta ishlash; fan-out rejimida FanOut.dispatch (worker'ga yuborish)
+        self.processor = processor or self._process
+        # chat ichida tartib, chatlar o'rtasida parallel, global limit bilan
+        self.scheduler = UpdateScheduler(self._feed)
+
+    async def _process(self, update: Update):
+        await process_update(self.dp, self.bot, update, **self.workflow_data)
+
+    async def _feed(self, update: Update):
+        try:
+            await self.processor(update)
+        except asyncio.CancelledError:
+            # shutdown'da to'xtatilgan: checkpoint undan o'tmaydi, restartdan keyin qayta keladi
+            raise
+        except Exception:
+            self.watermark.done(update.update_id)
+            raise
+        self.watermark.done(update.update_id)
+
+    async def _submit(self, update: Update):
+        self.watermark.begin(update.update_id)
+        await self.scheduler.submit(update)
+
+    async def _get_updates(self, offset: int | None, timeout: int) -> list[Update]:
+        kwargs = {}
+        if self.bot.session.timeout:
+            kwargs["request_timeout"] = int(self.bot.session.timeout + timeout)
+        return await self.bot.get_updates(
+            offset=offset, timeout=timeout, allowed_updates=self.allowed_updates, **kwargs
+        )
+
+    async def _answer_stale(self, callbacks: list[Update]):
+        """Tashlangan tugma bosishlarda "soat" aylanib qolmasin (juda eskilari Telegram'da xato beradi)."""
+        results = await asyncio.gather(
+            *(
+                self.bot.answer_callback_query(
+                    u.callback_query.id, text="⌛ Bot qayta ishga tushdi. Tugmani yana bir bor bosing."
+                )
+                for u in callbacks
+            ),
+            return_exceptions=True,
+        )
+        failed = sum(isinstance(r, Exception) for r in results)
+        if failed:
+            logger.debug("backlog: %d stale callbacks could not be answered", failed)
+
+    async def drain_backlog(self, offset: int | None) -> int | None:
+        """Restart paytida kelgan update'larni bir yo'la oladi, siqadi va qayta ishlaydi."""
+        backlog: list[Update] = []
+        while len(backlog) < POLLING_BACKLOG_MAX:
+            batch = await self._get_updates(offset, timeout=0)
+            if not batch:
+                break
+            backlog.extend(batch)
+            offset = batch[-1].update_id + 1
+        if not backlog:
+            return offset
+        logger.info("backlog: %d updates since last checkpoint", len(backlog))
+
+        kept, stale = compact_backlog(backlog)
+        await self._answer_stale(stale)
+        kept_ids = {u.update_id for u in kept}
+        for u in backlog:
+            if u.update_id not in kept_ids:
+                # tashlab yuborilganlar ham "qayta ishlangan" hisoblanadi
+                self.watermark.begin(u.update_id)
+                self.watermark.done(u.update_id)
+
+        # scheduler: chat ichida tartib, chatlar o'rtasida parallel
+        for u in kept:
+            await self._submit(u)
+        await self.scheduler.join()
+        self._checkpoint()
+        return offset
+
+    def _checkpoint(self):
+        safe = self.watermark.safe()
+        if safe is not None:
+            try:
+                self.store.save(safe)
+            except OSError:
+                logger.exception("offset checkpoint failed")
+
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(POLLING_CHECKPOINT_INTERVAL)
+            self._checkpoint()
+
+    async def _listen(self, offset: int | None):
+        backoff = Backoff(config=BACKOFF_CONFIG)
+        while True:
+            try:
+                updates = await self._get_updates(offset, timeout=POLLING_TIMEOUT)
+            except Exception as e:
+                logger.error("Failed to fetch updates - %s: %s", type(e).__name__, e)
+                await backoff.asleep()
+                continue
+            backoff.reset()
+            for update in updates:
+                offset = update.update_id + 1
+                # global limit to'lsa shu yerda kutamiz -> keyingi getUpdates kechikadi
+                await self._submit(update)
+
+    async def run(self):
+        last = self.store.load()
+        offset = last + 1 if last is not None else None
+        self.watermark = Watermark(last)
+
+        # webhook o'rnatilgan bo'lsa getUpdates ishlamaydi; pending update'lar saqlanib qoladi
+        await self.bot.delete_webhook(drop_pending_updates=False)
+        await self.dp.emit_startup(bot=self.bot, **self.workflow_data)
+        checkpointer = asyncio.create_task(self._checkpoint_loop())
+        stop = stop_event()
+        try:
+            offset = await self.drain_backlog(offset)
+            logger.info("Start polling (offset=%s)", offset)
+            listener = asyncio.create_task(self._listen(offset))
+            stopper = asyncio.create_task(stop.wait())
+            done, _ = await asyncio.wait({listener, stopper}, return_when=asyncio.FIRST_COMPLETED)
+            if listener in done:
+                listener.result()  # kutilmagan xato bo'lsa yuqoriga chiqsin
+            for task in (listener, stopper):
+                task.cancel()
+            await asyncio.gather(listener, stopper, return_exceptions=True)
+            await self.scheduler.join(POLLING_SHUTDOWN_TIMEOUT)
+        finally:
+            # join() ulgurmagan handler'lar storage yopilishidan oldin to'xtatiladi
+            await self.scheduler.cancel()
+            checkpointer.cancel()
+            self._checkpoint()
+            logger.info("Polling stopped")
+            await self.dp.emit_shutdown(bot=self.bot, **self.workflow_data)
+
+
+async def run_polling(dp: Dispatcher, bot: Bot, processor: Callable[[Update], Awaitable] | None = None):
+    await Poller(dp, bot, processor=processor).run()
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Hashable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Hamma foydalanuvchilar bo'yicha bir vaqtda ketayotgan prefetch GET'lar
+TASK_PREFETCH_CONCURRENCY = int(os.getenv("TASK_PREFETCH_CONCURRENCY", "8"))
+# Ro'yxatdan nechta task oldindan yuklanadi (0 = o'chiq)
+TASK_PREFETCH_COUNT = int(os.getenv("TASK_PREFETCH_COUNT", "10"))
+# Foydalanuvchi shu vaqt ichida ochmasa prefetch to'xtatiladi
+TASK_PREFETCH_TIMEOUT = float(os.getenv("TASK_PREFETCH_TIMEOUT", "30"))
+
+
+class Prefetcher:
+    """
+    Ro'yxat ko'rsatilgandan keyin ko'rinib turgan elementlarni fon rejimida keshga yuklaydi.
+    Foydalanuvchi uchun bittadan ortiq prefetch bo'lmaydi: yangi ro'yxat yoki /cancel eskisini bekor qiladi.
+    """
+
+    def __init__(self, concurrency: int = TASK_PREFETCH_CONCURRENCY, count: int = TASK_PREFETCH_COUNT):
+        self.count = count
+        self._sem = asyncio.Semaphore(concurrency)
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+        self.fetched = 0
+        self.cancelled = 0
+
+    def schedule(self, user_id: Hashable, keys: Iterable, fetch: Callable[[object], Awaitable]):
+        self.cancel(user_id)
+        keys = list(keys)[:self.count]
+        if not keys:
+            return
+        task = asyncio.create_task(self._run(keys, fetch))
+        self._tasks[user_id] = task
+
+        def forget(t: asyncio.Task):
+            if self._tasks.get(user_id) is t:
+                del self._tasks[user_id]
+
+        task.add_done_callback(forget)
+
+    def cancel(self, user_id: Hashable):
+        task = self._tasks.pop(user_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+            self.cancelled += 1
+
+    async def _run(self, keys: list, fetch: Callable[[object], Awaitable]):
+        async def one(key):
+            async with self._sem:
+                try:
+                    await fetch(key)
+                    self.fetched += 1
+                except Exception as e:
+                    # prefetch - faqat optimizatsiya: xato foydalanuvchiga ko'rinmaydi
+                    logger.debug("prefetch %r failed: %r", key, e)
+
+        tasks = [asyncio.create_task(one(k)) for k in keys]
+        try:
+            await asyncio.wait(tasks, timeout=TASK_PREFETCH_TIMEOUT)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def stats(self) -> dict:
+        return {"active": len(self._tasks), "fetched": self.fetched, "cancelled": self.cancelled}
+
+
+TASK_PREFETCH = Prefetcher()
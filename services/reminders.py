@@ -0,0 +1,341 @@
+import asyncio
+import heapq
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+
+from services.db import DB_PATH, connect
+from services.fanout import BOT_WORKER_ID, BOT_WORKERS, worker_index
+
+logger = logging.getLogger(__name__)
+
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "1") == "1"
+# Xotiradagi heap faqat shu oraliqda vaqti keladigan eslatmalarni saqlaydi (qolgani SQLite'da)
+REMINDER_WINDOW = float(os.getenv("REMINDER_WINDOW", "3600"))
+# Heap DB'dan shunchalik tez-tez to'ldiriladi (boshqa jarayon yozganlari ham shu orqali keladi)
+REMINDER_LOAD_INTERVAL = float(os.getenv("REMINDER_LOAD_INTERVAL", "60"))
+# Bir martada yuboriladigan eslatmalar
+REMINDER_BATCH = int(os.getenv("REMINDER_BATCH", "200"))
+# Shuncha sekund ichida vaqti keladiganlar birga yuboriladi (bir foydalanuvchiga bitta xabar)
+REMINDER_COALESCE = float(os.getenv("REMINDER_COALESCE", "5"))
+# Bot o'chiq turganda vaqti shundan ko'p o'tib ketgan eslatma yuborilmaydi
+REMINDER_GRACE = float(os.getenv("REMINDER_GRACE", "3600"))
+# Fon rejimida ro'yxat shunchalik eskirgan foydalanuvchilar qayta olinadi, daqiqasiga shuncha foydalanuvchi
+REMINDER_RESYNC_AGE = float(os.getenv("REMINDER_RESYNC_AGE", str(6 * 3600)))
+REMINDER_RESYNC_PER_MIN = float(os.getenv("REMINDER_RESYNC_PER_MIN", "30"))
+# Yuborilgan eslatmalar vaqtidan shuncha keyin o'chiriladi
+REMINDER_RETENTION = float(os.getenv("REMINDER_RETENTION", str(7 * 24 * 3600)))
+
+# (bot, tg_id, [(task_id, title), ...]) -> xabar yuborish
+SendFn = Callable[[Bot, int, list[tuple[int, str]]], Awaitable[None]]
+# tg_id -> (status, butun task ro'yxati)
+FetchFn = Callable[[int], Awaitable[tuple[int, list[dict]]]]
+
+
+def parse_scheduled_time(value: str | None) -> float | None:
+    """DRF datetime -> unix vaqt (timezone'siz bo'lsa UTC deb olinadi)."""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class ReminderScheduler:
+    """
+    scheduled_time bo'yicha "task vaqti keldi" eslatmalari.
+    Hamma eslatmalar SQLite'da; xotirada faqat yaqin REMINDER_WINDOW ichidagilar min-heap'da turadi,
+    shuning uchun yuz minglab eslatmada ham xotira va har daqiqalik ish kichik.
+    Ro'yxat /task ochilganda o'zgargan tasklar bo'yicha sync qilinadi, fon resync esa tezligi cheklangan.
+    Bir nechta worker bo'lsa har biri faqat tg_id % BOT_WORKERS == BOT_WORKER_ID bo'lganlarni yuboradi.
+    """
+
+    def __init__(self, path: str = DB_PATH, workers: int = BOT_WORKERS, worker_id: int = BOT_WORKER_ID):
+        self.path = path
+        self.workers = max(1, workers)
+        self.worker_id = worker_id
+        self._conn = None
+        self._bot: Bot | None = None
+        self._send: SendFn | None = None
+        self._fetch: FetchFn | None = None
+        # (due_at, tg_id, task_id); eskirgan yozuvlar _queued bilan solishtirib tashlanadi
+        self._heap: list[tuple[float, int, int]] = []
+        self._queued: dict[tuple[int, int], tuple[float, str]] = {}
+        self._horizon = 0.0  # heap shu vaqtgacha bo'lgan eslatmalarni to'liq saqlaydi
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._syncs: set[asyncio.Task] = set()
+        self.sent = 0
+        self.synced = 0
+        self.resynced = 0
+
+    async def start(self, bot: Bot, send: SendFn, fetch: FetchFn):
+        self._bot, self._send, self._fetch = bot, send, fetch
+        self._conn = await connect(self.path)
+        await self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS task_reminders (
+                tg_id INTEGER NOT NULL,
+                task_id INTEGER NOT NULL,
+                due_at REAL NOT NULL,
+                title TEXT NOT NULL,
+                notified INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (tg_id, task_id)
+            )
+            """
+        )
+        await self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS task_reminders_due ON task_reminders(notified, due_at)"
+        )
+        # fon resync navbati: /task ochgan foydalanuvchilar va oxirgi to'liq sync vaqti
+        await self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reminder_users (tg_id INTEGER PRIMARY KEY, synced_at REAL NOT NULL)"
+        )
+        await self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS reminder_users_synced_at ON reminder_users(synced_at)"
+        )
+        await self._conn.commit()
+        await self._load()
+        self._tasks = [
+            asyncio.create_task(self._load_loop()),
+            asyncio.create_task(self._due_loop()),
+            asyncio.create_task(self._resync_loop()),
+        ]
+
+    async def close(self):
+        tasks = self._tasks + list(self._syncs)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    # ---------- heap ----------
+
+    def _mine(self, tg_id: int) -> bool:
+        # update'lar bilan bir xil bo'linish: foydalanuvchining keshlari shu worker'da
+        return worker_index(tg_id, self.workers) == self.worker_id
+
+    def _push(self, tg_id: int, task_id: int, due_at: float, title: str):
+        if not self._mine(tg_id) or due_at > self._horizon:
+            return  # uzoqroq eslatma: _load vaqti yaqinlashganda oladi
+        key = (tg_id, task_id)
+        if self._queued.get(key, (None,))[0] == due_at:
+            return
+        self._queued[key] = (due_at, title)
+        heapq.heappush(self._heap, (due_at, tg_id, task_id))
+        if self._heap[0][0] == due_at:
+            self._wakeup.set()
+
+    def _drop(self, tg_id: int, task_id: int):
+        # heap'dagi yozuv qoladi, lekin _queued'da yo'qligi uchun yuborilmaydi
+        self._queued.pop((tg_id, task_id), None)
+
+    async def _load(self):
+        """Keyingi REMINDER_WINDOW ichidagi eslatmalarni heap'ga oladi, eskilarini tozalaydi."""
+        now = time.time()
+        self._horizon = now + REMINDER_WINDOW
+        async with self._conn.execute(
+            "SELECT tg_id, task_id, due_at, title FROM task_reminders "
+            "WHERE notified = 0 AND due_at <= ? AND tg_id % ? = ?",
+            (self._horizon, self.workers, self.worker_id),
+        ) as cur:
+            async for tg_id, task_id, due_at, title in cur:
+                self._push(tg_id, task_id, due_at, title)
+        await self._conn.execute(
+            "DELETE FROM task_reminders WHERE rowid IN "
+            "(SELECT rowid FROM task_reminders WHERE notified = 1 AND due_at < ? LIMIT ?)",
+            (now - REMINDER_RETENTION, REMINDER_BATCH),
+        )
+        await self._conn.commit()
+
+    async def _load_loop(self):
+        while True:
+            await asyncio.sleep(REMINDER_LOAD_INTERVAL)
+            try:
+                await self._load()
+            except Exception:
+                logger.exception("reminder load failed")
+
+    # ---------- sync ----------
+
+    async def sync(self, tg_id: int, tasks: list[dict], complete: bool = True):
+        """
+        Backend ro'yxatini saqlanganlar bilan solishtiradi: faqat yangi/o'zgargan/o'chgan tasklar yoziladi.
+        complete=False (bitta sahifa) bo'lsa ro'yxatda yo'qlari tegilmaydi.
+        """
+        now = time.time()
+        async with self._conn.execute(
+            "SELECT task_id, due_at, title FROM task_reminders WHERE tg_id = ?", (tg_id,)
+        ) as cur:
+            known = {row[0]: (row[1], row[2]) async for row in cur}
+
+        upserts, deletes = [], []
+        listed = set()
+        for task in tasks:
+            task_id = task.get("id")
+            if task_id is None:
+                continue
+            listed.add(task_id)
+            due_at = parse_scheduled_time(task.get("scheduled_time"))
+            if due_at is None:
+                if task_id in known:
+                    deletes.append((tg_id, task_id))
+                continue
+            title = task.get("title") or ""
+            if known.get(task_id) == (due_at, title):
+                continue
+            # vaqti allaqachon o'tgan task uchun eslatma yuborilmaydi
+            notified = int(due_at <= now)
+            upserts.append((tg_id, task_id, due_at, title, notified))
+        if complete:
+            deletes += [(tg_id, task_id) for task_id in known if task_id not in listed]
+
+        if upserts:
+            await self._conn.executemany("INSERT OR REPLACE INTO task_reminders VALUES (?, ?, ?, ?, ?)", upserts)
+        if deletes:
+            await self._conn.executemany("DELETE FROM task_reminders WHERE tg_id = ? AND task_id = ?", deletes)
+        if complete:
+            await self._conn.execute("INSERT OR REPLACE INTO reminder_users VALUES (?, ?)", (tg_id, now))
+        else:
+            # synced_at = oxirgi to'liq sync; yangi foydalanuvchi fon resync'da birinchi bo'lib olinadi
+            await self._conn.execute("INSERT OR IGNORE INTO reminder_users VALUES (?, 0)", (tg_id,))
+        await self._conn.commit()
+
+        for _, task_id in deletes:
+            self._drop(tg_id, task_id)
+        for _, task_id, due_at, title, notified in upserts:
+            self._drop(tg_id, task_id)
+            if not notified:
+                self._push(tg_id, task_id, due_at, title)
+        self.synced += 1
+
+    def sync_soon(self, tg_id: int, tasks: list[dict], complete: bool = True):
+        """Handler'dan: sync fon rejimida (foydalanuvchi javobi DB yozuvini kutmaydi)."""
+        if self._conn is None:
+            return
+
+        async def run():
+            try:
+                await self.sync(tg_id, tasks, complete)
+            except Exception:
+                logger.exception("reminder sync failed for %s", tg_id)
+
+        task = asyncio.create_task(run())
+        self._syncs.add(task)
+        task.add_done_callback(self._syncs.discard)
+
+    async def _resync_loop(self):
+        """Eskirgan foydalanuvchilar ro'yxati REMINDER_RESYNC_PER_MIN tezligida qayta olinadi."""
+        interval = 60 / REMINDER_RESYNC_PER_MIN
+        while True:
+            async with self._conn.execute(
+                "SELECT tg_id FROM reminder_users WHERE synced_at < ? AND tg_id % ? = ? "
+                "ORDER BY synced_at LIMIT ?",
+                (time.time() - REMINDER_RESYNC_AGE, self.workers, self.worker_id, REMINDER_BATCH),
+            ) as cur:
+                users = [row[0] for row in await cur.fetchall()]
+            if not users:
+                await asyncio.sleep(REMINDER_LOAD_INTERVAL)
+                continue
+            for tg_id in users:
+                await asyncio.sleep(interval)
+                try:
+                    await self._resync(tg_id)
+                except Exception:
+                    # bitta foydalanuvchining xatosi (sync, DB) loop'ni to'xtatmasin
+                    logger.exception("reminder resync for %s failed", tg_id)
+
+    async def _resync(self, tg_id: int):
+        """Bitta foydalanuvchi: backend'dan ro'yxat, sync yoki synced_at yangilash."""
+        try:
+            status, tasks = await self._fetch(tg_id)
+        except Exception as e:
+            logger.warning("reminder resync for %s failed: %r", tg_id, e)
+            status, tasks = None, []
+        if status == 200:
+            await self.sync(tg_id, tasks)
+            self.resynced += 1
+            return
+        if status == 401:
+            # sessiya yo'q: /task qayta ochilguncha fon resync to'xtaydi (eslatmalar qoladi)
+            await self._conn.execute("DELETE FROM reminder_users WHERE tg_id = ?", (tg_id,))
+        else:
+            await self._conn.execute(
+                "UPDATE reminder_users SET synced_at = ? WHERE tg_id = ?", (time.time(), tg_id)
+            )
+        await self._conn.commit()
+
+    # ---------- yuborish ----------
+
+    async def _due_loop(self):
+        while True:
+            now = time.time()
+            batch = []
+            while self._heap and self._heap[0][0] <= now + (REMINDER_COALESCE if batch else 0) \
+                    and len(batch) < REMINDER_BATCH:
+                due_at, tg_id, task_id = heapq.heappop(self._heap)
+                entry = self._queued.get((tg_id, task_id))
+                if entry is None or entry[0] != due_at:
+                    continue  # o'zgargan yoki o'chirilgan
+                del self._queued[(tg_id, task_id)]
+                batch.append((tg_id, task_id, due_at, entry[1]))
+            if batch:
+                try:
+                    await self._deliver(batch, now)
+                except Exception:
+                    logger.exception("reminder delivery failed")
+                continue
+
+            delay = self._heap[0][0] - now if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver(self, batch: list[tuple[int, int, float, str]], now: float):
+        # avval DB'da "yuborildi" deb belgilanadi: boshqa jarayon yoki restart ikkinchi marta yubormaydi
+        by_user: dict[int, list[tuple[int, str]]] = {}
+        for tg_id, task_id, due_at, title in batch:
+            cur = await self._conn.execute(
+                "UPDATE task_reminders SET notified = 1 "
+                "WHERE tg_id = ? AND task_id = ? AND due_at = ? AND notified = 0",
+                (tg_id, task_id, due_at),
+            )
+            if cur.rowcount and now - due_at <= REMINDER_GRACE:
+                by_user.setdefault(tg_id, []).append((task_id, title))
+        await self._conn.commit()
+
+        async def send(tg_id: int, items: list[tuple[int, str]]):
+            try:
+                await self._send(self._bot, tg_id, items)
+                self.sent += len(items)
+            except Exception as e:
+                # bot bloklangan va h.k.: eslatma qayta yuborilmaydi
+                logger.debug("reminder to %s failed: %r", tg_id, e)
+
+        # bitta foydalanuvchiga bitta xabar; tezlik FLOOD_CONTROL navbatida cheklanadi
+        await asyncio.gather(*(send(tg_id, items) for tg_id, items in by_user.items()))
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._queued),
+            "heap": len(self._heap),
+            "sent": self.sent,
+            "synced": self.synced,
+            "resynced": self.resynced,
+        }
+
+
+REMINDERS = ReminderScheduler()
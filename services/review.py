@@ -0,0 +1,275 @@
+import hashlib
+import heapq
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from services.db import DB_PATH, connect
+
+logger = logging.getLogger(__name__)
+
+# Xato javobdan keyin birinchi takrorlash (sekund): o'sha kuni yana bir bor so'raladi
+REVIEW_RELEARN_DELAY = float(os.getenv("REVIEW_RELEARN_DELAY", "600"))
+# Interval shundan oshsa savol o'zlashtirilgan hisoblanadi va navbatdan chiqadi (kun)
+REVIEW_MAX_INTERVAL = float(os.getenv("REVIEW_MAX_INTERVAL", "120"))
+# Xotirada saqlanadigan foydalanuvchi navbatlari (qolgani SQLite'dan qayta o'qiladi)
+REVIEW_CACHE_USERS = int(os.getenv("REVIEW_CACHE_USERS", "5000"))
+# Boshqa worker yozgan o'zgarishlar shuncha vaqtdan keyin ko'rinadi
+REVIEW_CACHE_TTL = float(os.getenv("REVIEW_CACHE_TTL", "300"))
+
+# /review sarlavhasida vaqti kelganlar soni shundan oshsa "N+" ko'rinadi
+REVIEW_DUE_LIMIT = int(os.getenv("REVIEW_DUE_LIMIT", "99"))
+
+_DAY = 24 * 3600
+_MIN_EASE = 1.3
+
+# Nusxada faqat render_task va compile_task o'qiydigan maydonlar saqlanadi
+_SNAPSHOT_FIELDS = ("id", "title", "type", "category", "scheduled_time", "correct_short", "updated_at")
+
+
+def task_snapshot(task: dict) -> dict:
+    """
+    Task detail'ning /review uchun kerakli qismi + "_version" (maydonlar hash'i).
+    Backend'dagi task o'zgarsa versiya ham o'zgaradi va eski nusxa almashtiriladi.
+    """
+    snap = {name: task[name] for name in _SNAPSHOT_FIELDS if task.get(name) is not None}
+    snap["options"] = [{"text": o["text"], "correct": o["correct"]} for o in task.get("options") or ()]
+    raw = json.dumps(snap, ensure_ascii=False, sort_keys=True)
+    snap["_version"] = hashlib.sha1(raw.encode()).hexdigest()[:12]
+    return snap
+
+
+class Card:
+    """SM-2 kartasi: bitta foydalanuvchining bitta xato javob bergan taski."""
+
+    __slots__ = ("task_id", "due_at", "interval", "ease", "reps", "lapses", "task")
+
+    def __init__(self, task_id: int, due_at: float, interval: float = 0.0, ease: float = 2.5,
+                 reps: int = 0, lapses: int = 0, task: dict | None = None):
+        self.task_id = task_id
+        self.due_at = due_at
+        self.interval = interval  # kun
+        self.ease = ease
+        self.reps = reps
+        self.lapses = lapses
+        self.task = task  # task_snapshot(): backend sekin bo'lsa ham savol darhol chiqadi
+
+    def grade(self, quality: int, now: float):
+        """SM-2: quality 0..5 (bot uchun: to'g'ri = 4, xato = 1)."""
+        self.ease = max(_MIN_EASE, self.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        if quality < 3:
+            self.reps = 0
+            self.lapses += 1
+            self.interval = 0.0
+            self.due_at = now + REVIEW_RELEARN_DELAY
+            return
+        self.reps += 1
+        if self.reps == 1:
+            self.interval = 1.0
+        elif self.reps == 2:
+            self.interval = 6.0
+        else:
+            self.interval = round(self.interval * self.ease, 1)
+        self.due_at = now + self.interval * _DAY
+
+    def as_row(self, tg_id: int) -> tuple:
+        task = json.dumps(self.task, ensure_ascii=False) if self.task is not None else None
+        return tg_id, self.task_id, self.due_at, self.interval, self.ease, self.reps, self.lapses, task
+
+
+class Deck:
+    """
+    Bitta foydalanuvchining kartalari: (due_at, task_id) min-heap, lazy invalidation.
+    push va keyingisi O(log n); keys — har kartaning heap'dagi amaldagi yozuvi.
+    """
+
+    __slots__ = ("cards", "heap", "keys", "loaded_at")
+
+    def __init__(self, cards: list[Card], loaded_at: float):
+        self.cards = {c.task_id: c for c in cards}
+        self.keys = {c.task_id: c.due_at for c in cards}  # grade due_at'ni o'zgartiradi -> alohida saqlanadi
+        self.heap = [(due_at, task_id) for task_id, due_at in self.keys.items()]
+        heapq.heapify(self.heap)
+        self.loaded_at = loaded_at
+
+    def _live(self, entry: tuple[float, int]) -> bool:
+        return self.keys.get(entry[1]) == entry[0]
+
+    def push(self, card: Card):
+        self.cards[card.task_id] = card
+        if self.keys.get(card.task_id) == card.due_at:
+            return  # heap'da aynan shu yozuv bor
+        self.keys[card.task_id] = card.due_at
+        heapq.heappush(self.heap, (card.due_at, card.task_id))  # eski yozuvi peek()'da tashlanadi
+        # eskirgan yozuvlar juda ko'payib ketsa heap qaytadan quriladi
+        if len(self.heap) > 2 * len(self.keys) + 16:
+            self.heap = [(due_at, task_id) for task_id, due_at in self.keys.items()]
+            heapq.heapify(self.heap)
+
+    def remove(self, task_id: int):
+        self.keys.pop(task_id, None)
+        self.cards.pop(task_id, None)
+
+    def peek(self) -> Card | None:
+        while self.heap:
+            if self._live(self.heap[0]):
+                return self.cards[self.heap[0][1]]
+            heapq.heappop(self.heap)
+        return None
+
+    def due_count(self, now: float, limit: int = REVIEW_DUE_LIMIT) -> int:
+        """
+        Vaqti kelganlar soni, ko'pi bilan limit ("N+" uchun). Heap daraxti ildizdan aylanadi,
+        due_at > now bo'lgan tugunning butun shoxi tashlanadi: faqat vaqti kelgan yozuvlar
+        (limit'gacha, eskirganlari bilan) ko'riladi, n'ga bog'liq emas.
+        """
+        seen = set()  # remove() + xuddi shu due_at bilan push() bir xil yozuvni ikki marta qoldirishi mumkin
+        stack = [0] if self.heap else []
+        heap = self.heap
+        while stack and len(seen) < limit:
+            i = stack.pop()
+            if heap[i][0] > now:
+                continue
+            if self._live(heap[i]):
+                seen.add(heap[i][1])
+            stack.extend(j for j in (2 * i + 1, 2 * i + 2) if j < len(heap))
+        return len(seen)
+
+
+class ReviewStore:
+    """
+    /review uchun spaced repetition (SM-2). Kartalar SQLite'da, foydalanuvchi navbati (Deck)
+    birinchi murojaatda yuklanib LRU keshda turadi; har o'zgarish darhol DB'ga yoziladi.
+    """
+
+    def __init__(self, path: str = DB_PATH, cache_users: int = REVIEW_CACHE_USERS):
+        self.path = path
+        self.cache_users = cache_users
+        self._conn = None
+        self._decks: OrderedDict[int, Deck] = OrderedDict()
+        self.reviewed = 0
+        self.lapsed = 0
+
+    async def start(self):
+        self._conn = await connect(self.path)
+        await self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS review_cards (
+                tg_id INTEGER NOT NULL,
+                task_id INTEGER NOT NULL,
+                due_at REAL NOT NULL,
+                interval REAL NOT NULL,
+                ease REAL NOT NULL,
+                reps INTEGER NOT NULL,
+                lapses INTEGER NOT NULL,
+                task TEXT,
+                PRIMARY KEY (tg_id, task_id)
+            )
+            """
+        )
+        await self._conn.commit()
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+        self._decks.clear()
+
+    async def _deck(self, tg_id: int) -> Deck:
+        now = time.monotonic()
+        deck = self._decks.get(tg_id)
+        if deck is None or now - deck.loaded_at > REVIEW_CACHE_TTL:
+            async with self._conn.execute(
+                "SELECT task_id, due_at, interval, ease, reps, lapses, task FROM review_cards WHERE tg_id = ?",
+                (tg_id,),
+            ) as cur:
+                cards = [
+                    Card(row[0], row[1], row[2], row[3], row[4], row[5],
+                         task_snapshot(json.loads(row[6])) if row[6] else None)
+                    async for row in cur
+                ]
+            deck = self._decks[tg_id] = Deck(cards, now)
+        self._decks.move_to_end(tg_id)
+        while len(self._decks) > self.cache_users:
+            self._decks.popitem(last=False)
+        return deck
+
+    async def _save(self, tg_id: int, card: Card):
+        await self._conn.execute(
+            "INSERT OR REPLACE INTO review_cards VALUES (?, ?, ?, ?, ?, ?, ?, ?)", card.as_row(tg_id)
+        )
+        await self._conn.commit()
+
+    async def record(self, tg_id: int, task_id: int, correct: bool, task: dict | None = None):
+        """
+        Javob natijasi. Xato -> karta yaratiladi yoki qaytadan o'rganishga tushadi.
+        To'g'ri -> faqat vaqti kelgan karta keyingi intervalga o'tadi (muddatidan oldin qayta
+        ishlash jadvalni buzmaydi, faqat eskirgan nusxa yangilanadi).
+        """
+        deck = await self._deck(tg_id)
+        card = deck.cards.get(task_id)
+        now = time.time()
+        if card is None:
+            if correct:
+                return
+            card = Card(task_id, now)
+        elif correct and card.due_at > now:
+            if task is not None:
+                await self.refresh(tg_id, task)
+            return
+        if task is not None:
+            card.task = task_snapshot(task)
+
+        card.grade(4 if correct else 1, now)
+        if correct:
+            self.reviewed += 1
+        else:
+            self.lapsed += 1
+
+        if card.interval > REVIEW_MAX_INTERVAL:
+            deck.remove(task_id)
+            await self._conn.execute(
+                "DELETE FROM review_cards WHERE tg_id = ? AND task_id = ?", (tg_id, task_id)
+            )
+            await self._conn.commit()
+            return
+        deck.push(card)
+        await self._save(tg_id, card)
+
+    async def refresh(self, tg_id: int, task: dict):
+        """Backend'dan kelgan task saqlangan nusxadan farq qilsa nusxa almashtiriladi."""
+        deck = await self._deck(tg_id)
+        card = deck.cards.get(task.get("id"))
+        if card is None:
+            return
+        snap = task_snapshot(task)
+        if card.task is not None and card.task["_version"] == snap["_version"]:
+            return
+        card.task = snap
+        await self._save(tg_id, card)
+
+    async def next_due(self, tg_id: int) -> tuple[Card | None, int, float | None]:
+        """(vaqti kelgan karta yoki None, vaqti kelganlar soni, keyingi karta vaqti)."""
+        deck = await self._deck(tg_id)
+        card = deck.peek()
+        if card is None:
+            return None, 0, None
+        now = time.time()
+        if card.due_at > now:
+            return None, 0, card.due_at
+        return card, deck.due_count(now), card.due_at
+
+    async def forget(self, tg_id: int, task_id: int):
+        """Backend'da o'chirilgan task navbatdan chiqariladi."""
+        deck = await self._deck(tg_id)
+        deck.remove(task_id)
+        await self._conn.execute("DELETE FROM review_cards WHERE tg_id = ? AND task_id = ?", (tg_id, task_id))
+        await self._conn.commit()
+
+    def stats(self) -> dict:
+        return {"users": len(self._decks), "reviewed": self.reviewed, "lapsed": self.lapsed}
+
+
+REVIEWS = ReviewStore()
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Awaitable, Callable, Hashable
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Bir vaqtda navbatda turgan + ishlayotgan update'lar soni (hamma chatlar bo'yicha)
+SCHED_MAX_IN_FLIGHT = int(os.getenv("SCHED_MAX_IN_FLIGHT", "500"))
+
+
+def update_chat_key(update: Update) -> Hashable:
+    """
+    Update qaysi navbatga tegishli (tartib shu kalit bo'yicha saqlanadi): private chat -> chat.id,
+    gruppada har a'zoning o'z navbati (chat.id, user.id) — FSM ham shu kalitda, bir a'zoning
+    uzun AI javobi boshqalarni kutdirmaydi.
+    """
+    event = update.event
+    chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+    user = getattr(event, "from_user", None)
+    if chat is not None:
+        if user is not None and chat.type in ("group", "supergroup"):
+            return chat.id, user.id
+        return chat.id
+    if user is not None:
+        return user.id
+    return ("update", update.update_id)  # chatsiz update: alohida, hech kimni kutmaydi
+
+
+async def process_update(dp: Dispatcher, bot: Bot, update: Update, **data):
+    """Update'ni dispatcher'ga uzatadi; xato log qilinadi, boshqa update'larga ta'sir qilmaydi."""
+    try:
+        result = await dp.feed_update(bot, update, **data)
+        if isinstance(result, TelegramMethod):
+            await dp.silent_call_request(bot, result)
+    except Exception:
+        logger.exception("update %d failed", update.update_id)
+
+
+class _ChatQueue:
+    __slots__ = ("items", "worker")
+
+    def __init__(self):
+        self.items: deque[Update] = deque()
+        self.worker: asyncio.Task | None = None
+
+
+class UpdateScheduler:
+    """
+    Bitta chat (gruppada: bitta a'zo) ichida update'lar qat'iy ketma-ket, qolganlari parallel.
+    submit() global limit to'lganda kutadi -> polling/webhook navbati sekinlashadi (backpressure).
+    Navbati bo'shagan chat uchun worker tugaydi va yozuv o'chiriladi (bo'sh chatlar xotira yemaydi).
+    """
+
+    def __init__(self, handle: Callable[[Update], Awaitable], max_in_flight: int = SCHED_MAX_IN_FLIGHT):
+        self.handle = handle
+        self.max_in_flight = max_in_flight
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._chats: dict[Hashable, _ChatQueue] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.in_flight = 0
+
+    async def submit(self, update: Update, key: Hashable | None = None):
+        await self._slots.acquire()
+        self.in_flight += 1
+        self._idle.clear()
+        key = update_chat_key(update) if key is None else key
+        q = self._chats.get(key)
+        if q is None:
+            q = self._chats[key] = _ChatQueue()
+        q.items.append(update)
+        if q.worker is None:
+            q.worker = asyncio.create_task(self._drain(key, q))
+
+    async def _drain(self, key: Hashable, q: _ChatQueue):
+        try:
+            while q.items:
+                update = q.items.popleft()
+                try:
+                    await self.handle(update)
+                except Exception:
+                    logger.exception("update %d failed", update.update_id)
+                finally:
+                    self.in_flight -= 1
+                    self._slots.release()
+        finally:
+            # bo'sh navbat -> chat yozuvi tozalanadi
+            q.worker = None
+            if self._chats.get(key) is q and not q.items:
+                del self._chats[key]
+            if self.in_flight == 0:
+                self._idle.set()
+
+    async def join(self, timeout: float | None = None) -> bool:
+        """Hamma update tugashini kutadi (shutdown uchun). Vaqt tugasa False."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def cancel(self):
+        """
+        join() vaqti tugagandan keyin: qolgan handler'lar to'xtatiladi. Dispatcher shutdown'i
+        FSM storage'ni yopishidan oldin chaqiriladi (aks holda handler yopiq ulanishga yozadi).
+        """
+        workers = [q.worker for q in self._chats.values() if q.worker is not None]
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        if workers:
+            logger.warning("scheduler: %d chats cancelled at shutdown", len(workers))
+        self._chats.clear()
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "chats": len(self._chats), "max_in_flight": self.max_in_flight}
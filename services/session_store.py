@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from services.db import DB_PATH, connect
+
+logger = logging.getLogger(__name__)
+
+# ==================== SOZLAMALAR ====================
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")  # "sqlite" | "memory"
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(30 * 24 * 3600)))  # 30 kun
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "1.0"))
+SESSION_FLUSH_BATCH = int(os.getenv("SESSION_FLUSH_BATCH", "500"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "3600"))
+
+
+class UserSession:
+    """Bitta bog'langan foydalanuvchining tokenlari (dict o'rniga ixcham obyekt)."""
+
+    __slots__ = ("access", "refresh", "email", "username", "saved_at")
+
+    def __init__(
+        self,
+        access: str,
+        refresh: str | None = None,
+        email: str | None = None,
+        username: str | None = None,
+        saved_at: float | None = None,
+    ):
+        self.access = access
+        self.refresh = refresh
+        self.email = email
+        self.username = username
+        self.saved_at = saved_at if saved_at is not None else time.time()
+
+    def expired(self, now: float | None = None) -> bool:
+        return (now or time.time()) - self.saved_at > SESSION_TTL
+
+    def as_row(self, tg_id: int) -> tuple:
+        return (tg_id, self.access, self.refresh, self.email, self.username, self.saved_at)
+
+
+# ==================== BACKEND'LAR ====================
+
+class SessionBackend(ABC):
+    """Sessiyalarni doimiy saqlash qatlami. Yangi backend abstract metodlarni yozadi."""
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def load(self, tg_id: int) -> UserSession | None:
+        ...
+
+    @abstractmethod
+    async def save_many(self, items: list[tuple[int, UserSession]]):
+        ...
+
+    @abstractmethod
+    async def delete_many(self, tg_ids: list[int]):
+        ...
+
+    @abstractmethod
+    async def purge_expired(self, older_than: float) -> int:
+        ...
+
+
+class MemorySessionBackend(SessionBackend):
+    """Lokal dev/test uchun: restartda hammasi yo'qoladi."""
+
+    def __init__(self):
+        self._rows: dict[int, UserSession] = {}
+
+    async def load(self, tg_id):
+        return self._rows.get(tg_id)
+
+    async def save_many(self, items):
+        self._rows.update(items)
+
+    async def delete_many(self, tg_ids):
+        for tg_id in tg_ids:
+            self._rows.pop(tg_id, None)
+
+    async def purge_expired(self, older_than):
+        stale = [k for k, v in self._rows.items() if v.saved_at < older_than]
+        for k in stale:
+            del self._rows[k]
+        return len(stale)
+
+
+class SqliteSessionBackend(SessionBackend):
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._conn = None
+
+    async def open(self):
+        self._conn = await connect(self.path)
+        await self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_sessions (
+                tg_id INTEGER PRIMARY KEY,
+                access TEXT NOT NULL,
+                refresh TEXT,
+                email TEXT,
+                username TEXT,
+                saved_at REAL NOT NULL
+            )
+            """
+        )
+        await self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS user_sessions_saved_at ON user_sessions(saved_at)"
+        )
+        await self._conn.commit()
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def load(self, tg_id):
+        async with self._conn.execute(
+            "SELECT access, refresh, email, username, saved_at FROM user_sessions WHERE tg_id = ?",
+            (tg_id,),
+        ) as cur:
+            row = await cur.fetchone()
+        return UserSession(*row) if row else None
+
+    async def save_many(self, items):
+        await self._conn.executemany(
+            "INSERT OR REPLACE INTO user_sessions VALUES (?, ?, ?, ?, ?, ?)",
+            [s.as_row(tg_id) for tg_id, s in items],
+        )
+        await self._conn.commit()
+
+    async def delete_many(self, tg_ids):
+        await self._conn.executemany(
+            "DELETE FROM user_sessions WHERE tg_id = ?", [(i,) for i in tg_ids]
+        )
+        await self._conn.commit()
+
+    async def purge_expired(self, older_than):
+        cur = await self._conn.execute("DELETE FROM user_sessions WHERE saved_at < ?", (older_than,))
+        await self._conn.commit()
+        return cur.rowcount
+
+
+# ==================== STORE (LRU + WRITE-BEHIND) ====================
+
+_DELETED = object()
+
+
+class SessionStore:
+    """
+    telegram_id -> UserSession.
+    O'qish: chegaralangan LRU kesh -> backend.
+    Yozish: darhol keshga, backend'ga esa fon task orqali to'plab (write-behind).
+    """
+
+    def __init__(self, backend: SessionBackend, cache_size: int = SESSION_CACHE_SIZE):
+        self.backend = backend
+        self.cache_size = cache_size
+        self._cache: OrderedDict[int, UserSession] = OrderedDict()
+        # hali backend'ga yozilmagan o'zgarishlar (UserSession yoki _DELETED)
+        self._dirty: dict[int, object] = {}
+        # hozir yozilayotgan batch (flush tugaguncha get() shu yerdan ham qaraydi)
+        self._flushing: dict[int, object] = {}
+        self._wakeup = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self._sweeper: asyncio.Task | None = None
+
+    async def start(self):
+        await self.backend.open()
+        self._flusher = asyncio.create_task(self._flush_loop())
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        for task in (self._flusher, self._sweeper):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._flusher = self._sweeper = None
+        await self.flush()
+        await self.backend.close()
+
+    def _remember(self, tg_id: int, session: UserSession):
+        self._cache[tg_id] = session
+        self._cache.move_to_end(tg_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def get(self, tg_id: int) -> UserSession | None:
+        session = self._cache.get(tg_id)
+        if session is None:
+            pending = self._dirty.get(tg_id, self._flushing.get(tg_id))
+            if pending is _DELETED:
+                return None
+            session = pending or await self.backend.load(tg_id)
+            if session is None:
+                return None
+        if session.expired():
+            await self.delete(tg_id)
+            return None
+        self._remember(tg_id, session)
+        return session
+
+    async def set(self, tg_id: int, session: UserSession):
+        self._remember(tg_id, session)
+        self._mark_dirty(tg_id, session)
+
+    async def delete(self, tg_id: int):
+        self._cache.pop(tg_id, None)
+        self._mark_dirty(tg_id, _DELETED)
+
+    def _mark_dirty(self, tg_id: int, value):
+        self._dirty[tg_id] = value
+        if len(self._dirty) >= SESSION_FLUSH_BATCH:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Yig'ilgan o'zgarishlarni backend'ga bitta batch bilan yozadi."""
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        self._flushing = batch
+        saves = [(k, v) for k, v in batch.items() if v is not _DELETED]
+        deletes = [k for k, v in batch.items() if v is _DELETED]
+        try:
+            if saves:
+                await self.backend.save_many(saves)
+            if deletes:
+                await self.backend.delete_many(deletes)
+        except Exception:
+            # yo'qotmaymiz: keyingi flush'da qayta urinamiz (yangiroq yozuvlar ustun)
+            logger.exception("session flush failed, %d records kept for retry", len(batch))
+            self._requeue(batch)
+        except BaseException:
+            # close() _flusher'ni yozish o'rtasida bekor qilsa batch close() ichidagi flush'ga qaytadi
+            self._requeue(batch)
+            raise
+        finally:
+            self._flushing = {}
+
+    def _requeue(self, batch: dict[int, object]):
+        for k, v in batch.items():
+            self._dirty.setdefault(k, v)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), SESSION_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+            now = time.time()
+            for tg_id in [k for k, v in self._cache.items() if v.expired(now)]:
+                del self._cache[tg_id]
+            try:
+                removed = await self.backend.purge_expired(now - SESSION_TTL)
+                if removed:
+                    logger.info("session sweep: %d expired sessions removed", removed)
+            except Exception:
+                logger.exception("session sweep failed")
+
+
+def _make_backend() -> SessionBackend:
+    if SESSION_BACKEND == "memory":
+        return MemorySessionBackend()
+    return SqliteSessionBackend(DB_PATH)
+
+
+SESSIONS = SessionStore(_make_backend())
@@ -0,0 +1,13 @@
+import asyncio
+import signal
+from contextlib import suppress
+
+
+def stop_event() -> asyncio.Event:
+    """SIGTERM/SIGINT kelganda set bo'ladigan Event (graceful shutdown uchun)."""
+    event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        with suppress(NotImplementedError):  # Windows'da yo'q
+            loop.add_signal_handler(sig, event.set)
+    return event
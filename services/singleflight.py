@@ -0,0 +1,38 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Bir xil kalit bilan parallel kelgan chaqiriqlar bitta umumiy ishni kutadi.
+    Ish alohida task sifatida ishlaydi: birinchi chaqiruvchi bekor qilinsa ham
+    qolganlar natijani oladi.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.shared = 0
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # hech kim kutmay qolgan bo'lsa ham "exception was never retrieved" chiqmasin
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from typing import Awaitable, Callable, Literal
+
+logger = logging.getLogger(__name__)
+
+STATS_SPOOL_PATH = os.getenv("STATS_SPOOL_PATH", "stats_spool.jsonl")
+STATS_BATCH_SIZE = int(os.getenv("STATS_BATCH_SIZE", "50"))
+STATS_FLUSH_INTERVAL = float(os.getenv("STATS_FLUSH_INTERVAL", "2.0"))
+STATS_SEND_CONCURRENCY = int(os.getenv("STATS_SEND_CONCURRENCY", "10"))
+STATS_MAX_BACKOFF = float(os.getenv("STATS_MAX_BACKOFF", "60"))
+STATS_DRAIN_TIMEOUT = float(os.getenv("STATS_DRAIN_TIMEOUT", "10"))
+# spool'dagi "ack" yozuvlari shuncha bo'lsa fayl qayta yoziladi (siqiladi)
+STATS_COMPACT_EVERY = int(os.getenv("STATS_COMPACT_EVERY", "1000"))
+
+SendResult = Literal["ok", "retry", "drop"]
+
+
+class StatsEvent:
+    __slots__ = ("id", "tg_id", "correct", "ts")
+
+    def __init__(self, tg_id: int, correct: bool, id: str | None = None, ts: float | None = None):
+        self.id = id or uuid.uuid4().hex
+        self.tg_id = tg_id
+        self.correct = correct
+        self.ts = ts if ts is not None else time.time()
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "tg_id": self.tg_id, "correct": self.correct, "ts": self.ts}
+
+
+Sender = Callable[[StatsEvent], Awaitable[SendResult]]
+
+
+class StatsPipeline:
+    """
+    Handler faqat record() chaqiradi: event spool faylga yoziladi va navbatga tushadi.
+    Fon task eventlarni batch qilib yuboradi (hajm yoki vaqt bo'yicha),
+    xatoda backoff bilan qayta urinadi. Yuborilmaganlar spool'da qoladi -> restartdan keyin davom.
+    """
+
+    def __init__(self, spool_path: str = STATS_SPOOL_PATH):
+        self.spool_path = spool_path
+        self._queue: asyncio.Queue[StatsEvent] = asyncio.Queue()
+        # hali ack bo'lmagan eventlar (spool siqilganda shular qayta yoziladi)
+        self._pending: dict[str, StatsEvent] = {}
+        self._spool = None
+        self._acks_since_compact = 0
+        self._sender: Sender | None = None
+        self._worker: asyncio.Task | None = None
+        self.sent = 0
+        self.dropped = 0
+        self.failures = 0
+
+    # ---------- spool ----------
+
+    def _replay(self) -> list[StatsEvent]:
+        pending: dict[str, StatsEvent] = {}
+        try:
+            with open(self.spool_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # crash paytida yarim yozilgan oxirgi qator
+                    if rec.get("op") == "add":
+                        ev = StatsEvent(rec["tg_id"], rec["correct"], rec["id"], rec["ts"])
+                        pending[ev.id] = ev
+                    elif rec.get("op") == "ack":
+                        for event_id in rec["ids"]:
+                            pending.pop(event_id, None)
+        except FileNotFoundError:
+            pass
+        return list(pending.values())
+
+    def _compact(self):
+        """Spool'ni faqat yuborilmagan eventlar bilan atomik qayta yozadi."""
+        if self._spool is not None:
+            self._spool.close()
+        tmp = self.spool_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for ev in self._pending.values():
+                f.write(json.dumps({"op": "add", **ev.as_dict()}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.spool_path)
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+        self._acks_since_compact = 0
+
+    def _append(self, rec: dict):
+        self._spool.write(json.dumps(rec) + "\n")
+        self._spool.flush()
+
+    # ---------- public API ----------
+
+    async def start(self, sender: Sender):
+        self._sender = sender
+        pending = self._replay()
+        self._pending = {ev.id: ev for ev in pending}
+        self._compact()
+        for ev in pending:
+            self._queue.put_nowait(ev)
+        if pending:
+            logger.info("stats: %d pending events restored from spool", len(pending))
+        self._worker = asyncio.create_task(self._run())
+
+    def record(self, tg_id: int, correct: bool):
+        """Handler'dan chaqiriladi: kutmaydi, tarmoqqa chiqmaydi."""
+        ev = StatsEvent(tg_id, correct)
+        if self._spool is not None:
+            self._append({"op": "add", **ev.as_dict()})
+        self._pending[ev.id] = ev
+        self._queue.put_nowait(ev)
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def close(self):
+        """Graceful shutdown: navbatni STATS_DRAIN_TIMEOUT ichida bo'shatishga harakat qiladi."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        # navbatdagilar + worker to'xtatilganda yo'lda qolganlar
+        left = list(self._pending.values())
+        if left and self._sender is not None:
+            try:
+                left = await asyncio.wait_for(self._send_batch(left), STATS_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("stats drain timed out")
+        if self._spool is not None:
+            self._compact()
+            self._spool.close()
+            self._spool = None
+        if left:
+            logger.warning("stats: %d events kept in spool for next start", len(left))
+
+    # ---------- worker ----------
+
+    async def _collect(self) -> list[StatsEvent]:
+        """Birinchi eventni kutadi, keyin STATS_FLUSH_INTERVAL ichida batch to'ldiradi."""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + STATS_FLUSH_INTERVAL
+        while len(batch) < STATS_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _send_batch(self, batch: list[StatsEvent]) -> list[StatsEvent]:
+        """Batch'ni yuboradi, qayta urinish kerak bo'lganlarni qaytaradi."""
+        sem = asyncio.Semaphore(STATS_SEND_CONCURRENCY)
+
+        async def send_one(ev: StatsEvent) -> SendResult:
+            async with sem:
+                try:
+                    return await self._sender(ev)
+                except Exception as e:
+                    logger.warning("stats update error: %s", e)
+                    return "retry"
+
+        results = await asyncio.gather(*(send_one(ev) for ev in batch))
+        done = [ev.id for ev, r in zip(batch, results) if r != "retry"]
+        self.sent += sum(r == "ok" for r in results)
+        self.dropped += sum(r == "drop" for r in results)
+        for event_id in done:
+            self._pending.pop(event_id, None)
+        if done and self._spool is not None:
+            self._append({"op": "ack", "ids": done})
+            self._acks_since_compact += len(done)
+        return [ev for ev, r in zip(batch, results) if r == "retry"]
+
+    async def _run(self):
+        backoff = 0.0
+        while True:
+            batch = await self._collect()
+            retry = await self._send_batch(batch)
+            if self._acks_since_compact >= STATS_COMPACT_EVERY:
+                self._compact()
+            if not retry:
+                backoff = 0.0
+                continue
+            self.failures += 1
+            backoff = min(STATS_MAX_BACKOFF, backoff * 2 or 1.0)
+            for ev in retry:
+                self._queue.put_nowait(ev)
+            await asyncio.sleep(backoff * random.uniform(0.8, 1.2))
+
+
+STATS = StatsPipeline()
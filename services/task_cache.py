@@ -0,0 +1,176 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from services.singleflight import SingleFlight
+
+TASK_CACHE_SIZE = int(os.getenv("TASK_CACHE_SIZE", "20000"))
+TASK_CACHE_TTL = float(os.getenv("TASK_CACHE_TTL", "600"))  # 10 daqiqa
+TASK_LIST_USERS = int(os.getenv("TASK_LIST_USERS", "5000"))
+TASK_LIST_TTL = float(os.getenv("TASK_LIST_TTL", "60"))  # sahifalash uchun qisqa
+
+Fetcher = Callable[[], Awaitable[tuple[int, dict]]]
+
+
+class TaskCache:
+    """
+    (telegram_id, task_id) -> task detail.
+    TTL + LRU bilan cheklangan; bir xil kalit uchun parallel so'rovlar bitta GET'ga birlashadi.
+    """
+
+    def __init__(self, maxsize: int = TASK_CACHE_SIZE, ttl: float = TASK_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # kalit -> (task, expires_at)
+        self._data: OrderedDict[tuple[int, int], tuple[dict, float]] = OrderedDict()
+        self._by_user: dict[int, set[int]] = {}
+        self._inflight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, task_id: int) -> dict | None:
+        key = (user_id, task_id)
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        task, expires_at = entry
+        if expires_at < time.monotonic():
+            self.invalidate(user_id, task_id)
+            return None
+        self._data.move_to_end(key)
+        return task
+
+    def put(self, user_id: int, task_id: int, task: dict):
+        key = (user_id, task_id)
+        self._data[key] = (task, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        self._by_user.setdefault(user_id, set()).add(task_id)
+        while len(self._data) > self.maxsize:
+            (old_user, old_task), _ = self._data.popitem(last=False)
+            self._forget(old_user, old_task)
+
+    def invalidate(self, user_id: int, task_id: int):
+        if self._data.pop((user_id, task_id), None) is not None:
+            self._forget(user_id, task_id)
+
+    def _forget(self, user_id: int, task_id: int):
+        ids = self._by_user.get(user_id)
+        if ids is not None:
+            ids.discard(task_id)
+            if not ids:
+                del self._by_user[user_id]
+
+    async def get_or_fetch(self, user_id: int, task_id: int, fetch: Fetcher) -> tuple[int, dict]:
+        """Keshda bo'lsa (200, task), aks holda fetch() natijasi (faqat 200 keshlanadi)."""
+        task = self.get(user_id, task_id)
+        if task is not None:
+            self.hits += 1
+            return 200, task
+
+        self.misses += 1
+
+        async def fetch_and_store():
+            status, data = await fetch()
+            if status == 200 and isinstance(data, dict):
+                self.put(user_id, task_id, data)
+            return status, data
+
+        return await self._inflight.do((user_id, task_id), fetch_and_store)
+
+    def sync_list(self, user_id: int, tasks: list[dict], complete: bool = True):
+        """
+        /task ro'yxatidagi qisqa ma'lumot keshdagi detail bilan solishtiriladi:
+        ro'yxatda yo'q yoki o'zgargan tasklar keshdan chiqariladi.
+        complete=False (faqat bitta sahifa) bo'lsa ro'yxatda yo'qlari tegilmaydi.
+        """
+        cached_ids = self._by_user.get(user_id)
+        if not cached_ids:
+            return
+        listed = {t["id"]: t for t in tasks if "id" in t}
+        for task_id in list(cached_ids):
+            item = listed.get(task_id)
+            if item is None and not complete:
+                continue
+            cached = self._data.get((user_id, task_id))
+            if item is None or cached is None or any(
+                k in cached[0] and cached[0][k] != v for k, v in item.items()
+            ):
+                self.invalidate(user_id, task_id)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class TaskList:
+    """Foydalanuvchining /task ro'yxati: to'liq ro'yxat (lokal sahifalanadi) yoki backend sahifalari."""
+
+    __slots__ = ("total", "items", "pages", "expires_at")
+
+    def __init__(self, expires_at: float):
+        self.total = 0
+        self.items: list[dict] | None = None
+        self.pages: dict[int, list[dict]] = {}
+        self.expires_at = expires_at
+
+    def page(self, page: int, size: int) -> list[dict] | None:
+        if self.items is not None:
+            return self.items[page * size:(page + 1) * size]
+        return self.pages.get(page)
+
+
+class TaskListCache:
+    """
+    telegram_id -> TaskList (qisqa TTL + LRU).
+    Oldinga/orqaga varaqlash keshdan; bir xil sahifa uchun parallel so'rovlar bitta GET'ga birlashadi.
+    """
+
+    def __init__(self, maxsize: int = TASK_LIST_USERS, ttl: float = TASK_LIST_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[int, TaskList] = OrderedDict()
+        self._inflight = SingleFlight()
+
+    def get(self, user_id: int) -> TaskList | None:
+        entry = self._data.get(user_id)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._data[user_id]
+            return None
+        self._data.move_to_end(user_id)
+        return entry
+
+    def _entry(self, user_id: int) -> TaskList:
+        entry = self.get(user_id)
+        if entry is None:
+            entry = self._data[user_id] = TaskList(time.monotonic() + self.ttl)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return entry
+
+    def put_full(self, user_id: int, tasks: list[dict]):
+        entry = self._entry(user_id)
+        entry.items = tasks
+        entry.total = len(tasks)
+
+    def put_page(self, user_id: int, page: int, items: list[dict], total: int):
+        entry = self._entry(user_id)
+        entry.pages[page] = items
+        entry.total = total
+
+    def invalidate(self, user_id: int):
+        self._data.pop(user_id, None)
+
+    async def fetch(self, user_id: int, page: int, fetch: Callable[[], Awaitable]):
+        return await self._inflight.do((user_id, page), fetch)
+
+
+TASK_CACHE = TaskCache()
+TASK_LISTS = TaskListCache()
@@ -0,0 +1,110 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable
+
+from services.session_store import SessionStore, UserSession
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Muddati tugashiga shuncha qolganda fon rejimida yangilanadi
+TOKEN_REFRESH_MARGIN = float(os.getenv("TOKEN_REFRESH_MARGIN", "120"))
+# Shundan kam qolgan bo'lsa token eskirgan deb hisoblanadi (soat farqi + tarmoq vaqti)
+TOKEN_EXPIRY_SKEW = float(os.getenv("TOKEN_EXPIRY_SKEW", "10"))
+
+# refresh token -> (status, javob)
+RefreshFn = Callable[[str], Awaitable[tuple[int, object]]]
+
+
+def jwt_exp(token: str) -> float | None:
+    """JWT payload'idagi exp (imzo tekshirilmaydi, faqat muddatni bilish uchun)."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return None
+
+
+class TokenManager:
+    """
+    Access tokenni muddati tugashidan oldin refresh token bilan yangilaydi.
+    Bitta foydalanuvchi uchun parallel refresh'lar bitta so'rovga birlashadi.
+    """
+
+    def __init__(self, store: SessionStore, refresh_fn: RefreshFn):
+        self.store = store
+        self.refresh_fn = refresh_fn
+        self._flights = SingleFlight()
+        self._background: set[asyncio.Task] = set()
+        self.refreshed = 0
+        self.failed = 0
+
+    async def get_session(self, tg_id: int) -> UserSession | None:
+        """
+        Sessiyani qaytaradi. Token eskirgan bo'lsa avval yangilaydi,
+        eskirishiga oz qolgan bo'lsa fon rejimida yangilaydi (hozirgisi hali ishlaydi).
+        """
+        session = await self.store.get(tg_id)
+        if session is None or not session.refresh:
+            return session
+
+        exp = jwt_exp(session.access)
+        if exp is None:
+            return session
+        left = exp - time.time()
+        if left <= TOKEN_EXPIRY_SKEW:
+            # yangilab bo'lmasa ham eski sessiya (agar o'chirilmagan bo'lsa) qaytadi
+            return await self.refresh(tg_id, stale=session.access) or await self.store.get(tg_id)
+        if left <= TOKEN_REFRESH_MARGIN:
+            task = asyncio.create_task(self.refresh(tg_id, stale=session.access))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        return session
+
+    async def refresh(self, tg_id: int, stale: str | None = None) -> UserSession | None:
+        """
+        Tokenni yangilaydi. stale berilsa va saqlangan token allaqachon boshqa bo'lsa
+        (boshqa so'rov yangilab bo'lgan) qayta yangilamaydi.
+        """
+        return await self._flights.do(tg_id, lambda: self._refresh(tg_id, stale))
+
+    async def _refresh(self, tg_id: int, stale: str | None) -> UserSession | None:
+        session = await self.store.get(tg_id)
+        if session is None:
+            return None
+        if stale is not None and session.access != stale:
+            return session
+        if not session.refresh:
+            return None
+
+        try:
+            status, data = await self.refresh_fn(session.refresh)
+        except Exception as e:
+            self.failed += 1
+            logger.warning("token refresh failed for %s: %r", tg_id, e)
+            return None
+
+        if status == 200 and isinstance(data, dict) and data.get("access"):
+            new = UserSession(
+                access=data["access"],
+                # ROTATE_REFRESH_TOKENS yoqilgan bo'lsa backend yangi refresh ham beradi
+                refresh=data.get("refresh") or session.refresh,
+                email=session.email,
+                username=session.username,
+                saved_at=time.time(),
+            )
+            await self.store.set(tg_id, new)
+            self.refreshed += 1
+            return new
+
+        self.failed += 1
+        if status in (400, 401):
+            # refresh token ham eskirgan/bekor qilingan -> /start orqali qayta login
+            await self.store.delete(tg_id)
+        return None
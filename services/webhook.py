@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from services.scheduler import UpdateScheduler, process_update
+from services.signals import stop_event
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # masalan: https://riseup-bot.up.railway.app
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Telegram har so'rovda X-Telegram-Bot-Api-Secret-Token bilan yuboradi; webhook rejimida majburiy
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT") or os.getenv("PORT") or "8080")
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "10"))
+
+
+class QueuedRequestHandler(SimpleRequestHandler):
+    """
+    Secret token tekshiriladi, update chegaralangan navbatga qo'yiladi va Telegram'ga darhol 200.
+    Navbatdan update'lar UpdateScheduler'ga o'tadi: chat ichida tartib, chatlar o'rtasida parallel.
+    Scheduler limiti to'lsa navbat to'ladi -> 503: Telegram update'ni keyinroq qayta yuboradi (backpressure).
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        secret_token: str = WEBHOOK_SECRET,
+        queue_size: int = WEBHOOK_QUEUE_SIZE,
+        processor: Callable[[Update], Awaitable] | None = None,
+        health: Callable[[], dict] | None = None,
+        **data,
+    ):
+        if not secret_token:
+            # secret'siz endpoint soxta update'larni ham qabul qilib oladi
+            raise RuntimeError("❌ Webhook uchun WEBHOOK_SECRET kerak.")
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=queue_size)
+        # default: shu jarayonda qayta ishlash; fan-out rejimida FanOut.dispatch (worker'ga yuborish)
+        self.scheduler = UpdateScheduler(processor or self._feed)
+        self._health_extra = health
+        self._feeder: asyncio.Task | None = None
+        self.rejected = 0
+
+    def register(self, app: web.Application, /, path: str, **kwargs):
+        super().register(app, path=path, **kwargs)
+        app.on_startup.append(self._start_feeder)
+        app.router.add_get("/healthz", self.health)
+
+    async def _start_feeder(self, *_):
+        self._feeder = asyncio.create_task(self._feed_loop())
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return web.Response(status=503, text="busy")
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _feed(self, update: Update):
+        await process_update(self.dispatcher, self.bot, update, **self.data)
+
+    async def _feed_loop(self):
+        while True:
+            raw = await self.queue.get()
+            try:
+                update = Update.model_validate(raw, context={"bot": self.bot})
+                await self.scheduler.submit(update)
+            except Exception:
+                logger.exception("webhook update rejected")
+            finally:
+                self.queue.task_done()
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "queue": self.queue.qsize(),
+            "queue_max": self.queue.maxsize,
+            "rejected": self.rejected,
+            **self.scheduler.stats(),
+            **(self._health_extra() if self._health_extra else {}),
+        })
+
+    async def close(self):
+        # qabul qilingan (200 qaytarilgan) update'lar yo'qolmasin
+        async def drain():
+            await self.queue.join()
+            await self.scheduler.join()
+
+        try:
+            await asyncio.wait_for(drain(), WEBHOOK_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "webhook: %d queued, %d scheduled updates left unprocessed",
+                self.queue.qsize(), self.scheduler.in_flight,
+            )
+        if self._feeder is not None:
+            self._feeder.cancel()
+            await asyncio.gather(self._feeder, return_exceptions=True)
+        # dispatcher shutdown'i (FSM storage close) bundan keyin ishlaydi
+        await self.scheduler.cancel()
+        await super().close()
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    processor: Callable[[Update], Awaitable] | None = None,
+    health: Callable[[], dict] | None = None,
+):
+    """aiohttp web server'ni ko'taradi va Telegram'ga webhook'ni o'rnatadi."""
+    if not WEBHOOK_URL:
+        raise RuntimeError("❌ BOT_MODE=webhook uchun WEBHOOK_URL kerak.")
+    if not WEBHOOK_SECRET:
+        raise RuntimeError("❌ BOT_MODE=webhook uchun WEBHOOK_SECRET kerak (A-Z, a-z, 0-9, _ va -, 1-256 belgi).")
+
+    app = web.Application()
+    QueuedRequestHandler(dp, bot, processor=processor, health=health).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT)
+    await site.start()
+    logger.info("webhook server listening on %s:%s%s", WEBAPP_HOST, WEBAPP_PORT, WEBHOOK_PATH)
+
+    try:
+        await bot.set_webhook(
+            f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        await stop_event().wait()
+    finally:
+        await runner.cleanup()
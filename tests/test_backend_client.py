@@ -0,0 +1,134 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+import services.backend_client as backend_client
+from services.backend_client import BackendClient, BackendUnavailable, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(backend_client.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    cb = CircuitBreaker(failures=3, reset_after=30)
+    for _ in range(2):
+        assert cb.allow()
+        cb.failure()
+    assert cb.state == "closed"
+    cb.success()  # ketma-ketlik uziladi
+    for _ in range(3):
+        cb.failure()
+    assert cb.state == "open"
+    assert not cb.allow()
+
+
+def test_half_open_lets_one_probe_and_closes_on_success(clock):
+    cb = CircuitBreaker(failures=1, reset_after=30)
+    cb.failure()
+    clock.now += 30
+    assert cb.state == "half-open"
+    assert cb.allow()
+    assert not cb.allow()  # sinov so'rovi tugamaguncha boshqasi o'tmaydi
+    cb.success()
+    assert cb.state == "closed"
+    assert cb.allow() and cb.allow()
+
+
+def test_failed_probe_reopens(clock):
+    cb = CircuitBreaker(failures=5, reset_after=30)
+    for _ in range(5):
+        cb.failure()
+    clock.now += 30
+    assert cb.allow()
+    cb.failure()  # bitta xato yetarli
+    assert cb.state == "open"
+    clock.now += 29
+    assert not cb.allow()
+    clock.now += 1
+    assert cb.allow()
+
+
+def test_stuck_probe_is_replaced_after_reset(clock):
+    cb = CircuitBreaker(failures=1, reset_after=30)
+    cb.failure()
+    clock.now += 30
+    assert cb.allow()  # javobsiz qolgan (bekor qilingan) sinov
+    clock.now += 10
+    assert not cb.allow()
+    clock.now += 20
+    assert cb.allow()
+
+
+def test_client_fails_fast_when_circuit_is_open(monkeypatch):
+    monkeypatch.setattr(backend_client, "BACKEND_RETRIES", 0)
+    client = BackendClient(lambda: None)
+    client.breaker = CircuitBreaker(failures=2, reset_after=60)
+    calls = []
+
+    async def down(method, url, timeout, **kwargs):
+        calls.append(url)
+        raise aiohttp.ClientConnectionError("refused")
+
+    monkeypatch.setattr(client, "_once", down)
+
+    async def main():
+        for _ in range(2):
+            with pytest.raises(BackendUnavailable):
+                await client.request("GET", "https://backend/api/tasks/1/")
+        with pytest.raises(BackendUnavailable, match="circuit open"):
+            await client.request("GET", "https://backend/api/tasks/1/")
+
+    asyncio.run(main())
+    assert len(calls) == 2
+    assert client.stats()["circuit"] == "open"
+
+
+def test_plain_500s_open_the_circuit(monkeypatch):
+    client = BackendClient(lambda: None)
+    client.breaker = CircuitBreaker(failures=3, reset_after=60)
+    calls = []
+
+    async def broken(method, url, timeout, **kwargs):
+        calls.append(url)
+        return 500, "Internal Server Error"
+
+    monkeypatch.setattr(client, "_once", broken)
+
+    async def main():
+        for _ in range(3):
+            assert await client.request("POST", "https://backend/api/stats/") == (500, "Internal Server Error")
+        with pytest.raises(BackendUnavailable, match="circuit open"):
+            await client.request("POST", "https://backend/api/stats/")
+
+    asyncio.run(main())
+    assert len(calls) == 3
+
+
+def test_4xx_does_not_count_as_failure(monkeypatch):
+    client = BackendClient(lambda: None)
+    client.breaker = CircuitBreaker(failures=1, reset_after=60)
+
+    async def not_found(method, url, timeout, **kwargs):
+        return 404, {"detail": "Not found."}
+
+    monkeypatch.setattr(client, "_once", not_found)
+
+    async def main():
+        for _ in range(3):
+            assert (await client.request("GET", "https://backend/api/tasks/9/"))[0] == 404
+
+    asyncio.run(main())
+    assert client.breaker.state == "closed"
@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+from aiogram.types import Update
+
+import services.fanout as fanout
+from services.fanout import FanOut, control_command, update_worker_key, worker_index
+
+
+class FakeWriter:
+    """Worker ulanishi o'rniga: update kelsa darhol ack qiladi."""
+
+    def __init__(self, link):
+        self.link = link
+        self.lines = []
+
+    def write(self, data: bytes):
+        msg = json.loads(data)
+        self.lines.append(msg)
+        if msg["op"] == "update":
+            self.link.pending.pop(msg["id"])[1].set_result(None)
+
+    async def drain(self):
+        pass
+
+
+def _command(update_id: int, text: str, user_id: int, chat_id: int = -100) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "supergroup"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "a"},
+            "text": text,
+        },
+    })
+
+
+def _run(updates, workers: int = 3):
+    async def main():
+        fan = FanOut(workers=workers, argv=["unused"])
+        for link in fan.links:
+            link.writer = FakeWriter(link)
+        for update in updates:
+            await fan.dispatch(update)
+        return [[(m["op"], m.get("id", m.get("command"))) for m in link.writer.lines] for link in fan.links]
+
+    return asyncio.run(main())
+
+
+def test_updates_are_routed_by_user_not_chat():
+    sent = _run([_command(1, "salom", 4), _command(2, "salom", 5), _command(3, "salom", 4, chat_id=4)])
+    assert worker_index(update_worker_key(_command(0, "x", 4)), 3) == 1
+    assert sent == [[], [("update", 1), ("update", 3)], [("update", 2)]]
+
+
+def test_admin_control_command_reaches_every_worker(monkeypatch):
+    monkeypatch.setattr(fanout, "ADMIN_IDS", frozenset({4}))
+    monkeypatch.setitem(fanout._CONTROL, "ai_flush", None)
+    sent = _run([_command(1, "/ai_flush@riseupuz_bot", 4), _command(2, "/ai_flush", 5)])
+    # egasi javob beradi, qolganlari faqat control oladi; admin bo'lmagan foydalanuvchi broadcast qilmaydi
+    assert sent == [[("control", "ai_flush")], [("update", 1)], [("control", "ai_flush"), ("update", 2)]]
+
+
+def test_control_command_registers_handler(monkeypatch):
+    monkeypatch.setattr(fanout, "_CONTROL", {})
+
+    @control_command("reload_catalog")
+    async def reload():
+        pass
+
+    assert fanout._CONTROL == {"reload_catalog": reload}
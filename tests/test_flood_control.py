@@ -0,0 +1,69 @@
+import asyncio
+
+from aiogram.methods import EditMessageText, SendMessage
+
+from middlewares.flood_control import FloodControlMiddleware, coalescible
+
+
+def _run(sends):
+    """sends: [(method, coalescible)] bir vaqtda yuboriladi; (Telegram'ga ketgan so'rovlar, natijalar)."""
+    requests = []
+
+    async def make_request(bot, method):
+        requests.append(method)
+        return method.text
+
+    async def send(fc, method, flagged):
+        if flagged:
+            with coalescible():
+                return await fc(make_request, None, method)
+        return await fc(make_request, None, method)
+
+    async def main():
+        fc = FloodControlMiddleware(30)
+        try:
+            return await asyncio.gather(*(send(fc, m, flagged) for m, flagged in sends))
+        finally:
+            await fc.close()
+
+    results = asyncio.run(main())
+    return requests, results
+
+
+def test_coalescible_sends_go_out_as_one_message():
+    # check_task_answer: natija + "🔁 Yana savol..." maslahati
+    requests, results = _run([
+        (SendMessage(chat_id=5, text="✅ *To‘g‘ri javob!*", parse_mode="Markdown"), True),
+        (SendMessage(chat_id=5, text="🔁 Yana savol ko‘rmoqchi bo‘lsangiz, /task yuboring.", parse_mode="Markdown"), True),
+    ])
+    assert len(requests) == 1
+    assert isinstance(requests[0], SendMessage)
+    assert requests[0].text == "✅ *To‘g‘ri javob!*\n\n🔁 Yana savol ko‘rmoqchi bo‘lsangiz, /task yuboring."
+    assert results[0] == results[1]
+
+
+def test_unflagged_sends_are_never_merged():
+    requests, _ = _run([
+        (SendMessage(chat_id=5, text="a"), True),
+        (SendMessage(chat_id=5, text="⏳ Navbatdasiz"), False),  # keyin tahrirlanadigan xabar
+        (SendMessage(chat_id=5, text="b"), False),
+    ])
+    assert [r.text for r in requests] == ["a", "⏳ Navbatdasiz", "b"]
+
+
+def test_different_parse_modes_are_not_merged():
+    requests, _ = _run([
+        (SendMessage(chat_id=5, text="a", parse_mode="Markdown"), True),
+        (SendMessage(chat_id=5, text="b"), True),
+    ])
+    assert [r.text for r in requests] == ["a", "b"]
+
+
+def test_flagged_edits_are_superseded_by_the_last_one():
+    requests, results = _run([
+        (EditMessageText(chat_id=5, message_id=1, text="e1"), True),
+        (EditMessageText(chat_id=5, message_id=1, text="e2"), True),
+        (EditMessageText(chat_id=5, message_id=1, text="final"), False),
+    ])
+    assert [r.text for r in requests] == ["final"]
+    assert results == ["final"] * 3
@@ -0,0 +1,62 @@
+import time
+
+from aiogram.types import Update
+
+from services.polling import POLLING_CALLBACK_MAX_AGE, compact_backlog
+
+NOW = time.time()
+
+
+def _message(update_id: int, text: str, at: float, chat: int = 1) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(at),
+            "chat": {"id": chat, "type": "private"},
+            "from": {"id": chat, "is_bot": False, "first_name": "a"},
+            "text": text,
+        },
+    })
+
+
+def _callback(update_id: int, chat: int = 1) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": "x",
+            "from": {"id": chat, "is_bot": False, "first_name": "a"},
+            "data": "d",
+        },
+    })
+
+
+def _ids(updates):
+    return [u.update_id for u in updates]
+
+
+def test_only_adjacent_duplicate_commands_collapse():
+    ups = [
+        _message(1, "/task", NOW), _message(2, "/task", NOW),
+        _message(3, "javob", NOW), _message(4, "/task", NOW),
+    ]
+    kept, stale = compact_backlog(ups, NOW)
+    assert _ids(kept) == [2, 3, 4]
+    assert stale == []
+
+
+def test_callback_after_old_message_is_kept():
+    # oldingi xabar eski bo'lsa ham tugma hozirgina bosilgan bo'lishi mumkin
+    ups = [_message(1, "salom", NOW - 10 * POLLING_CALLBACK_MAX_AGE), _callback(2)]
+    kept, stale = compact_backlog(ups, NOW)
+    assert _ids(kept) == [1, 2]
+    assert stale == []
+
+
+def test_callback_is_dropped_only_when_a_later_update_proves_it_old():
+    old = NOW - 10 * POLLING_CALLBACK_MAX_AGE
+    ups = [_callback(1), _message(2, "a", old), _callback(3), _message(4, "b", NOW - 1), _callback(5)]
+    kept, stale = compact_backlog(ups, NOW)
+    assert _ids(stale) == [1]
+    assert _ids(kept) == [2, 3, 4, 5]
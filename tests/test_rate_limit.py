@@ -0,0 +1,51 @@
+import asyncio
+
+from middlewares.rate_limit import FairGate, TokenBucket
+
+
+def test_token_bucket_refills_up_to_burst():
+    bucket = TokenBucket(2, now=0.0)
+    assert bucket.wait(0.0, rate=1.0, burst=2) == 0
+    bucket.tokens -= 2
+    assert bucket.wait(0.0, rate=1.0, burst=2) == 1.0
+    assert bucket.wait(0.5, rate=1.0, burst=2) == 0.5
+    bucket.wait(10.0, rate=1.0, burst=2)
+    assert bucket.tokens == 2
+
+
+def test_fair_gate_round_robins_between_users():
+    order = []
+
+    async def request(gate: FairGate, user: str, n: int):
+        await gate.acquire(user)
+        order.append((user, n))
+
+    async def main():
+        gate = FairGate(per_min=6000, burst=1)  # 100/s, test tez tugaydi
+        heavy = [asyncio.create_task(request(gate, "heavy", i)) for i in range(10)]
+        await asyncio.sleep(0)
+        light = [asyncio.create_task(request(gate, "light", i)) for i in range(2)]
+        await asyncio.gather(*heavy, *light)
+        assert gate.queued == 0
+
+    asyncio.run(main())
+    users = [user for user, _ in order]
+    # heavy'ning 10 ta so'rovi navbatda bo'lsa ham light har ikkinchi o'rinda o'tadi
+    assert users[:5] == ["heavy", "heavy", "light", "heavy", "light"]
+    assert [n for user, n in order if user == "heavy"] == list(range(10))
+
+
+def test_cancelled_waiter_does_not_consume_token():
+    async def main():
+        gate = FairGate(per_min=600, burst=1)
+        await gate.acquire("a")  # burst tugadi
+        waiting = asyncio.create_task(gate.acquire("b"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        started = asyncio.get_running_loop().time()
+        await gate.acquire("c")
+        return asyncio.get_running_loop().time() - started
+
+    # 10/s: "c" bitta token vaqtini kutadi, bekor qilingan "b" uchun ikkinchisini emas
+    assert asyncio.run(main()) < 0.15
@@ -0,0 +1,39 @@
+import random
+
+from services.review import Card, Deck
+
+
+def _brute_due(deck: Deck, now: float) -> int:
+    return sum(c.due_at <= now for c in deck.cards.values())
+
+
+def test_deck_peek_and_due_count_match_brute_force():
+    rng = random.Random(3)
+    deck = Deck([Card(i, rng.uniform(0, 100)) for i in range(200)], loaded_at=0)
+    for _ in range(2000):
+        task_id = rng.randrange(250)
+        if rng.random() < 0.2:
+            deck.remove(task_id)
+            continue
+        card = deck.cards.get(task_id) or Card(task_id, 0)
+        card.due_at = rng.uniform(0, 100)  # grade() kabi: karta joyida o'zgaradi
+        deck.push(card)
+        now = rng.uniform(0, 100)
+        assert deck.due_count(now, limit=10 ** 6) == _brute_due(deck, now)
+        head = deck.peek()
+        assert head.due_at == min(c.due_at for c in deck.cards.values())
+    assert len(deck.heap) <= 2 * len(deck.cards) + 17
+
+
+def test_due_count_stops_at_limit():
+    deck = Deck([Card(i, 0) for i in range(1000)], loaded_at=0)
+    assert deck.due_count(1, limit=99) == 99
+    assert deck.due_count(-1, limit=99) == 0
+
+
+def test_readded_card_is_counted_once():
+    card = Card(1, 5)
+    deck = Deck([card], loaded_at=0)
+    deck.remove(1)
+    deck.push(card)  # heap'da (5, 1) ikki marta
+    assert deck.due_count(10) == 1
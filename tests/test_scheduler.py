@@ -0,0 +1,119 @@
+import asyncio
+import random
+
+from aiogram.types import Update
+
+from services.scheduler import UpdateScheduler, update_chat_key
+
+
+def _message(update_id: int, chat_id: int, user_id: int | None = None) -> Update:
+    message = {
+        "message_id": update_id,
+        "date": 0,
+        "chat": {"id": chat_id, "type": "private" if user_id is None else "supergroup"},
+        "text": str(update_id),
+    }
+    if user_id is not None:
+        message["from"] = {"id": user_id, "is_bot": False, "first_name": "a"}
+    return Update.model_validate({"update_id": update_id, "message": message})
+
+
+def test_per_chat_fifo_under_concurrency():
+    rng = random.Random(1)
+    updates = [_message(i, rng.choice((1, 2, 3, 4, 5))) for i in range(200)]
+    done: dict[int, list[int]] = {}
+    running = {"now": 0, "max": 0}
+    busy_chats: set[int] = set()
+
+    async def handle(update: Update):
+        chat = update_chat_key(update)
+        assert chat not in busy_chats  # bitta chatda bir vaqtda faqat bittasi
+        busy_chats.add(chat)
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(rng.uniform(0, 0.003))
+        running["now"] -= 1
+        busy_chats.discard(chat)
+        done.setdefault(chat, []).append(update.update_id)
+
+    async def main():
+        scheduler = UpdateScheduler(handle, max_in_flight=4)
+        for u in updates:
+            await scheduler.submit(u)
+        assert await scheduler.join(10)
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    for chat, ids in done.items():
+        assert ids == sorted(ids), chat
+    assert sum(map(len, done.values())) == len(updates)
+    assert 1 < running["max"] <= 4  # chatlar parallel, lekin max_in_flight dan oshmaydi
+    assert scheduler.stats() == {"in_flight": 0, "chats": 0, "max_in_flight": 4}
+
+
+def test_failing_update_does_not_block_chat():
+    seen = []
+
+    async def handle(update: Update):
+        seen.append(update.update_id)
+        if update.update_id == 1:
+            raise RuntimeError("boom")
+
+    async def main():
+        scheduler = UpdateScheduler(handle)
+        for i in range(3):
+            await scheduler.submit(_message(i, 42))
+        assert await scheduler.join(5)
+
+    asyncio.run(main())
+    assert seen == [0, 1, 2]
+
+
+def test_group_members_have_separate_queues():
+    assert update_chat_key(_message(1, -100, 7)) == (-100, 7)
+    assert update_chat_key(_message(2, 5)) == 5
+    started = []
+    release = asyncio.Event()
+
+    async def handle(update: Update):
+        started.append(update.update_id)
+        if update.update_id == 1:
+            await release.wait()  # uzun AI javobi
+
+    async def main():
+        scheduler = UpdateScheduler(handle)
+        await scheduler.submit(_message(1, -100, 7))
+        await scheduler.submit(_message(2, -100, 7))
+        await scheduler.submit(_message(3, -100, 8))
+        await asyncio.sleep(0.01)
+        # boshqa a'zo kutmaydi, o'sha a'zoning keyingi xabari esa navbatda
+        assert started == [1, 3]
+        release.set()
+        assert await scheduler.join(5)
+
+    asyncio.run(main())
+    assert started == [1, 3, 2]
+
+
+def test_cancel_stops_handlers_left_after_join_timeout():
+    finished = []
+
+    async def handle(update: Update):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            finished.append(update.update_id)
+            raise
+
+    async def main():
+        scheduler = UpdateScheduler(handle)
+        await scheduler.submit(_message(1, 5))
+        await scheduler.submit(_message(2, 5))
+        await asyncio.sleep(0)
+        assert not await scheduler.join(0.01)
+        await scheduler.cancel()
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert finished == [1]  # navbatdagi 2-update boshlanmaydi
+    assert scheduler.stats()["chats"] == 0
@@ -0,0 +1,42 @@
+import asyncio
+
+from services.session_store import MemorySessionBackend, SessionStore, UserSession
+
+
+class SlowBackend(MemorySessionBackend):
+    def __init__(self):
+        super().__init__()
+        self.writing = asyncio.Event()
+
+    async def save_many(self, items):
+        self.writing.set()
+        await asyncio.sleep(0.05)
+        await super().save_many(items)
+
+
+def test_close_during_flush_keeps_the_batch():
+    async def main():
+        backend = SlowBackend()
+        store = SessionStore(backend)
+        await store.start()
+        await store.set(1, UserSession("access", "refresh"))
+        store._wakeup.set()  # fon flush darhol boshlansin
+        await backend.writing.wait()
+        await store.close()  # _flusher save_many o'rtasida bekor qilinadi
+        return await backend.load(1)
+
+    session = asyncio.run(main())
+    assert session is not None and session.access == "access"
+
+
+def test_deleted_session_is_not_served_before_flush():
+    async def main():
+        backend = MemorySessionBackend()
+        await backend.save_many([(1, UserSession("old"))])
+        store = SessionStore(backend)
+        await store.delete(1)
+        assert await store.get(1) is None
+        await store.flush()
+        return await backend.load(1)
+
+    assert asyncio.run(main()) is None
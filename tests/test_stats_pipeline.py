@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+import services.stats_pipeline as stats_pipeline
+from services.stats_pipeline import StatsPipeline
+
+
+async def _wait_for(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_spool_replays_unacked_events_after_crash(tmp_path, monkeypatch):
+    monkeypatch.setattr(stats_pipeline, "STATS_FLUSH_INTERVAL", 0.01)
+    spool = str(tmp_path / "spool.jsonl")
+
+    async def main():
+        # 1-jarayon: faqat tg_id=1 yuboriladi, qolganlari backend xatosi bilan qayta urinishda
+        first_seen = []
+
+        async def flaky(ev):
+            first_seen.append(ev.tg_id)
+            return "ok" if ev.tg_id == 1 else "retry"
+
+        p1 = StatsPipeline(spool)
+        await p1.start(flaky)
+        for tg_id in (1, 2, 3):
+            p1.record(tg_id, True)
+        await _wait_for(lambda: {1, 2, 3} <= set(first_seen))
+
+        # crash: close() chaqirilmaydi, oxirgi qator yarim yozilib qoladi
+        p1._worker.cancel()
+        await asyncio.gather(p1._worker, return_exceptions=True)
+        p1._spool.write('{"op": "add", "id": "half')
+        p1._spool.close()
+
+        sent = []
+
+        async def ok(ev):
+            sent.append(ev.tg_id)
+            return "ok"
+
+        p2 = StatsPipeline(spool)
+        await p2.start(ok)
+        await _wait_for(lambda: len(sent) >= 2)
+        await p2.close()
+        return sent
+
+    sent = asyncio.run(main())
+    assert sorted(sent) == [2, 3]
+    # hammasi ack bo'lgan: keyingi start'da qayta yuboriladigan narsa yo'q
+    assert StatsPipeline(spool)._replay() == []
+
+
+def test_close_keeps_unsent_events_in_spool(tmp_path, monkeypatch):
+    monkeypatch.setattr(stats_pipeline, "STATS_FLUSH_INTERVAL", 0.01)
+    monkeypatch.setattr(stats_pipeline, "STATS_DRAIN_TIMEOUT", 0.1)
+    spool = str(tmp_path / "spool.jsonl")
+
+    async def down(ev):
+        return "retry"
+
+    async def main():
+        p = StatsPipeline(spool)
+        await p.start(down)
+        p.record(7, False)
+        await p.close()
+
+    asyncio.run(main())
+    with open(spool, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert [(r["op"], r["tg_id"], r["correct"]) for r in rows] == [("add", 7, False)]
+    assert [ev.tg_id for ev in StatsPipeline(spool)._replay()] == [7]